@@ -0,0 +1,44 @@
+"""
+Compare how many compilable samples per second we get from generating modules
+and filtering out the ones that don't compile, against compile-valid mode.
+
+python benchmarks/bench_compile_valid.py --depth 4 --width 3 --seconds 5
+"""
+
+import argparse
+import ast
+import time
+import warnings
+
+import spew.generate
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--depth", type=int, action="append", default=[])
+parser.add_argument("--width", type=int, default=3)
+parser.add_argument("--seconds", type=float, default=5.0, help="Time per run")
+args = parser.parse_args()
+
+warnings.simplefilter("ignore", SyntaxWarning)
+
+
+def valid_samples_per_second(depth: int, compile_valid: bool) -> tuple[float, float]:
+    valid = total = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < args.seconds:
+        module = spew.generate.generate_module(
+            depth=depth, width=args.width, compile_valid=compile_valid
+        )
+        total += 1
+        try:
+            compile(ast.unparse(module), "<spew>", "exec")
+        except SyntaxError:
+            continue
+        valid += 1
+    return valid / elapsed, valid / total
+
+
+print(f"{'depth':>5} {'mode':>18} {'valid/sec':>10} {'valid %':>8}")
+for depth in args.depth or [3, 4, 5]:
+    for compile_valid, mode in ((False, "generate+filter"), (True, "compile-valid")):
+        rate, ratio = valid_samples_per_second(depth, compile_valid)
+        print(f"{depth:>5} {mode:>18} {rate:>10.1f} {ratio:>8.1%}")
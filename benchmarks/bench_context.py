@@ -0,0 +1,90 @@
+"""
+Measure the cost of entering and leaving the scopes of a context, against the
+@contextmanager generators they replace, and the generation throughput in
+nodes per second.
+
+python benchmarks/bench_context.py --iterations 1000000 --depth 5 --width 6
+"""
+
+import argparse
+import ast
+import time
+from contextlib import contextmanager
+
+import spew.generate as g
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--iterations", type=int, default=1_000_000)
+parser.add_argument("--depth", type=int, default=5)
+parser.add_argument("--width", type=int, default=6)
+parser.add_argument("--repeat", type=int, default=5, help="Runs, the best is kept")
+args = parser.parse_args()
+
+
+class GeneratorScopes:
+    """The scopes as they were written, with @contextmanager."""
+
+    def __init__(self):
+        self.depth = 0
+        self.max_depth = g.MAX_DEPTH
+        self.in_loop = False
+        self.in_function = False
+
+    @contextmanager
+    def nested(self):
+        if self.depth + 1 > self.max_depth:
+            pass
+        self.depth += 1
+        yield
+        self.depth -= 1
+
+    @contextmanager
+    def inloop(self):
+        _prev_state = self.in_loop
+        self.in_loop = True
+        yield
+        self.in_loop = _prev_state
+
+    @contextmanager
+    def infunction(self, is_async: bool = False, is_generator: bool = True):
+        bindings = []
+        _prev_state = self.in_function
+        self.in_function = True
+        yield bindings
+        self.in_function = _prev_state
+
+
+def best(function) -> float:
+    times = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def scope_loop(ctx, scope: str):
+    enter = getattr(ctx, scope)
+
+    def run():
+        for _ in range(args.iterations):
+            with enter():
+                pass
+
+    return run
+
+
+ctx = g.Context()
+ctx.max_depth = args.iterations
+for scope in ("nested", "inloop", "infunction"):
+    before = best(scope_loop(GeneratorScopes(), scope)) / args.iterations
+    after = best(scope_loop(ctx, scope)) / args.iterations
+    print(
+        f"{scope:>12}: {before * 1e9:6.0f} ns with @contextmanager, "
+        f"{after * 1e9:6.0f} ns now ({before / after:.1f}x)"
+    )
+
+module = g.generate_module(args.depth, args.width, seed=0)
+n_nodes = sum(1 for _ in ast.walk(module))
+seconds = best(lambda: g.generate_module(args.depth, args.width, seed=0))
+print(f"generate_module: {n_nodes / seconds:,.0f} nodes/s ({n_nodes} nodes)")
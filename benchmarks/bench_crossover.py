@@ -0,0 +1,68 @@
+"""
+Compare new samples per second from mutating modules against crossing them over,
+on a corpus of generated modules. The corpus is indexed once for crossover, the
+time it takes is reported separately. Rates are given both for the new trees and
+for the trees unparsed to source, which takes most of the time.
+
+python benchmarks/bench_crossover.py --depth 4 --width 5 --corpus 50 --splices 3
+"""
+
+import argparse
+import ast
+import time
+import warnings
+
+import spew.crossover
+import spew.generate
+import spew.mutation
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--depth", type=int, action="append", default=[])
+parser.add_argument("--width", type=int, default=5)
+parser.add_argument("--corpus", type=int, default=50, help="Modules in the corpus")
+parser.add_argument("--splices", type=int, default=1)
+parser.add_argument("--seconds", type=float, default=3.0, help="Time per run")
+args = parser.parse_args()
+
+warnings.simplefilter("ignore", SyntaxWarning)
+
+
+def samples_per_second(sample) -> float:
+    n = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < args.seconds:
+        sample(n)
+        n += 1
+    return n / elapsed
+
+
+print(
+    f"{'depth':>5} {'mode':>9} {'index sec':>10} "
+    f"{'trees/sec':>10} {'sources/sec':>12}"
+)
+for depth in args.depth or [3, 4, 5]:
+    corpus = [
+        spew.generate.generate_module(depth, args.width, seed=seed)
+        for seed in range(args.corpus)
+    ]
+
+    def mutate(seed: int) -> ast.Module:
+        module = corpus[seed % len(corpus)]
+        return spew.mutation.mutate(module, args.splices, seed=seed, width=args.width)
+
+    start = time.perf_counter()
+    index = spew.crossover.CorpusIndex(corpus)
+    index_time = time.perf_counter() - start
+
+    def crossover(seed: int) -> ast.Module:
+        return spew.crossover.cross_over(
+            index, seed % len(index), n_splices=args.splices, seed=seed
+        )
+
+    for mode, sample, setup in (
+        ("mutate", mutate, 0.0),
+        ("crossover", crossover, index_time),
+    ):
+        trees = samples_per_second(sample)
+        sources = samples_per_second(lambda seed: ast.unparse(sample(seed)))
+        print(f"{depth:>5} {mode:>9} {setup:>10.2f} {trees:>10.1f} {sources:>12.1f}")
@@ -0,0 +1,53 @@
+"""
+Compare generating nodes one at a time, each with its own context, against
+spew.generate_many(), sequentially and with worker processes.
+
+python benchmarks/bench_generate_many.py --kind expr --nodes 20000 --depth 3
+"""
+
+import argparse
+import time
+
+import spew
+import spew.generate as g
+from spew.seeds import derive_seed
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--kind", choices=list(g.NODE_KINDS), default="expr")
+parser.add_argument("--nodes", type=int, default=20000)
+parser.add_argument("--depth", type=int, default=3)
+parser.add_argument("--width", type=int, default=5)
+parser.add_argument("--jobs", type=int, default=4)
+parser.add_argument("--repeat", type=int, default=3, help="Runs, the best is kept")
+args = parser.parse_args()
+
+config = (args.depth, args.width, None, (), False)
+generator = g.NODE_KINDS[args.kind]
+
+
+def one_at_a_time():
+    return [
+        generator(g._module_context(config, derive_seed(0, i)))
+        for i in range(args.nodes)
+    ]
+
+
+METHODS = {
+    "one context per node": one_at_a_time,
+    "generate_many": lambda: list(
+        spew.generate_many(args.kind, args.nodes, args.depth, 0, args.width)
+    ),
+    f"generate_many jobs={args.jobs}": lambda: list(
+        spew.generate_many(
+            args.kind, args.nodes, args.depth, 0, args.width, jobs=args.jobs
+        )
+    ),
+}
+
+for name, method in METHODS.items():
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        method()
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:>28}: {best:.3f}s, {args.nodes / best:,.0f} nodes/s")
@@ -0,0 +1,92 @@
+"""
+Measure the peak memory of generating and unparsing modules of growing size,
+with generate_module() + ast.unparse() against bounded-memory generation.
+
+Each run happens in a fresh process so the maximum RSS isn't carried over.
+RSS is only measured on POSIX systems, and shows as 0 elsewhere.
+
+python benchmarks/bench_memory.py --depth 4 --depth 5 --width 5 --width 10
+"""
+
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Not on Windows
+    resource = None
+
+import spew.generate
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--depth", type=int, action="append", default=[])
+parser.add_argument("--width", type=int, action="append", default=[])
+parser.add_argument(
+    "--no-tracemalloc",
+    action="store_true",
+    help="Only measure RSS, tracemalloc slows generation down a lot",
+)
+parser.add_argument(
+    "--seed", type=int, default=0, help="Both modes generate the module of this seed"
+)
+parser.add_argument("--run", nargs=3, metavar=("MODE", "DEPTH", "WIDTH"))
+args = parser.parse_args()
+
+
+def run(mode: str, depth: int, width: int) -> dict:
+    if not args.no_tracemalloc:
+        tracemalloc.start()
+    size = 0
+    with open(os.devnull, "w") as output:
+        if mode == "bounded":
+            for source in spew.generate.iter_module_source(
+                depth, width, seed=args.seed
+            ):
+                size += output.write(source + "\n")
+        else:
+            module = spew.generate.generate_module(depth, width, seed=args.seed)
+            size += output.write(ast.unparse(module))
+            del module
+    peak = tracemalloc.get_traced_memory()[1] if not args.no_tracemalloc else 0
+    maxrss = 0
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != "darwin":
+            maxrss *= 1024
+    return {"size": size, "tracemalloc_peak": peak, "maxrss": maxrss}
+
+
+if args.run:
+    mode, depth, width = args.run
+    print(json.dumps(run(mode, int(depth), int(width))))
+    sys.exit()
+
+
+def mb(n: int) -> str:
+    return f"{n / 2**20:.1f}"
+
+
+print(
+    f"{'depth':>5} {'width':>5} {'mode':>8} {'output MB':>10} "
+    f"{'traced MB':>10} {'RSS MB':>8} {'traced/output':>14}"
+)
+for depth in args.depth or [3, 4, 5]:
+    for width in args.width or [5, 10]:
+        for mode in ("default", "bounded"):
+            command = [sys.executable, __file__, "--run", mode, str(depth), str(width)]
+            command += ["--seed", str(args.seed)]
+            if args.no_tracemalloc:
+                command.append("--no-tracemalloc")
+            result = json.loads(subprocess.check_output(command))
+            ratio = result["tracemalloc_peak"] / max(1, result["size"])
+            print(
+                f"{depth:>5} {width:>5} {mode:>8} {mb(result['size']):>10} "
+                f"{mb(result['tracemalloc_peak']):>10} {mb(result['maxrss']):>8} "
+                f"{ratio:>14.2f}"
+            )
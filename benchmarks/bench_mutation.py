@@ -0,0 +1,52 @@
+"""
+Compare new samples per second from generating modules against mutating a
+module of about the same size, both ending with source code. Samples vary in
+size, so the speedup is that of bytes of output per second.
+
+python benchmarks/bench_mutation.py --depth 4 --width 5 --mutations 3
+"""
+
+import argparse
+import ast
+import time
+import warnings
+
+import spew.generate
+import spew.mutation
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--depth", type=int, action="append", default=[])
+parser.add_argument("--width", type=int, default=5)
+parser.add_argument("--mutations", type=int, default=1)
+parser.add_argument("--seconds", type=float, default=3.0, help="Time per run")
+args = parser.parse_args()
+
+warnings.simplefilter("ignore", SyntaxWarning)
+
+
+def samples_per_second(sample) -> tuple[float, float]:
+    n = size = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < args.seconds:
+        size += len(sample(n))
+        n += 1
+    return n / elapsed, size / n
+
+
+print(f"{'depth':>5} {'mode':>9} {'samples/sec':>12} {'avg bytes':>10} {'speedup':>8}")
+for depth in args.depth or [3, 4, 5]:
+    base = spew.generate.generate_module(depth, args.width, seed=0)
+    base_source = ast.unparse(base)
+    generate_rate, generate_size = samples_per_second(
+        lambda seed: spew.generate.generate_source(depth, args.width, seed=seed)
+    )
+    mutate_rate, mutate_size = samples_per_second(
+        lambda seed: ast.unparse(
+            spew.mutation.mutate(base, args.mutations, seed=seed, width=args.width)
+        )
+    )
+    print(f"{depth:>5} {'generate':>9} {generate_rate:>12.1f} {generate_size:>10.0f}")
+    print(
+        f"{depth:>5} {'mutate':>9} {mutate_rate:>12.1f} {mutate_size:>10.0f} "
+        f"{mutate_rate * mutate_size / (generate_rate * generate_size):>7.1f}x"
+    )
@@ -0,0 +1,58 @@
+"""
+Compare rendering a large module with ast.unparse() against the cached
+renderer, after mutating one node of it, copy-on-write with mutate() and in
+place with invalidate().
+
+python benchmarks/bench_render.py --lines 40000 --edits 50
+"""
+
+import argparse
+import ast
+import random
+import time
+
+import spew.mutation
+import spew.presets
+import spew.render
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--lines", type=int, default=40_000)
+parser.add_argument("--edits", type=int, default=50)
+parser.add_argument("--preset", default="realistic")
+args = parser.parse_args()
+
+
+def timed(render, tree: ast.AST) -> float:
+    start = time.perf_counter()
+    render(tree)
+    return time.perf_counter() - start
+
+
+module = ast.parse(spew.presets.generate_preset(args.preset, args.lines, seed=0))
+renderer = spew.render.Renderer()
+cold = timed(renderer.render, module)
+print(f"{args.lines} lines, first render {cold * 1000:.1f} ms")
+
+unparse = cached = 0.0
+for seed in range(args.edits):
+    mutated = spew.mutation.mutate(module, 1, seed=seed, depth=2, width=2)
+    unparse += timed(ast.unparse, mutated)
+    cached += timed(renderer.render, mutated)
+print(
+    f"    mutate(): {unparse / args.edits * 1000:8.2f} ms with ast.unparse, "
+    f"{cached / args.edits * 1000:8.2f} ms cached ({unparse / cached:.0f}x)"
+)
+
+rng = random.Random(0)
+names = [node for node in ast.walk(module) if isinstance(node, ast.Name)]
+unparse = cached = 0.0
+for i in range(args.edits):
+    name = rng.choice(names)
+    name.id = f"edited{i}"
+    renderer.invalidate(name)
+    unparse += timed(ast.unparse, module)
+    cached += timed(renderer.render, module)
+print(
+    f"    in place: {unparse / args.edits * 1000:8.2f} ms with ast.unparse, "
+    f"{cached / args.edits * 1000:8.2f} ms cached ({unparse / cached:.0f}x)"
+)
@@ -0,0 +1,55 @@
+"""
+Compare getting the tokens of generated modules by unparsing and tokenizing
+them against streaming them from the tree with spew.tokens, and with varied
+whitespace, continuations and comments.
+
+python benchmarks/bench_tokens.py --depth 5 --width 6 --repeat 5
+"""
+
+import argparse
+import ast
+import io
+import time
+import tokenize
+
+import spew.generate
+import spew.tokens
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--depth", type=int, default=5)
+parser.add_argument("--width", type=int, default=6)
+parser.add_argument("--modules", type=int, default=5, help="Modules per run")
+parser.add_argument("--repeat", type=int, default=5, help="Runs, the best is kept")
+args = parser.parse_args()
+
+trees = [
+    spew.generate.generate_module(args.depth, args.width, seed=seed)
+    for seed in range(args.modules)
+]
+n_tokens = sum(len(list(spew.tokens.iter_tokens(tree))) for tree in trees)
+
+
+def retokenize(tree):
+    source = ast.unparse(tree) + "\n"
+    return tokenize.generate_tokens(io.StringIO(source).readline)
+
+
+METHODS = {
+    "unparse+tokenize": retokenize,
+    "spew.tokens": spew.tokens.iter_tokens,
+    "spew.tokens styled": lambda tree: spew.tokens.iter_tokens(
+        tree, spew.tokens.TokenStyle(spaces=0.2, continuations=0.05, comments=0.1)
+    ),
+}
+
+print(f"{n_tokens} tokens per run")
+print(f"{'method':>20} {'tokens/sec':>12}")
+for name, method in METHODS.items():
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        for tree in trees:
+            for _ in method(tree):
+                pass
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:>20} {n_tokens / best:>12.0f}")
@@ -3,3 +3,7 @@ Spew - A generator for Python. It uses Python to generate valid Python code.
 """
 
 __version__ = "1.0.2"
+
+from spew.generate import generate_many
+from spew.mutation import mutate
+from spew.crossover import CorpusIndex, cross_over
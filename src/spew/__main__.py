@@ -1,9 +1,25 @@
+import spew.bench
 import spew.generate
+import spew.learn
+import spew.presets
+import spew.project
+import spew.runnable
+import spew.slow
+import spew.stress
+import spew.sweep
+import spew.tokens
+import spew.triage
+import spew.typed
+import spew.widths
 import ast
 from rich.console import Console
 from rich.syntax import Syntax
 import argparse
+import json
 import logging
+import os
+import pathlib
+import sys
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,6 +29,22 @@ parser.add_argument(
     "--depth", type=int, default=4, help="Maximum depth (nesting) of the module"
 )
 parser.add_argument("--width", type=int, default=10)
+parser.add_argument(
+    "--width-dist",
+    type=spew.widths.parse_option,
+    action="append",
+    default=[],
+    metavar="CONSTRUCT=SPEC",
+    help="Width distribution for a construct, e.g. body=geometric:3 (repeatable)",
+)
+parser.add_argument(
+    "--exclude",
+    action="append",
+    default=[],
+    choices=sorted(spew.generate.GRAMMAR_CONSTRUCTS),
+    metavar="CONSTRUCT",
+    help="Exclude a construct (e.g. match, trystar, await) from the output (repeatable)",
+)
 parser.add_argument("--log-level", type=str, default="INFO")
 parser.add_argument(
     "--output",
@@ -23,23 +55,547 @@ parser.add_argument(
 parser.add_argument(
     "--check", action="store_true", help="Check if the code is valid Python"
 )
-args = parser.parse_args()
+parser.add_argument(
+    "--compile-valid",
+    action="store_true",
+    help="Only generate code that compiles, not just parses",
+)
+parser.add_argument(
+    "--runnable",
+    action="store_true",
+    help="Generate a program that runs to completion, for use as a workload",
+)
+parser.add_argument(
+    "--target-runtime",
+    type=float,
+    default=None,
+    metavar="SECONDS",
+    help="With --runnable, repeat the workload to run for about this long",
+)
+parser.add_argument(
+    "--bounded-memory",
+    action="store_true",
+    help="Write the module one top-level statement at a time, for huge modules",
+)
+parser.add_argument(
+    "--learned",
+    type=pathlib.Path,
+    default=None,
+    metavar="PROFILE",
+    help="Pick constructs and widths with the weights of spew learn",
+)
+parser.add_argument(
+    "--seed", type=int, default=None, help="Seed, for reproducible output"
+)
+parser.add_argument(
+    "--jobs",
+    type=int,
+    default=1,
+    help="Worker processes generating top-level statements, 0 for one per CPU",
+)
 
-console = Console()
-logger.setLevel(args.log_level)
-logger.debug("Generating module with depth %s and width %s", args.depth, args.width)
-m = spew.generate.generate_module(
-    depth=args.depth, width=args.width, log_level=args.log_level
+subparsers = parser.add_subparsers(dest="command")
+project_parser = subparsers.add_parser(
+    "project", help="Generate a package tree of modules that import each other"
+)
+project_parser.add_argument("--modules", type=int, default=10)
+project_parser.add_argument("--packages", type=int, default=3)
+project_parser.add_argument(
+    "--package-depth", type=int, default=2, help="Maximum nesting of packages"
+)
+project_parser.add_argument(
+    "--fan-out", type=int, default=3, help="Maximum imports per module"
+)
+project_parser.add_argument(
+    "--fan-in-skew",
+    type=float,
+    default=1.0,
+    help="How strongly imports favour a few hub modules (0 is uniform)",
+)
+project_parser.add_argument(
+    "--cycles",
+    type=float,
+    default=0.0,
+    help="Probability of an import creating an import cycle",
+)
+project_parser.add_argument("--functions", type=int, default=3)
+project_parser.add_argument("--classes", type=int, default=1)
+project_parser.add_argument("--name", default="spewproject", help="Root package name")
+project_parser.add_argument(
+    "--output-dir", type=pathlib.Path, default=pathlib.Path(".")
+)
+stress_parser = subparsers.add_parser(
+    "stress", help="Generate a pathological module, grown along one dimension"
+)
+stress_parser.add_argument("profile", choices=sorted(spew.stress.STRESS_PROFILES))
+stress_parser.add_argument(
+    "--size",
+    type=int,
+    default=1000,
+    help="Size of the stressed dimension, e.g. items of a literal or match cases",
+)
+preset_parser = subparsers.add_parser(
+    "preset", help="Generate a module of a named shape and an exact size"
+)
+preset_parser.add_argument("preset", choices=sorted(spew.presets.PRESETS))
+preset_size = preset_parser.add_mutually_exclusive_group(required=True)
+preset_size.add_argument("--lines", type=int, help="Target size in lines")
+preset_size.add_argument("--bytes", type=int, help="Target size in bytes")
+preset_parser.add_argument(
+    "--tolerance",
+    type=float,
+    default=spew.presets.DEFAULT_TOLERANCE,
+    help="Allowed relative difference from the target size",
+)
+bench_parser = subparsers.add_parser(
+    "bench-target", help="Benchmark a tool on a seeded corpus, with a JSON report"
+)
+bench_parser.add_argument(
+    "--cmd",
+    required=True,
+    help="Command to benchmark, given each sample on stdin or as the path in {}",
+)
+bench_parser.add_argument(
+    "--corpus",
+    type=pathlib.Path,
+    required=True,
+    help="Directory of samples, generated with --seed if it has none",
+)
+bench_parser.add_argument("--samples", type=int, default=20)
+bench_parser.add_argument(
+    "--preset", choices=sorted(spew.presets.PRESETS), default="balanced"
+)
+bench_parser.add_argument("--lines", type=int, default=500, help="Lines per sample")
+bench_parser.add_argument("--repeat", type=int, default=3, help="Runs per sample")
+bench_parser.add_argument("--report", type=pathlib.Path, help="JSON report to write")
+bench_parser.add_argument(
+    "--baseline", type=pathlib.Path, help="JSON report to compare against"
+)
+sweep_parser = subparsers.add_parser(
+    "sweep", help="Find constructs a tool takes superlinear time on"
+)
+sweep_parser.add_argument(
+    "--cmd",
+    required=True,
+    help="Command to time, given each sample on stdin or as the path in {}",
+)
+sweep_parser.add_argument(
+    "--profile",
+    action="append",
+    choices=sorted(spew.stress.STRESS_PROFILES),
+    help="Stress profile to sweep, can be repeated, all by default",
+)
+sweep_parser.add_argument("--start", type=int, default=8, help="Smallest size")
+sweep_parser.add_argument(
+    "--factor", type=float, default=2.0, help="Growth factor between sizes"
+)
+sweep_parser.add_argument("--steps", type=int, default=8, help="Sizes per profile")
+sweep_parser.add_argument("--repeat", type=int, default=3, help="Runs per size")
+sweep_parser.add_argument(
+    "--max-cost",
+    type=float,
+    default=10.0,
+    help="Stop growing a profile once a run takes this many seconds",
+)
+sweep_parser.add_argument(
+    "--threshold",
+    type=float,
+    default=spew.sweep.DEFAULT_THRESHOLD,
+    help="Growth exponent above which a profile is flagged",
+)
+sweep_parser.add_argument("--report", type=pathlib.Path, help="JSON report to write")
+sweep_parser.add_argument(
+    "--save", type=pathlib.Path, help="Directory to write the blow-up inputs to"
 )
-code = ast.unparse(m)
+slow_parser = subparsers.add_parser(
+    "slow", help="Search for inputs a tool is slowest on per byte"
+)
+slow_parser.add_argument(
+    "--cmd",
+    required=True,
+    help="Command to time, given each sample on stdin or as the path in {}",
+)
+slow_parser.add_argument("--generations", type=int, default=20)
+slow_parser.add_argument(
+    "--population", type=int, default=16, help="Samples kept between generations"
+)
+slow_parser.add_argument(
+    "--keep", type=int, default=10, help="Slowest inputs to save and report"
+)
+slow_parser.add_argument("--repeat", type=int, default=1, help="Runs per sample")
+slow_parser.add_argument(
+    "--max-mutations", type=int, default=3, help="Mutations or splices per child"
+)
+slow_parser.add_argument(
+    "--save",
+    type=pathlib.Path,
+    default=pathlib.Path("slow-inputs"),
+    help="Directory to write the inputs and report.json to",
+)
+learn_parser = subparsers.add_parser(
+    "learn", help="Learn construct and width weights from a corpus of code"
+)
+learn_parser.add_argument(
+    "--from",
+    dest="corpus",
+    type=pathlib.Path,
+    required=True,
+    metavar="DIR",
+    help="Directory of .py files, e.g. the standard library",
+)
+learn_parser.add_argument(
+    "--save",
+    type=pathlib.Path,
+    default=pathlib.Path("learned.json"),
+    help="Profile to write, for --learned",
+)
+learn_parser.add_argument(
+    "--max-width",
+    type=int,
+    default=spew.learn.MAX_WIDTH,
+    help="Widths above this are counted as this",
+)
+tokens_parser = subparsers.add_parser(
+    "tokens", help="Write the tokens of a module, as python -m tokenize does"
+)
+tokens_parser.add_argument(
+    "--spaces", type=float, default=0.0, help="Probability of extra spaces"
+)
+tokens_parser.add_argument(
+    "--continuations",
+    type=float,
+    default=0.0,
+    help="Probability of a line continuation before a token",
+)
+tokens_parser.add_argument(
+    "--comments", type=float, default=0.0, help="Probability of comments on a line"
+)
+tokens_parser.add_argument(
+    "--indent",
+    type=int,
+    default=spew.tokens.UNPARSE_INDENT,
+    help="Spaces per indentation level",
+)
+triage_parser = subparsers.add_parser(
+    "triage", help="Bucket the crashes of a tool by signature, keeping the smallest"
+)
+triage_parser.add_argument(
+    "--cmd",
+    required=True,
+    help="Command to run, given each sample on stdin or as the path in {}",
+)
+triage_parser.add_argument(
+    "--corpus",
+    type=pathlib.Path,
+    help="Directory of samples already collected, otherwise samples are generated",
+)
+triage_parser.add_argument(
+    "--samples", type=int, default=100, help="Samples to generate"
+)
+triage_parser.add_argument(
+    "--frames",
+    type=int,
+    default=spew.triage.DEFAULT_FRAMES,
+    help="Innermost stack frames in a signature",
+)
+triage_parser.add_argument(
+    "--timeout",
+    type=float,
+    default=spew.triage.DEFAULT_TIMEOUT,
+    help="Seconds after which a run is killed, and crashes as a timeout",
+)
+triage_parser.add_argument(
+    "--save",
+    type=pathlib.Path,
+    default=pathlib.Path("crashes"),
+    help="Directory of the smallest sample per bucket and index.json, merged into",
+)
+typed_parser = subparsers.add_parser(
+    "typed", help="Generate a fully annotated module, for benchmarking type checkers"
+)
+typed_parser.add_argument("--protocols", type=int, default=2)
+typed_parser.add_argument("--generics", type=int, default=2, help="Generic classes")
+typed_parser.add_argument("--classes", type=int, default=4)
+typed_parser.add_argument("--functions", type=int, default=6)
+
+
+# Global options each mode ignores, rejected rather than silently dropped.
+# typed and --runnable output always compiles, so they accept --compile-valid.
+UNSUPPORTED_OPTIONS = {
+    "preset": ["--width-dist", "--exclude", "--jobs"],
+    "stress": ["--width-dist", "--exclude", "--jobs"],
+    "typed": ["--exclude", "--jobs"],
+    "--runnable": ["--exclude", "--jobs"],
+}
+
+
+def reject_unsupported(args: argparse.Namespace, mode: str, options: list[str]):
+    for option in options:
+        dest = option.lstrip("-").replace("-", "_")
+        if getattr(args, dest) != parser.get_default(dest):
+            parser.error(f"{option} can't be combined with {mode}")
+
+
+def main():
+    args = parser.parse_args()
+    if args.command in ("preset", "stress", "typed"):
+        reject_unsupported(
+            args,
+            args.command,
+            UNSUPPORTED_OPTIONS[args.command]
+            + ["--runnable", "--bounded-memory", "--learned"],
+        )
+    elif args.command is None and args.runnable:
+        reject_unsupported(args, "--runnable", UNSUPPORTED_OPTIONS["--runnable"])
+
+    console = Console()
+    jobs = args.jobs or os.cpu_count() or 1
+    logger.setLevel(args.log_level)
+    if args.command == "project":
+        plan = spew.project.plan_project(
+            args.name,
+            modules=args.modules,
+            packages=args.packages,
+            package_depth=args.package_depth,
+            fan_out=args.fan_out,
+            fan_in_skew=args.fan_in_skew,
+            cycles=args.cycles,
+            functions=args.functions,
+            seed=args.seed,
+        )
+        paths = spew.project.write_project(
+            args.output_dir,
+            plan,
+            depth=args.depth,
+            width=args.width,
+            classes=args.classes,
+            seed=args.seed,
+            jobs=jobs,
+        )
+        logger.info("Wrote %d modules to %s", len(paths), args.output_dir / args.name)
+        return
+
+    if args.command == "bench-target":
+        paths = spew.bench.load_corpus(args.corpus)
+        if not paths:
+            paths = spew.bench.write_corpus(
+                args.corpus, args.samples, args.preset, args.lines, seed=args.seed or 0
+            )
+            logger.info("Wrote %d samples to %s", len(paths), args.corpus)
+        report = spew.bench.bench_target(args.cmd, paths, repeat=args.repeat)
+        if args.report:
+            spew.bench.write_report(report, args.report)
+        baseline = None
+        if args.baseline:
+            baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        print(spew.bench.format_report(report, baseline))
+        return
+
+    if args.command == "sweep":
+        sweeps = spew.sweep.sweep_target(
+            args.cmd,
+            args.profile,
+            start=args.start,
+            factor=args.factor,
+            steps=args.steps,
+            seed=args.seed,
+            repeat=args.repeat,
+            max_cost=args.max_cost,
+            threshold=args.threshold,
+            compile_valid=args.compile_valid,
+        )
+        if args.report:
+            spew.sweep.write_sweep_report(sweeps, args.report)
+        if args.save:
+            for path in spew.sweep.save_blowups(sweeps, args.save):
+                logger.info("Wrote %s", path)
+        print(spew.sweep.format_sweeps(sweeps))
+        return
+
+    if args.command == "slow":
+        candidates = spew.slow.search_slow_inputs(
+            args.cmd,
+            generations=args.generations,
+            population=args.population,
+            keep=args.keep,
+            seed=args.seed,
+            repeat=args.repeat,
+            depth=args.depth,
+            width=args.width,
+            max_mutations=args.max_mutations,
+        )
+        spew.slow.save_slow_inputs(candidates, args.save)
+        logger.info("Wrote %d inputs to %s", len(candidates), args.save)
+        print(spew.slow.format_slow_inputs(candidates))
+        return
+
+    if args.command == "triage":
+        triage = spew.triage.load_triage(args.save)
+        if args.corpus:
+            spew.triage.triage_samples(
+                args.cmd,
+                spew.bench.load_corpus(args.corpus),
+                triage,
+                frames=args.frames,
+                timeout=args.timeout,
+            )
+        else:
+            spew.triage.fuzz_target(
+                args.cmd,
+                args.samples,
+                seed=args.seed or 0,
+                depth=args.depth,
+                width=args.width,
+                compile_valid=args.compile_valid,
+                triage=triage,
+                frames=args.frames,
+                timeout=args.timeout,
+            )
+        index = spew.triage.save_triage(triage, args.save)
+        logger.info("Wrote %d buckets to %s", len(triage.buckets), index)
+        print(spew.triage.format_triage(triage))
+        return
+
+    if args.command == "learn":
+        learned = spew.learn.learn_corpus(
+            args.corpus, jobs=jobs, max_width=args.max_width
+        )
+        spew.learn.save_learned(learned, args.save)
+        logger.info(
+            "Learned from %d files (%d skipped), wrote %s",
+            learned.files,
+            learned.skipped,
+            args.save,
+        )
+        return
+
+    if args.command == "tokens":
+        style = spew.tokens.TokenStyle(
+            args.spaces, args.continuations, args.comments, args.indent
+        )
+        output = args.output or sys.stdout
+        for token in spew.tokens.iter_module_tokens(
+            depth=args.depth,
+            width=args.width,
+            widths=dict(args.width_dist),
+            exclude=args.exclude,
+            compile_valid=args.compile_valid,
+            seed=args.seed,
+            jobs=jobs,
+            style=style,
+        ):
+            output.write(spew.tokens.format_token(token) + "\n")
+        return
+
+    if args.command == "preset":
+        code = spew.presets.generate_preset(
+            args.preset,
+            args.lines if args.lines is not None else args.bytes,
+            "lines" if args.lines is not None else "bytes",
+            seed=args.seed,
+            tolerance=args.tolerance,
+            compile_valid=args.compile_valid,
+        )
+        write_code(args, console, code)
+        return
+
+    logger.debug("Generating module with depth %s and width %s", args.depth, args.width)
+    if args.command == "stress":
+        try:
+            m = spew.stress.generate_stress(
+                args.profile,
+                args.size,
+                seed=args.seed,
+                compile_valid=args.compile_valid,
+            )
+        except ValueError as e:
+            parser.error(str(e))
+    elif args.command == "typed":
+        m = spew.typed.generate_typed_module(
+            depth=args.depth,
+            width=args.width,
+            protocols=args.protocols,
+            generics=args.generics,
+            classes=args.classes,
+            functions=args.functions,
+            widths=dict(args.width_dist),
+            seed=args.seed,
+        )
+    elif args.bounded_memory:
+        if args.runnable:
+            parser.error("--bounded-memory can't be combined with --runnable")
+        if args.learned is not None:
+            parser.error("--bounded-memory can't be combined with --learned")
+        for code in spew.generate.iter_module_source(
+            depth=args.depth,
+            width=args.width,
+            widths=dict(args.width_dist),
+            exclude=args.exclude,
+            compile_valid=args.compile_valid,
+            seed=args.seed,
+            jobs=jobs,
+        ):
+            if args.output:
+                args.output.write(code + "\n")
+            else:
+                console.print(Syntax(code, "python"))
+            if args.check:
+                # Top-level statements are independent, so check them one by one
+                if args.compile_valid:
+                    compile(code, "test.py", "exec")
+                else:
+                    ast.parse(code, "test.py")
+        if args.check:
+            logger.info("Code is valid Python")
+        return
+    elif args.learned is not None:
+        if args.runnable:
+            parser.error("--learned can't be combined with --runnable")
+        m = spew.learn.generate_learned_module(
+            spew.learn.load_learned(args.learned),
+            depth=args.depth,
+            width=args.width,
+            widths=dict(args.width_dist),
+            exclude=args.exclude,
+            compile_valid=args.compile_valid,
+            seed=args.seed,
+        )
+    elif args.runnable:
+        m = spew.runnable.generate_workload(
+            target_runtime=args.target_runtime,
+            depth=args.depth,
+            width=args.width,
+            widths=dict(args.width_dist),
+            seed=args.seed,
+        )
+    else:
+        m = spew.generate.generate_module(
+            depth=args.depth,
+            width=args.width,
+            log_level=args.log_level,
+            widths=dict(args.width_dist),
+            exclude=args.exclude,
+            compile_valid=args.compile_valid,
+            seed=args.seed,
+            jobs=jobs,
+        )
+    write_code(args, console, ast.unparse(m))
+
+
+def write_code(args: argparse.Namespace, console: Console, code: str):
+    if args.output:
+        args.output.write(code)
+    else:
+        syntax = Syntax(code, "python")
+        console.print(syntax)
 
+    if args.check:
+        if args.compile_valid:
+            compile(code, "test.py", "exec")
+        else:
+            ast.parse(code, "test.py")
+        logger.info("Code is valid Python")
 
-if args.output:
-    args.output.write(code)
-else:
-    syntax = Syntax(code, "python")
-    console.print(syntax)
 
-if args.check:
-    ast.parse(code, "test.py")
-    logger.info("Code is valid Python")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Benchmark a target tool (a formatter, linter, parser...) on a seeded corpus:
+latency percentiles per sample, throughput in lines and bytes per second and
+peak memory, written as a JSON report that can be compared across versions of
+the target.
+
+The target is either a command, given each sample on stdin or as a path in
+place of {}, or a callable given the source of each sample.
+"""
+
+import json
+import os
+import platform
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import typing
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import spew
+from spew.presets import generate_preset
+from spew.seeds import derive_seed
+
+# Metrics of a report compared against a baseline report
+COMPARED = ("p50", "p90", "p99", "lines_per_sec", "bytes_per_sec", "peak_memory")
+
+
+@dataclass
+class Run:
+    sample: str
+    seconds: float
+    # CPU time and max RSS of the target process, 0 for callables and when
+    # the platform has no os.wait4()
+    cpu_seconds: float = 0.0
+    peak_memory: int = 0
+    returncode: int = 0
+
+    @property
+    def cost(self) -> float:
+        """The CPU time of a command target, the wall time of a callable."""
+        return self.cpu_seconds or self.seconds
+
+
+@dataclass
+class Report:
+    target: str
+    corpus: str
+    samples: int
+    lines: int
+    bytes: int
+    repeat: int
+    p50: float
+    p90: float
+    p99: float
+    max: float
+    lines_per_sec: float
+    bytes_per_sec: float
+    peak_memory: int
+    failures: list[str]
+    runs: list[Run] = field(repr=False)
+    environment: dict[str, str] = field(default_factory=dict)
+
+
+def write_corpus(
+    directory: Path,
+    samples: int,
+    preset: str = "balanced",
+    size: int = 500,
+    unit: str = "lines",
+    seed: int = 0,
+    compile_valid: bool = True,
+) -> list[Path]:
+    """
+    Write samples of the preset's shape and size to directory. The i-th sample
+    only depends on the seed, so the corpus is the same on every machine. The
+    samples compile by default, as most tools reject code that doesn't.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(samples):
+        path = directory / f"sample_{i:04d}.py"
+        source = generate_preset(
+            preset, size, unit, derive_seed(seed, i), compile_valid=compile_valid
+        )
+        path.write_text(source, encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def load_corpus(directory: Path) -> list[Path]:
+    return sorted(directory.glob("*.py"))
+
+
+def _run_command(command: list[str], path: Path) -> Run:
+    args = [str(path) if arg == "{}" else arg for arg in command]
+    uses_stdin = args == command
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        args,
+        stdin=subprocess.PIPE if uses_stdin else subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    if uses_stdin:
+        try:
+            process.stdin.write(path.read_bytes())
+        except BrokenPipeError:
+            pass
+        process.stdin.close()
+    if not hasattr(os, "wait4"):
+        # No wait4() outside POSIX, so no CPU time or max RSS either
+        process.wait()
+        seconds = time.perf_counter() - start
+        return Run(str(path), seconds, returncode=process.returncode)
+    # wait4() gives the resource usage of this process alone
+    _, status, usage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    maxrss = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return Run(
+        str(path),
+        seconds,
+        usage.ru_utime + usage.ru_stime,
+        maxrss,
+        process.returncode,
+    )
+
+
+def _run_callable(
+    target: typing.Callable[[str], typing.Any], path: Path, trace_memory: bool
+) -> Run:
+    source = path.read_text(encoding="utf-8")
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    returncode = 0
+    try:
+        target(source)
+    except Exception:
+        returncode = 1
+    seconds = time.perf_counter() - start
+    peak = 0
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return Run(str(path), seconds, peak_memory=peak, returncode=returncode)
+
+
+def runner(
+    target: str | typing.Callable[[str], typing.Any], trace_memory: bool = False
+) -> typing.Callable[[Path], Run]:
+    """A function running the target once on a sample, see bench_target()."""
+    if isinstance(target, str):
+        command = shlex.split(target)
+        return lambda path: _run_command(command, path)
+    return lambda path: _run_callable(target, path, trace_memory)
+
+
+def _percentile(sorted_values: list[float], percent: int) -> float:
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    return statistics.quantiles(sorted_values, n=100, method="inclusive")[percent - 1]
+
+
+def bench_target(
+    target: str | typing.Callable[[str], typing.Any],
+    paths: list[Path],
+    repeat: int = 3,
+    trace_memory: bool = False,
+) -> Report:
+    """
+    Run the target on each sample repeat times. A command target is split like
+    a shell command; a {} argument is replaced by the path of the sample,
+    otherwise the sample is given on stdin. With trace_memory, the peak memory
+    of callable targets is traced with tracemalloc, which slows them down.
+    """
+    if not paths:
+        raise ValueError("The corpus is empty")
+    run = runner(target, trace_memory)
+    runs = [run(path) for _ in range(repeat) for path in paths]
+    sources = [path.read_bytes() for path in paths]
+    lines = sum(source.count(b"\n") for source in sources)
+    size = sum(len(source) for source in sources)
+    latencies = sorted(run.seconds for run in runs)
+    total = sum(latencies) / repeat
+    return Report(
+        target=target if isinstance(target, str) else repr(target),
+        corpus=str(Path(paths[0]).parent),
+        samples=len(paths),
+        lines=lines,
+        bytes=size,
+        repeat=repeat,
+        p50=_percentile(latencies, 50),
+        p90=_percentile(latencies, 90),
+        p99=_percentile(latencies, 99),
+        max=latencies[-1],
+        lines_per_sec=lines / total if total else 0.0,
+        bytes_per_sec=size / total if total else 0.0,
+        peak_memory=max(run.peak_memory for run in runs),
+        failures=sorted({run.sample for run in runs if run.returncode != 0}),
+        runs=runs,
+        environment={
+            "spew": spew.__version__,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+        },
+    )
+
+
+def write_report(report: Report, path: Path) -> None:
+    path.write_text(json.dumps(asdict(report), indent=2) + "\n", encoding="utf-8")
+
+
+def compare_reports(baseline: dict, report: dict) -> dict[str, float]:
+    """The ratio of each metric of report to that of baseline."""
+    return {
+        name: report[name] / baseline[name]
+        for name in COMPARED
+        if baseline.get(name) and report.get(name)
+    }
+
+
+def format_report(report: Report, baseline: dict | None = None) -> str:
+    ratios = compare_reports(baseline, asdict(report)) if baseline else {}
+    values = {
+        "p50": f"{report.p50 * 1000:.1f} ms",
+        "p90": f"{report.p90 * 1000:.1f} ms",
+        "p99": f"{report.p99 * 1000:.1f} ms",
+        "lines_per_sec": f"{report.lines_per_sec:.0f} lines/s",
+        "bytes_per_sec": f"{report.bytes_per_sec:.0f} bytes/s",
+        "peak_memory": f"{report.peak_memory / 2**20:.1f} MB",
+    }
+    lines = [
+        f"{report.samples} samples, {report.lines} lines, {report.bytes} bytes, "
+        f"{report.repeat} runs each"
+    ]
+    for name, value in values.items():
+        ratio = f" ({ratios[name]:.2f}x baseline)" if name in ratios else ""
+        lines.append(f"{name:>14}: {value}{ratio}")
+    if report.failures:
+        lines.append(f"{len(report.failures)} samples failed: {report.failures[0]}...")
+    return "\n".join(lines)
@@ -0,0 +1,261 @@
+"""
+Cross samples over by splicing a subtree of one into a compatible location of
+another, e.g. an expression for an expression or a match case for a match case,
+to combine features of inputs that already proved interesting.
+
+The corpus is indexed once, by category of subtree, so a splice is a couple of
+random picks instead of a walk over the trees.
+"""
+
+import ast
+import random
+import typing
+
+from spew.trees import (
+    COMPREHENSIONS,
+    CopyOnWrite,
+    Location,
+    ancestors_of,
+    is_async_generator,
+    node_names,
+    scope_nodes,
+)
+
+# Subtrees that are only valid where they are, whatever the category
+UNMOVABLE = (ast.Starred, ast.Slice, ast.MatchStar)
+# Subtrees that can't be moved without compiling errors in the new scope
+DECLARATIONS = (ast.Global, ast.Nonlocal, ast.NamedExpr)
+# Fields holding assignment targets. Generated trees have no ctx on their
+# names, so targets are told apart by position
+TARGET_FIELDS = ("target", "targets", "optional_vars")
+
+
+class _Scope(typing.NamedTuple):
+    # None at the module level, otherwise "function", "async", "async generator",
+    # "lambda" or "class"
+    kind: str | None = None
+    loop: bool = False
+    comprehension: bool = False
+    exceptstar: bool = False
+    annotation: bool = False
+
+
+def _category(node: ast.AST, target: bool, compile_valid: bool) -> str | None:
+    """The category of subtrees node can be swapped with, if any."""
+    if isinstance(node, UNMOVABLE):
+        return None
+    if isinstance(node, ast.Tuple) and any(
+        isinstance(elt, ast.Slice) for elt in node.elts
+    ):
+        # The slice of x[1:2, 3], unparsed as (1:2, 3) anywhere else
+        return None
+    if isinstance(node, ast.stmt):
+        return "stmt"
+    if isinstance(node, ast.expr):
+        return None if target else "expr"
+    if isinstance(node, ast.ExceptHandler):
+        # A bare except is only valid as the last handler of a try
+        return "excepthandler" if node.type is not None else None
+    if isinstance(node, (ast.comprehension, ast.withitem)):
+        return type(node).__name__
+    if compile_valid:
+        # Repeated keywords and pattern captures don't compile
+        return None
+    if isinstance(node, (ast.match_case, ast.keyword)):
+        return type(node).__name__
+    if isinstance(node, ast.pattern):
+        return "pattern"
+    return None
+
+
+def _enter(scope: _Scope, node: ast.AST, field: str) -> _Scope:
+    """The scope of node's field."""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and field == "body":
+        if isinstance(node, ast.FunctionDef):
+            return _Scope("function")
+        return _Scope("async generator" if is_async_generator(node) else "async")
+    if isinstance(node, ast.ClassDef) and field == "body":
+        return _Scope("class")
+    if isinstance(node, ast.Lambda) and field == "body":
+        return _Scope("lambda")
+    if isinstance(node, (ast.For, ast.AsyncFor, ast.While)) and field == "body":
+        return scope._replace(loop=True)
+    if isinstance(node, COMPREHENSIONS):
+        return scope._replace(comprehension=True)
+    if isinstance(node, ast.TryStar) and field == "handlers":
+        return scope._replace(loop=False, exceptstar=True)
+    if field in ("annotation", "returns"):
+        return scope._replace(annotation=True)
+    return scope
+
+
+class CorpusIndex:
+    """
+    The swappable subtrees of a corpus of samples, by category. With
+    compile_valid, categories are split by the scope of the subtree (loop,
+    function, async, etc.) and subtrees that can't move are left out, so
+    splicing samples that compile gives a sample that compiles.
+    """
+
+    def __init__(
+        self,
+        samples: typing.Iterable[str | ast.Module],
+        compile_valid: bool = False,
+    ):
+        self.compile_valid = compile_valid
+        self.samples: list[ast.Module] = []
+        self._is_source: list[bool] = []
+        # (sample, location) of the subtrees of each category
+        self.donors: dict[typing.Hashable, list[tuple[int, Location]]] = {}
+        # (category, location) of the subtrees of each sample, and the
+        # locations of each category in each sample
+        self.locations: list[list[tuple[typing.Hashable, Location]]] = []
+        self.categories: list[dict[typing.Hashable, list[Location]]] = []
+        # Names declared global or nonlocal in each sample
+        self.declared: list[set[str]] = []
+        self.nonlocals: list[set[str]] = []
+        for sample in samples:
+            self.add(sample)
+
+    def add(self, sample: str | ast.Module) -> int:
+        """Index one more sample, returning its index in the corpus."""
+        tree = ast.parse(sample) if isinstance(sample, str) else sample
+        i = len(self.samples)
+        self.samples.append(tree)
+        self._is_source.append(isinstance(sample, str))
+        locations, declared, nonlocals = self._index(tree)
+        categories: dict[typing.Hashable, list[Location]] = {}
+        for category, location in locations:
+            categories.setdefault(category, []).append(location)
+            self.donors.setdefault(category, []).append((i, location))
+        self.locations.append(locations)
+        self.categories.append(categories)
+        self.declared.append(declared)
+        self.nonlocals.append(nonlocals)
+        return i
+
+    def _index(self, tree: ast.Module):
+        found: list[tuple[typing.Hashable, Location, ast.AST]] = []
+        # Subtrees containing declarations, which can't be moved
+        pinned: set[int] = set()
+        declared: set[str] = set()
+        nonlocals: set[str] = set()
+        stack: list[tuple[ast.AST, Location | None, _Scope, bool]] = [
+            (tree, None, _Scope(), False)
+        ]
+        while stack:
+            node, link, scope, is_target = stack.pop()
+            for field in node._fields:
+                value = getattr(node, field, None)
+                if isinstance(value, list):
+                    children = enumerate(value)
+                elif isinstance(value, ast.AST):
+                    children = ((None, value),)
+                else:
+                    continue
+                child_scope = _enter(scope, node, field)
+                # Targets can be unpacked into nested targets
+                child_is_target = field in TARGET_FIELDS or (
+                    is_target and isinstance(node, (ast.Tuple, ast.List, ast.Starred))
+                )
+                for i, child in children:
+                    # Only a few kinds of expressions are valid in patterns
+                    if not isinstance(child, ast.AST) or (
+                        isinstance(node, ast.pattern) and isinstance(child, ast.expr)
+                    ):
+                        continue
+                    location = (link, node, field, i)
+                    category = _category(child, child_is_target, self.compile_valid)
+                    if category is not None:
+                        if self.compile_valid:
+                            category = (category, child_scope)
+                        found.append((category, location, child))
+                    if isinstance(child, DECLARATIONS):
+                        if not isinstance(child, ast.NamedExpr):
+                            declared.update(child.names)
+                        if isinstance(child, ast.Nonlocal):
+                            nonlocals.update(child.names)
+                        pinned.update(
+                            id(ancestor) for ancestor, _, _ in ancestors_of(location)
+                        )
+                        pinned.add(id(child))
+                    # Same in f-strings
+                    if not isinstance(child, ast.JoinedStr):
+                        stack.append((child, location, child_scope, child_is_target))
+        locations = [
+            (category, location)
+            for category, location, node in found
+            if not (self.compile_valid and id(node) in pinned)
+        ]
+        return locations, declared, nonlocals
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+
+def _splice(
+    index: CorpusIndex,
+    tree: CopyOnWrite,
+    target: int,
+    rng: random.Random,
+    donor: int | None,
+    replaced: set[int],
+) -> bool:
+    category, location = rng.choice(index.locations[target])
+    if donor is None:
+        candidates = index.donors.get(category)
+        if not candidates:
+            return False
+        _, (_, parent, field, i) = rng.choice(candidates)
+    else:
+        candidates = index.categories[donor].get(category)
+        if not candidates:
+            return False
+        _, parent, field, i = rng.choice(candidates)
+    new = getattr(parent, field)[i] if i is not None else getattr(parent, field)
+    ancestors = ancestors_of(location)
+    parent, field, i = ancestors[-1]
+    old = getattr(parent, field)[i] if i is not None else getattr(parent, field)
+    if old is new or any(id(node) in replaced for node, _, _ in ancestors):
+        return False
+    if index.compile_valid and index.declared[target]:
+        # Using a name before its global declaration or dropping the binding of
+        # a nonlocal doesn't compile
+        if index.declared[target].intersection(node_names(ast.walk(new))):
+            return False
+        if index.nonlocals[target].intersection(node_names([old, *scope_nodes(old)])):
+            return False
+    tree.replace(ancestors, new)
+    replaced.add(id(old))
+    return True
+
+
+def cross_over(
+    index: CorpusIndex,
+    target: int,
+    donor: int | None = None,
+    n_splices: int = 1,
+    seed: int | None = None,
+) -> str | ast.Module:
+    """
+    Replace n_splices random subtrees of the target-th sample of the corpus
+    with compatible subtrees of the donor-th sample, or of any sample.
+
+    Returns source if the target was added as source, otherwise a new tree that
+    shares the unchanged subtrees with the target and the spliced ones with the
+    donors, so neither should be modified in place.
+    """
+    rng = random.Random(seed)
+    tree = CopyOnWrite(index.samples[target])
+    replaced: set[int] = set()
+    # Splices can pick a location without compatible donors or inside an
+    # already replaced subtree, give up after a few of those
+    attempts = 0
+    while len(replaced) < n_splices and attempts < 10 * n_splices:
+        attempts += 1
+        if not index.locations[target]:
+            break
+        _splice(index, tree, target, rng, donor, replaced)
+    if index._is_source[target]:
+        return ast.unparse(tree.root)
+    return tree.root
@@ -1,14 +1,17 @@
 import ast
+import collections
+import concurrent.futures
+import gc
 import random as _random
 import sys
-from contextlib import contextmanager
 import typing
 from spew.names import generate as make_name
 import logging
 import enum
-from spew.randomcycle import rcycle
+from spew.randomcycle import RandomCycle, rcycle
+from spew.seeds import derive_seed
+from spew.widths import Distribution
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 MAX_DEPTH = 3
 DEFAULT_WIDTH = 20
@@ -18,6 +21,12 @@ class GeneratorConstraints(enum.Flag):
     ANY = enum.auto()
     ONLY_IN_LOOPS = enum.auto()
     ONLY_IN_FUNCTIONS = enum.auto()
+    # The following are only used in compile-valid mode
+    ONLY_IN_ASYNC_FUNCTIONS = enum.auto()
+    ONLY_IN_GENERATORS = enum.auto()
+    ONLY_IN_SYNC_GENERATORS = enum.auto()
+    ONLY_IN_NESTED_FUNCTIONS = enum.auto()
+    OUTSIDE_COMPREHENSIONS = enum.auto()
 
 
 OPERATORS = [
@@ -49,64 +58,333 @@ CMPOPS = [
 ]
 
 
+T = typing.TypeVar("T")
+
+
+# The state the scopes of compile-valid mode set, see Context
+CLASS_STATE = {
+    "in_loop": False,
+    "in_function": False,
+    "in_async": False,
+    "in_generator": False,
+}
+LAMBDA_STATE = {"in_async": False, "in_generator": True}
+COMPREHENSION_STATE = {"in_comprehension": True}
+# break, continue and return can't leave an except* block
+EXCEPTSTAR_STATE = {"in_loop": False, "in_function": False}
+
+
 class Context:
+    """
+    The state of generation. Scopes are entered with the context managers
+    nested(), inloop(), infunction()...: they save the state they change on
+    frames, a stack, and restore it on exit, even if generation raises.
+    """
+
+    __slots__ = (
+        "depth",
+        "in_loop",
+        "in_function",
+        "names",
+        "max_depth",
+        "width",
+        "widths",
+        "grammar",
+        "compile_valid",
+        "in_async",
+        "in_generator",
+        "in_comprehension",
+        "function_frames",
+        "seed",
+        "rng",
+        "blocks",
+        "cycles",
+        "focus",
+        "prune_names",
+        "frames",
+    )
+
     depth: int
     in_loop: bool
     names: list[str]
-    max_depth: int = MAX_DEPTH
-    width: int = DEFAULT_WIDTH
-
-    def __init__(self):
+    max_depth: int
+    width: int
+    widths: dict[str, Distribution]
+    grammar: "Grammar"
+    # Compile-valid mode tracks the scope state that compile() checks, on top of
+    # in_loop and in_function.
+    compile_valid: bool
+    in_async: bool
+    in_generator: bool
+    in_comprehension: bool
+    function_frames: list[list[str]]
+    # Seed of the statement being generated, the RNG it seeds, and the number
+    # of blocks of the statement generated so far
+    seed: int
+    rng: _random.Random
+    blocks: int
+    # Each context keeps its own position in the module-level cycles
+    cycles: dict[RandomCycle, typing.Iterator]
+    # Path to the only statement to generate, see generate_subtree()
+    focus: tuple[tuple[int, int], ...] | None
+    # Forget names bound in functions, classes, lambdas and comprehensions on
+    # leaving them, so the list of names stays small on huge modules.
+    prune_names: bool
+    # The state saved by the scopes entered, innermost last
+    frames: list
+
+    def __init__(self, seed: int | None = None):
+        self.seed = _random.getrandbits(64) if seed is None else seed
+        self.rng = _random.Random(self.seed)
+        self.blocks = 0
+        self.cycles = {}
         self.depth = 0
+        self.max_depth = MAX_DEPTH
         self.width = DEFAULT_WIDTH
         self.in_loop = False
         self.in_function = False
         self.names = []
-
-    @contextmanager
-    def nested(self):
-        if self.depth + 1 > self.max_depth:
+        self.widths = {}
+        self.grammar = get_grammar()
+        self.compile_valid = False
+        self.in_async = False
+        self.in_generator = False
+        self.in_comprehension = False
+        self.function_frames = []
+        self.focus = None
+        self.prune_names = False
+        self.frames = []
+
+    def draw(self, cycle: RandomCycle[T]) -> T:
+        """The next item of a random cycle, for this context."""
+        iterator = self.cycles.get(cycle)
+        if iterator is None:
+            iterator = self.cycles[cycle] = cycle.iterate(self.rng)
+        return next(iterator)
+
+    def constraints(self) -> GeneratorConstraints:
+        """The constraints satisfied by the current state."""
+        satisfied = GeneratorConstraints.ANY
+        if self.in_loop:
+            satisfied |= GeneratorConstraints.ONLY_IN_LOOPS
+        if self.in_function:
+            satisfied |= GeneratorConstraints.ONLY_IN_FUNCTIONS
+            if len(self.function_frames) > 1:
+                satisfied |= GeneratorConstraints.ONLY_IN_NESTED_FUNCTIONS
+        if self.in_async:
+            satisfied |= GeneratorConstraints.ONLY_IN_ASYNC_FUNCTIONS
+        if self.in_generator:
+            satisfied |= GeneratorConstraints.ONLY_IN_GENERATORS
+            if not self.in_async:
+                satisfied |= GeneratorConstraints.ONLY_IN_SYNC_GENERATORS
+        if not self.in_comprehension:
+            satisfied |= GeneratorConstraints.OUTSIDE_COMPREHENSIONS
+        return satisfied
+
+    def nested(self) -> "_Nested":
+        return _Nested(self)
+
+    def inloop(self) -> "_Loop":
+        return _Loop(self)
+
+    def infunction(
+        self, is_async: bool = False, is_generator: bool = True
+    ) -> "_Function":
+        """
+        Enter a function body. Yields the list of names that nested functions
+        declare nonlocal, which the function body must bind.
+        """
+        return _Function(self, is_async, is_generator)
+
+    def inclass(self) -> "_Scope":
+        return _Scope(self, CLASS_STATE) if self.compile_valid else _NO_SCOPE
+
+    def inlambda(self) -> "_Scope":
+        return _Scope(self, LAMBDA_STATE) if self.compile_valid else _NO_SCOPE
+
+    def incomprehension(self) -> "_Scope":
+        if not self.compile_valid:
+            return _NO_SCOPE
+        return _Scope(self, COMPREHENSION_STATE)
+
+    def localnames(self) -> "_LocalNames":
+        """Enter a scope whose names can't be referenced once it's left."""
+        return _LocalNames(self) if self.prune_names else _NO_SCOPE
+
+    def inexceptstar(self) -> "_Scope":
+        return _Scope(self, EXCEPTSTAR_STATE) if self.compile_valid else _NO_SCOPE
+
+
+class _NoScope:
+    """A scope that changes nothing, shared by all contexts."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_SCOPE = _NoScope()
+
+
+class _Nested:
+    """One level deeper, see Context.nested()."""
+
+    __slots__ = ("ctx",)
+
+    def __init__(self, ctx: Context):
+        self.ctx = ctx
+
+    def __enter__(self):
+        ctx = self.ctx
+        if ctx.depth >= ctx.max_depth:
             logger.debug("Max depth exceeded", stack_info=True)
-        self.depth += 1
-        yield
-        self.depth -= 1
+        ctx.depth += 1
+
+    def __exit__(self, *exc):
+        self.ctx.depth -= 1
+
+
+class _Loop:
+    """The body of a loop, see Context.inloop()."""
+
+    __slots__ = ("ctx",)
+
+    def __init__(self, ctx: Context):
+        self.ctx = ctx
+
+    def __enter__(self):
+        ctx = self.ctx
+        ctx.frames.append(ctx.in_loop)
+        ctx.in_loop = True
+
+    def __exit__(self, *exc):
+        ctx = self.ctx
+        ctx.in_loop = ctx.frames.pop()
+
+
+class _Scope:
+    """Set some of the state of a context, and restore it on exit."""
+
+    __slots__ = ("ctx", "state")
+
+    def __init__(self, ctx: Context, state: dict[str, bool]):
+        self.ctx = ctx
+        self.state = state
+
+    def __enter__(self):
+        ctx = self.ctx
+        ctx.frames.append([getattr(ctx, name) for name in self.state])
+        for name, value in self.state.items():
+            setattr(ctx, name, value)
+
+    def __exit__(self, *exc):
+        ctx = self.ctx
+        for name, value in zip(self.state, ctx.frames.pop()):
+            setattr(ctx, name, value)
+
 
-    @contextmanager
-    def inloop(self):
-        _prev_state = self.in_loop
-        self.in_loop = True
-        yield
-        self.in_loop = _prev_state
+class _Function:
+    """A function body, see Context.infunction()."""
 
-    @contextmanager
-    def infunction(self):
-        _prev_state = self.in_function
-        self.in_function = True
-        yield
-        self.in_function = _prev_state
+    __slots__ = ("ctx", "is_async", "is_generator")
+
+    def __init__(self, ctx: Context, is_async: bool, is_generator: bool):
+        self.ctx = ctx
+        self.is_async = is_async
+        self.is_generator = is_generator
+
+    def __enter__(self) -> list[str]:
+        ctx = self.ctx
+        bindings: list[str] = []
+        if not ctx.compile_valid:
+            ctx.frames.append(ctx.in_function)
+            ctx.in_function = True
+            return bindings
+        ctx.function_frames.append(bindings)
+        ctx.frames.append(
+            (
+                ctx.in_loop,
+                ctx.in_function,
+                ctx.in_async,
+                ctx.in_generator,
+                ctx.in_comprehension,
+            )
+        )
+        ctx.in_loop = False
+        ctx.in_function = True
+        ctx.in_async = self.is_async
+        ctx.in_generator = self.is_generator
+        ctx.in_comprehension = False
+        return bindings
+
+    def __exit__(self, *exc):
+        ctx = self.ctx
+        if not ctx.compile_valid:
+            ctx.in_function = ctx.frames.pop()
+            return
+        (
+            ctx.in_loop,
+            ctx.in_function,
+            ctx.in_async,
+            ctx.in_generator,
+            ctx.in_comprehension,
+        ) = ctx.frames.pop()
+        ctx.function_frames.pop()
+
+
+class _LocalNames:
+    """A scope whose names are dropped on exit, see Context.localnames()."""
+
+    __slots__ = ("ctx",)
+
+    def __init__(self, ctx: Context):
+        self.ctx = ctx
+
+    def __enter__(self):
+        ctx = self.ctx
+        ctx.frames.append(len(ctx.names))
+
+    def __exit__(self, *exc):
+        ctx = self.ctx
+        del ctx.names[ctx.frames.pop() :]
 
 
 def make_text(ctx: Context) -> str:
     return make_name(ctx, new=True)  # TODO : Do better
 
 
+# True picks the branch with more nodes, so that shrinking booleans to False
+# (see spew.strategies) shrinks the code
 boolcycle = rcycle([True, False])
 
 
 def randbool(ctx: Context) -> bool:
-    return next(boolcycle)
-
-
-T = typing.TypeVar("T")
+    return ctx.draw(boolcycle)
 
 
 def randchoice(ctx: Context, choices: typing.Sequence[T]) -> T:
-    return _random.choice(choices)
+    return ctx.rng.choice(choices)
 
 
 def randint(ctx: Context, a: int, b: int) -> int:
-    # TODO: Use context for reproducible results
-    return _random.randint(a, b)
+    return ctx.rng.randint(a, b)
+
+
+def sample_width(ctx: Context, construct: str, low: int, high: int) -> int:
+    """
+    Pick the number of items for a construct, using the distribution configured
+    in ctx.widths or falling back to a uniform pick between low and high.
+    """
+    dist = ctx.widths.get(construct)
+    if dist is not None:
+        return dist.sample(ctx.rng)
+    if low == high:
+        return low
+    return randint(ctx, low, high)
 
 
 def generate_arg(ctx: Context, allow_annotations=False) -> ast.arg:
@@ -120,31 +398,49 @@ def generate_arg(ctx: Context, allow_annotations=False) -> ast.arg:
 TFunc = typing.TypeVar("TFunc", ast.FunctionDef, ast.AsyncFunctionDef)
 
 
+def _generate_binding(name: str) -> ast.Assign:
+    asgn = ast.Assign()
+    asgn.lineno = 1
+    asgn.targets = [ast.Name(id=name)]
+    asgn.value = ast.Constant(value=None)
+    return asgn
+
+
 def _generate_function(f: TFunc, ctx: Context) -> TFunc:
-    f.args = ast.arguments()
-    n_args = randint(ctx, 0, ctx.width)
-    f.args.args = [generate_arg(ctx, True) for _ in range(n_args)]
-    f.args.posonlyargs = []
-    f.args.kwonlyargs = []
-    if randbool(ctx):
-        f.args.defaults = [
-            generate_constant(ctx, values_only=True) for _ in range(n_args)
-        ]
-    else:
-        f.args.defaults = []
     f.name = make_name(ctx, new=True)
-    with ctx.infunction():
-        f.body = generate_nested_stmts(ctx)
-    if randbool(ctx):
-        f.decorator_list = []
-    else:
-        f.decorator_list = [
-            generate_expr(ctx) for _ in range(randint(ctx, 1, 3))
-        ]  # TODO: vary length
+    f.args = ast.arguments()
+    n_args = sample_width(ctx, "args", 0, ctx.width)
+    with ctx.localnames():
+        f.args.args = [generate_arg(ctx, True) for _ in range(n_args)]
+        f.args.posonlyargs = []
+        f.args.kwonlyargs = []
+        if randbool(ctx):
+            f.args.defaults = [
+                generate_constant(ctx, values_only=True) for _ in range(n_args)
+            ]
+        else:
+            f.args.defaults = []
+        is_async = isinstance(f, ast.AsyncFunctionDef)
+        # An async generator can't return a value, so decide up front which it is
+        is_generator = not is_async or randbool(ctx)
+        with ctx.infunction(is_async, is_generator) as bindings:
+            f.body = generate_nested_stmts(ctx)
+    if bindings:
+        # Appended so statement indexes stay those of the generated body
+        f.body.extend(_generate_binding(name) for name in bindings)
+    f.decorator_list = generate_decorators(ctx, 3)
     f.lineno = 1
     return f
 
 
+def generate_decorators(ctx: Context, high: int) -> list[ast.expr]:
+    if "decorators" in ctx.widths or randbool(ctx):
+        return [
+            generate_expr(ctx) for _ in range(sample_width(ctx, "decorators", 1, high))
+        ]
+    return []  # 50/50 chance of no decorator list
+
+
 def generate_function(ctx: Context) -> ast.FunctionDef:
     f = ast.FunctionDef()
     return _generate_function(f, ctx)
@@ -158,18 +454,14 @@ def generate_asyncfunction(ctx: Context) -> ast.AsyncFunctionDef:
 def generate_class(ctx: Context) -> ast.ClassDef:
     c = ast.ClassDef()
     c.name = make_name(ctx, new=True)
-    if randbool(ctx):  # 50/50 chance of no bases
-        c.bases = []
-    else:
+    if randbool(ctx):
         c.bases = [generate_expr(ctx) for _ in range(randint(ctx, 0, 3))]
+    else:  # 50/50 chance of no bases
+        c.bases = []
     c.keywords = []
-    c.body = generate_nested_stmts(ctx)
-    if randbool(ctx):  # 50/50 chance of no decorator list
-        c.decorator_list = []
-    else:
-        c.decorator_list = [
-            generate_expr(ctx) for _ in range(randint(ctx, 1, ctx.width))
-        ]
+    with ctx.inclass(), ctx.localnames():
+        c.body = generate_nested_stmts(ctx)
+    c.decorator_list = generate_decorators(ctx, ctx.width)
     c.lineno = 1
     return c
 
@@ -197,7 +489,7 @@ def generate_attribute(ctx: Context) -> ast.Attribute:
     a = ast.Attribute()
     a.value = generate_expr(ctx)
     a.attr = make_name(ctx)
-    a.ctx = next(gen_cycle)()
+    a.ctx = ctx.draw(gen_cycle)()
     return a
 
 
@@ -208,10 +500,10 @@ def generate_subscript(ctx: Context) -> ast.Subscript:
     s = ast.Subscript()
     s.value = generate_expr(ctx)
     if randbool(ctx):
-        s.slice = generate_constant(ctx)  # TODO : Generate Tuple elts slice
-    else:
         s.slice = generate_slice(ctx)
-    s.ctx = next(generate_subscript_ctx)()
+    else:
+        s.slice = generate_constant(ctx)  # TODO : Generate Tuple elts slice
+    s.ctx = ctx.draw(generate_subscript_ctx)()
     return s
 
 
@@ -219,11 +511,11 @@ def generate_assign(ctx: Context) -> ast.Assign:
     asgn = ast.Assign()
     asgn.lineno = 1
     if randbool(ctx):
-        asgn.targets = [generate_name(ctx, new=True)]
-    else:
         asgn.targets = [
             generate_name(ctx, new=True) for _ in range(randint(ctx, 1, ctx.width))
         ]
+    else:
+        asgn.targets = [generate_name(ctx, new=True)]
     asgn.value = generate_expr(ctx)
     return asgn
 
@@ -235,14 +527,14 @@ def generate_augassign(ctx: Context) -> ast.AugAssign:
     asgn = ast.AugAssign()
     asgn.lineno = 1
     if randbool(ctx):
-        asgn.target = generate_name(ctx, new=True)
-    else:
         if randbool(ctx):
             asgn.target = generate_attribute(ctx)
         else:
             asgn.target = generate_subscript(ctx)
+    else:
+        asgn.target = generate_name(ctx, new=True)
     asgn.value = generate_expr(ctx)
-    asgn.op = next(operators_cycle)()
+    asgn.op = ctx.draw(operators_cycle)()
     return asgn
 
 
@@ -250,23 +542,23 @@ def generate_annassign(ctx: Context) -> ast.AnnAssign:
     asgn = ast.AnnAssign()
     asgn.lineno = 1
     if randbool(ctx):
-        asgn.target = generate_name(ctx, new=True)
-    else:
         if randbool(ctx):
             asgn.target = generate_attribute(ctx)
         else:
             asgn.target = generate_subscript(ctx)
+    else:
+        asgn.target = generate_name(ctx, new=True)
 
     # simple is a boolean integer set to True for a Name node in target
     # that do not appear in between parenthesis and are hence pure names
     # and not expressions.
     if randbool(ctx):
-        asgn.simple = 1
-        asgn.value = generate_name(ctx)
-    else:
         asgn.simple = 0
         # value is a single optional node
         asgn.value = generate_expr(ctx)
+    else:
+        asgn.simple = 1
+        asgn.value = generate_name(ctx)
     asgn.annotation = generate_expr(ctx)
     return asgn
 
@@ -314,7 +606,7 @@ constant_values_with_ellipsis_cycle = rcycle(
 
 def generate_constant(ctx: Context, values_only=False) -> ast.Constant:
     c = ast.Constant()
-    c.value = next(constant_values_cycle)
+    c.value = ctx.draw(constant_values_cycle)
     return c
 
 
@@ -326,7 +618,7 @@ def generate_str_constant(ctx: Context) -> ast.Constant:
 
 def generate_return(ctx: Context) -> ast.Return:
     r = ast.Return()
-    if randbool(ctx):
+    if randbool(ctx) and not (ctx.compile_valid and ctx.in_async and ctx.in_generator):
         r.value = generate_expr(ctx)
     return r
 
@@ -344,15 +636,32 @@ def generate_raise(ctx: Context) -> ast.Raise:
     return r
 
 
+def _make_unused_name(ctx: Context) -> str:
+    """A fresh name that won't be picked again for use elsewhere."""
+    name = make_name(ctx, new=True)
+    ctx.names.pop()
+    return name
+
+
 def generate_global(ctx: Context) -> ast.Global:
     g = ast.Global()
-    g.names = [make_name(ctx)]  # TODO: Vary length
+    if ctx.compile_valid:
+        # The name can't be used before the declaration, and the symbol table
+        # doesn't visit statements in source order (e.g. try/else)
+        g.names = [_make_unused_name(ctx)]
+    else:
+        g.names = [make_name(ctx)]  # TODO: Vary length
     return g
 
 
 def generate_nonlocal(ctx: Context) -> ast.Nonlocal:
     n = ast.Nonlocal()
-    n.names = [make_name(ctx)]  # TODO: Vary length
+    if ctx.compile_valid:
+        # Use an unused name and have the enclosing function bind it
+        n.names = [_make_unused_name(ctx)]
+        ctx.function_frames[-2].extend(n.names)
+    else:
+        n.names = [make_name(ctx)]  # TODO: Vary length
     return n
 
 
@@ -462,7 +771,11 @@ def _generate_try(ctx: Context, t: TTry) -> TTry:
         handler.type = generate_expr(ctx)
         if randbool(ctx):
             handler.name = make_name(ctx, new=True)
-        handler.body = generate_nested_stmts(ctx)
+        if isinstance(t, ast.Try):
+            handler.body = generate_nested_stmts(ctx)
+        else:
+            with ctx.inexceptstar():
+                handler.body = generate_nested_stmts(ctx)
         t.handlers.append(handler)
     if randbool(ctx):
         t.orelse = generate_nested_stmts(ctx)
@@ -522,7 +835,7 @@ closed_patterns_cycle = rcycle(CLOSED_PATTERNS)
 
 
 def generate_closed_pattern(ctx: Context) -> typing.Union[ast.pattern, ast.Constant]:
-    return next(closed_patterns_cycle)(ctx)
+    return ctx.draw(closed_patterns_cycle)(ctx)
 
 
 def generate_matchvalue(ctx: Context) -> ast.MatchValue:
@@ -536,7 +849,7 @@ singleton_cycle = rcycle([None, True, False])
 
 def generate_matchsingleton(ctx: Context) -> ast.MatchSingleton:
     m = ast.MatchSingleton()
-    m.value = next(singleton_cycle)
+    m.value = ctx.draw(singleton_cycle)
     return m
 
 
@@ -558,7 +871,7 @@ match_const_cycle = rcycle(MATCH_CONST_GENERATORS)
 def generate_matchsequence(ctx: Context) -> ast.MatchSequence:
     m = ast.MatchSequence()
     m.patterns = [
-        next(match_const_cycle)(ctx)
+        ctx.draw(match_const_cycle)(ctx)
         for _ in range(randint(ctx, 1, 3))  # TODO: Vary length
     ]
     if randbool(ctx):
@@ -580,10 +893,14 @@ def generate_matchmapping(ctx: Context) -> ast.MatchMapping:
     m.patterns = []
     for _ in range(randint(ctx, 1, 3)):  # TODO: Vary length
         with ctx.nested():
-            m.keys.append(
-                generate_constant(ctx, values_only=True)
-            )  # TODO: Handle value_pattern tokens
-            m.patterns.append(next(mapping_generator_cycle)(ctx))
+            if ctx.compile_valid:
+                # Keys must be unique, so use fresh strings
+                m.keys.append(generate_str_constant(ctx))
+            else:
+                m.keys.append(
+                    generate_constant(ctx, values_only=True)
+                )  # TODO: Handle value_pattern tokens
+            m.patterns.append(ctx.draw(mapping_generator_cycle)(ctx))
     if randbool(ctx):
         m.rest = make_name(ctx)
     return m
@@ -595,30 +912,38 @@ def generate_matchclass(ctx: Context) -> ast.MatchClass:
     m.patterns = []
     for _ in range(randint(ctx, 1, 3)):  # TODO: Vary length
         with ctx.nested():
-            m.patterns.append(next(match_const_cycle)(ctx))
+            m.patterns.append(ctx.draw(match_const_cycle)(ctx))
     m.kwd_attrs = []
     m.kwd_patterns = []
     for _ in range(randint(ctx, 1, 3)):  # TODO: Vary length
         with ctx.nested():
-            m.kwd_attrs.append(make_name(ctx))
-            m.kwd_patterns.append(next(match_const_cycle)(ctx))
+            m.kwd_attrs.append(make_name(ctx, new=ctx.compile_valid))
+            m.kwd_patterns.append(ctx.draw(match_const_cycle)(ctx))
     return m
 
 
 def generate_matchas(ctx: Context) -> ast.MatchAs:
     m = ast.MatchAs()
     if randbool(ctx):
-        m.pattern = next(closed_patterns_cycle)(ctx)
+        m.pattern = ctx.draw(closed_patterns_cycle)(ctx)
     if randbool(ctx):
         m.name = make_name(ctx, new=True)
     return m
 
 
+refutable_patterns_cycle = rcycle([generate_literal_pattern, generate_value_pattern])
+
+
 def generate_matchor(ctx: Context) -> ast.MatchOr:
     m = ast.MatchOr()
     m.patterns = []
+    # Alternatives must bind the same names and only the last can be irrefutable,
+    # so stick to ones that bind nothing
+    patterns_cycle = (
+        refutable_patterns_cycle if ctx.compile_valid else closed_patterns_cycle
+    )
     for _ in range(randint(ctx, 1, 3)):  # TODO: Vary length
-        m.patterns.append(next(closed_patterns_cycle)(ctx))
+        m.patterns.append(ctx.draw(patterns_cycle)(ctx))
     return m
 
 
@@ -650,17 +975,38 @@ def generate_matchpattern(ctx: Context) -> ast.pattern:
     | MatchAs(pattern? pattern, identifier? name)
     | MatchOr(pattern* patterns)
     """
-    return next(match_cycle)(ctx)
+    return ctx.draw(match_cycle)(ctx)
+
+
+def _is_irrefutable(pattern: ast.AST) -> bool:
+    if isinstance(pattern, ast.MatchAs):
+        # Without a name it is written as a wildcard, whatever the pattern
+        return (
+            pattern.name is None
+            or pattern.pattern is None
+            or _is_irrefutable(pattern.pattern)
+        )
+    if isinstance(pattern, ast.MatchOr):
+        return any(_is_irrefutable(p) for p in pattern.patterns)
+    if isinstance(pattern, ast.Name):  # Capture or wildcard closed pattern
+        return "." not in pattern.id
+    return False
 
 
 def generate_match(ctx: Context) -> ast.Match:
     m = ast.Match()
     m.subject = generate_expr(ctx)
     m.cases = []
-    for _ in range(randint(ctx, 1, 3)):  # TODO: Vary length
+    n_cases = randint(ctx, 1, 3)  # TODO: Vary length
+    for i in range(n_cases):
         case = ast.match_case()
         case.pattern = generate_matchpattern(ctx)
-        if randbool(ctx):
+        if randbool(ctx) or (
+            # Only the last case can be irrefutable, unless it is guarded
+            ctx.compile_valid
+            and i < n_cases - 1
+            and _is_irrefutable(case.pattern)
+        ):
             case.guard = generate_expr(ctx)
         case.body = generate_nested_stmts(ctx)
         m.cases.append(case)
@@ -706,7 +1052,7 @@ def generate_list(ctx: Context) -> ast.List:
     l = ast.List()
     l.elts = generate_exprs(ctx)
     if randbool(ctx):
-        l.ctx = next(list_ctx_cycle)()
+        l.ctx = ctx.draw(list_ctx_cycle)()
     return l
 
 
@@ -721,8 +1067,10 @@ bool_op_cycle = rcycle([ast.And, ast.Or])
 
 def generate_boolop(ctx: Context) -> ast.BoolOp:
     b = ast.BoolOp()
-    b.values = [generate_expr(ctx)]  # TODO Vary length
-    b.op = next(bool_op_cycle)()
+    # A BoolOp needs two values, one is written as (value), which isn't a
+    # valid target
+    b.values = [generate_expr(ctx), generate_expr(ctx)]  # TODO Vary length
+    b.op = ctx.draw(bool_op_cycle)()
     return b
 
 
@@ -733,7 +1081,7 @@ def generate_binop(ctx: Context) -> ast.BinOp:
     b = ast.BinOp()
     b.left = generate_expr(ctx)
     b.right = generate_expr(ctx)
-    b.op = next(binop_cycle)()
+    b.op = ctx.draw(binop_cycle)()
     return b
 
 
@@ -743,18 +1091,22 @@ unary_cycle = rcycle([ast.Invert, ast.Not, ast.UAdd, ast.USub])
 def generate_unaryop(ctx: Context) -> ast.UnaryOp:
     u = ast.UnaryOp()
     u.operand = generate_expr(ctx)
-    u.op = next(unary_cycle)()
+    u.op = ctx.draw(unary_cycle)()
     return u
 
 
 def generate_lambda(ctx: Context) -> ast.Lambda:
     l = ast.Lambda()
     l.args = ast.arguments()
-    l.args.args = [generate_arg(ctx) for _ in range(randint(ctx, 0, ctx.width))]
     l.args.posonlyargs = []
     l.args.kwonlyargs = []
     l.args.defaults = []
-    l.body = generate_expr(ctx)
+    with ctx.localnames():
+        l.args.args = [
+            generate_arg(ctx) for _ in range(sample_width(ctx, "args", 0, ctx.width))
+        ]
+        with ctx.inlambda():
+            l.body = generate_expr(ctx)
     return l
 
 
@@ -792,38 +1144,42 @@ def generate_comprehension(ctx: Context) -> ast.comprehension:
 
 def generate_listcomp(ctx: Context) -> ast.ListComp:
     l = ast.ListComp()
-    l.elt = generate_expr(ctx)
-    l.generators = []
-    for _ in range(randint(ctx, 1, 3)):  # TODO: Vary length
-        l.generators.append(generate_comprehension(ctx))
+    with ctx.incomprehension(), ctx.localnames():
+        l.elt = generate_expr(ctx)
+        l.generators = []
+        for _ in range(randint(ctx, 1, 3)):  # TODO: Vary length
+            l.generators.append(generate_comprehension(ctx))
     return l
 
 
 def generate_setcomp(ctx: Context) -> ast.SetComp:
     s = ast.SetComp()
-    s.elt = generate_expr(ctx)
-    s.generators = []
-    for _ in range(randint(ctx, 1, 3)):  # TODO: Vary length
-        s.generators.append(generate_comprehension(ctx))
+    with ctx.incomprehension(), ctx.localnames():
+        s.elt = generate_expr(ctx)
+        s.generators = []
+        for _ in range(randint(ctx, 1, 3)):  # TODO: Vary length
+            s.generators.append(generate_comprehension(ctx))
     return s
 
 
 def generate_dictcomp(ctx: Context) -> ast.DictComp:
     d = ast.DictComp()
-    d.key = generate_expr(ctx)
-    d.value = generate_expr(ctx)
-    d.generators = []
-    for _ in range(randint(ctx, 1, 3)):  # TODO: Vary length
-        d.generators.append(generate_comprehension(ctx))
+    with ctx.incomprehension(), ctx.localnames():
+        d.key = generate_expr(ctx)
+        d.value = generate_expr(ctx)
+        d.generators = []
+        for _ in range(randint(ctx, 1, 3)):  # TODO: Vary length
+            d.generators.append(generate_comprehension(ctx))
     return d
 
 
 def generate_generatorexp(ctx: Context) -> ast.GeneratorExp:
     g = ast.GeneratorExp()
-    g.elt = generate_expr(ctx)
-    g.generators = []
-    for _ in range(randint(ctx, 1, 3)):  # TODO: Vary length
-        g.generators.append(generate_comprehension(ctx))
+    with ctx.incomprehension(), ctx.localnames():
+        g.elt = generate_expr(ctx)
+        g.generators = []
+        for _ in range(randint(ctx, 1, 3)):  # TODO: Vary length
+            g.generators.append(generate_comprehension(ctx))
     return g
 
 
@@ -855,7 +1211,7 @@ def generate_compare(ctx: Context) -> ast.Compare:
         generate_expr(ctx) for _ in range(randint(ctx, 1, 3))
     ]  # TODO: Use width or varied length
     c.ops = [
-        next(cmpop_cycle)() for _ in range(randint(ctx, 1, 3))
+        ctx.draw(cmpop_cycle)() for _ in range(randint(ctx, 1, 3))
     ]  # TODO: Vary length
     return c
 
@@ -864,10 +1220,10 @@ def generate_call(ctx: Context) -> ast.Call:
     c = ast.Call()
     c.func = generate_expr(ctx)
     c.args = []
-    for _ in range(randint(ctx, 0, ctx.width // 2)):
+    for _ in range(sample_width(ctx, "call_args", 0, ctx.width // 2)):
         c.args.append(generate_expr(ctx))
     c.keywords = []
-    for _ in range(randint(ctx, 0, ctx.width // 2)):
+    for _ in range(sample_width(ctx, "call_args", 0, ctx.width // 2)):
         kw = ast.keyword()
         kw.arg = make_name(ctx, new=True)
         kw.value = generate_expr(ctx)
@@ -947,26 +1303,170 @@ FLAT_EXPR_GENERATORS = [
 ]
 
 
-# Create another list with the first item in the tuple for each item in STMT_GENERATORS
-STMT_ALL_GENERATORS_ITER = rcycle(STMT_GENERATORS)
+def _construct_name(generator: typing.Callable) -> str:
+    return generator.__name__.removeprefix("generate_")
+
+
+""" Names of the constructs that can be excluded from the grammar. """
+GRAMMAR_CONSTRUCTS = frozenset(
+    [_construct_name(generator) for _, _, generator in STMT_GENERATORS]
+    + [_construct_name(generator) for generator in EXPR_GENERATORS]
+)
+
+
+""" Stricter constraints used in compile-valid mode. """
+COMPILE_VALID_CONSTRAINTS = {
+    generate_asyncfor: GeneratorConstraints.ONLY_IN_ASYNC_FUNCTIONS,
+    generate_asyncwith: GeneratorConstraints.ONLY_IN_ASYNC_FUNCTIONS,
+    generate_nonlocal: GeneratorConstraints.ONLY_IN_FUNCTIONS
+    | GeneratorConstraints.ONLY_IN_NESTED_FUNCTIONS,
+    generate_await: GeneratorConstraints.ONLY_IN_ASYNC_FUNCTIONS
+    | GeneratorConstraints.OUTSIDE_COMPREHENSIONS,
+    generate_yield: GeneratorConstraints.ONLY_IN_GENERATORS
+    | GeneratorConstraints.OUTSIDE_COMPREHENSIONS,
+    generate_yieldfrom: GeneratorConstraints.ONLY_IN_SYNC_GENERATORS
+    | GeneratorConstraints.OUTSIDE_COMPREHENSIONS,
+    generate_namedexpr: GeneratorConstraints.OUTSIDE_COMPREHENSIONS,
+}
+
+
+class Grammar:
+    """
+    Dispatch tables for statement and expression selection, with some constructs
+    optionally excluded.
+
+    Tables are keyed by the constraints the current state satisfies (and for
+    statements, whether they can nest) and only hold the generators that are
+    eligible in that state, so every draw produces a node. Each table is built
+    once, the first time its state is seen.
+    """
+
+    def __init__(
+        self, exclude: frozenset[str] = frozenset(), compile_valid: bool = False
+    ):
+        unknown = exclude - GRAMMAR_CONSTRUCTS
+        if unknown:
+            raise ValueError(f"Unknown constructs: {', '.join(sorted(unknown))}")
+        self.exclude = exclude
+        self.compile_valid = compile_valid
+        self.stmts = [
+            (self._constraint(generator, constraint), is_nested, generator)
+            for constraint, is_nested, generator in STMT_GENERATORS
+            if _construct_name(generator) not in exclude
+        ]
+        self.exprs = [
+            (self._constraint(generator, GeneratorConstraints.ANY), generator)
+            for generator in EXPR_GENERATORS
+            if _construct_name(generator) not in exclude
+        ]
+        flat_exprs = [
+            generator
+            for generator in FLAT_EXPR_GENERATORS
+            if _construct_name(generator) not in exclude
+        ]
+        if not flat_exprs:
+            raise ValueError("At least one of name or constant must be included")
+        self.flat_expr_cycle = rcycle(flat_exprs)
+        self.expr_cycle = rcycle([generator for _, generator in self.exprs])
+        self.stmt_tables: dict[tuple[GeneratorConstraints, bool], typing.Iterator] = {}
+        self.expr_tables: dict[GeneratorConstraints, typing.Iterator] = {}
+
+    def _constraint(
+        self, generator: typing.Callable, constraint: GeneratorConstraints
+    ) -> GeneratorConstraints:
+        if self.compile_valid:
+            return COMPILE_VALID_CONSTRAINTS.get(generator, constraint)
+        return constraint
+
+    def stmt_table(
+        self, satisfied: GeneratorConstraints, can_nest: bool
+    ) -> typing.Iterator:
+        table = self.stmt_tables.get((satisfied, can_nest))
+        if table is None:
+            eligible = [
+                generator
+                for constraint, is_nested, generator in self.stmts
+                if constraint & satisfied == constraint and (can_nest or not is_nested)
+            ]
+            table = self.stmt_tables[satisfied, can_nest] = rcycle(
+                eligible or [generate_pass]
+            )
+        return table
+
+    def expr_table(self, satisfied: GeneratorConstraints) -> typing.Iterator:
+        table = self.expr_tables.get(satisfied)
+        if table is None:
+            eligible = [
+                generator
+                for constraint, generator in self.exprs
+                if constraint & satisfied == constraint
+            ]
+            table = self.expr_tables[satisfied] = (
+                rcycle(eligible) if eligible else self.flat_expr_cycle
+            )
+        return table
+
+
+_grammars: dict[tuple[frozenset[str], bool], Grammar] = {}
+
+
+def get_grammar(
+    exclude: typing.Iterable[str] = (), compile_valid: bool = False
+) -> Grammar:
+    """Get the (cached) grammar with the given constructs excluded."""
+    key = (frozenset(exclude), compile_valid)
+    grammar = _grammars.get(key)
+    if grammar is None:
+        grammar = _grammars[key] = Grammar(*key)
+    return grammar
+
+
+def _generate_block_generators(ctx: Context) -> list[typing.Callable]:
+    n_stmts = max(1, sample_width(ctx, "body", ctx.width, ctx.width))
+    table = ctx.grammar.stmt_table(ctx.constraints(), ctx.depth < ctx.max_depth - 1)
+    return [ctx.draw(table) for _ in range(n_stmts)]
+
+
+def _generate_stmt(ctx: Context, generator: typing.Callable, seed: int) -> ast.stmt:
+    """
+    Generate a statement from its own seed. Its RNG, cycles and the names it
+    binds don't leak to its siblings, so its subtree only depends on its seed
+    and the path to it.
+    """
+    outer = (ctx.seed, ctx.rng, ctx.blocks, ctx.cycles, len(ctx.names))
+    ctx.seed, ctx.rng, ctx.blocks, ctx.cycles = seed, _random.Random(seed), 0, {}
+    try:
+        return generator(ctx)
+    finally:
+        ctx.seed, ctx.rng, ctx.blocks, ctx.cycles, n_names = outer
+        del ctx.names[n_names:]
 
 
 def _generate_stmts(ctx: Context) -> list[ast.stmt]:
+    # The i-th statement of the k-th block of a statement with seed S has seed
+    # derive_seed(derive_seed(S, k), i)
+    block, block_seed = ctx.blocks, derive_seed(ctx.seed, ctx.blocks)
+    ctx.blocks += 1
     if ctx.depth >= ctx.max_depth:
         logger.debug("Hit max depth for stmt")
         return [generate_pass(ctx)]
-    stmts = []
-    while len(stmts) < ctx.width:
-        next_stmt = next(STMT_ALL_GENERATORS_ITER)
-        if next_stmt[1] and ctx.depth >= ctx.max_depth - 1:
-            logger.debug("Hit max depth for nested stmt")
-            continue
-        if next_stmt[0] == GeneratorConstraints.ANY:
-            stmts.append(next_stmt[2](ctx))
-        elif next_stmt[0] == GeneratorConstraints.ONLY_IN_FUNCTIONS and ctx.in_function:
-            stmts.append(next_stmt[2](ctx))
-        elif next_stmt[0] == GeneratorConstraints.ONLY_IN_LOOPS and ctx.in_loop:
-            stmts.append(next_stmt[2](ctx))
+    generators = _generate_block_generators(ctx)
+    if ctx.focus is None:
+        return [
+            _generate_stmt(ctx, generator, derive_seed(block_seed, i))
+            for i, generator in enumerate(generators)
+        ]
+    # Only generate the statement on the path to the focus, leave the rest as pass
+    stmts = [generate_pass(ctx) for _ in generators]
+    (focus_block, index), focus = ctx.focus[0], ctx.focus
+    if focus_block == block and index < len(stmts):
+        ctx.focus = focus[1:] or None
+        try:
+            stmts[index] = _generate_stmt(
+                ctx, generators[index], derive_seed(block_seed, index)
+            )
+        finally:
+            ctx.focus = focus
     return stmts
 
 
@@ -975,31 +1475,332 @@ def generate_nested_stmts(ctx: Context) -> list[ast.stmt]:
         return _generate_stmts(ctx)
 
 
-flat_expr_generators_cycle = rcycle(FLAT_EXPR_GENERATORS)
-expr_generators_cycle = rcycle(EXPR_GENERATORS)
-
-
 def generate_expr(ctx: Context) -> ast.expr:
     with ctx.nested():
         if ctx.depth >= ctx.max_depth:
             logger.debug("Hit max depth")
-            return next(flat_expr_generators_cycle)(ctx)
-        return next(expr_generators_cycle)(ctx)
+            return ctx.draw(ctx.grammar.flat_expr_cycle)(ctx)
+        if ctx.compile_valid:
+            return ctx.draw(ctx.grammar.expr_table(ctx.constraints()))(ctx)
+        return ctx.draw(ctx.grammar.expr_cycle)(ctx)
 
 
 def generate_exprs(ctx: Context) -> list[ast.expr]:
     if ctx.depth >= ctx.max_depth:
         return []
-    return [generate_expr(ctx) for _ in range(randint(ctx, 1, ctx.width))]
-
+    return [generate_expr(ctx) for _ in range(sample_width(ctx, "elts", 1, ctx.width))]
+
+
+def generate_module(
+    depth: int,
+    width: int,
+    log_level: str | None = None,
+    widths: dict[str, Distribution] | None = None,
+    exclude: typing.Iterable[str] = (),
+    compile_valid: bool = False,
+    seed: int | None = None,
+    jobs: int = 1,
+) -> ast.Module:
+    """
+    Generate a module. In compile-valid mode the module not only parses but
+    also compiles, i.e. there are no await, yield, return, break or similar
+    statements outside of where they are allowed.
 
-def generate_module(depth: int, width: int, log_level: str | None = None) -> ast.Module:
+    Each top-level statement is generated independently from a seed derived
+    from seed, so with jobs > 1 they're generated in that many worker processes
+    and a given seed gives the same module whatever the number of jobs.
+    """
     if log_level is not None:
         logger.setLevel(log_level)
-    ctx = Context()
-    ctx.max_depth = depth
-    ctx.width = width
     mod = ast.Module()
     mod.type_ignores = []
-    mod.body = generate_nested_stmts(ctx)
+    mod.body = list(
+        _iter_top_level(
+            (depth, width, widths, tuple(exclude), compile_valid),
+            seed,
+            jobs,
+            unparse=False,
+        )
+    )
     return mod
+
+
+def iter_module_source(
+    depth: int,
+    width: int,
+    widths: dict[str, Distribution] | None = None,
+    exclude: typing.Iterable[str] = (),
+    compile_valid: bool = False,
+    seed: int | None = None,
+    jobs: int = 1,
+) -> typing.Iterator[str]:
+    """
+    Generate a module in bounded memory, yielding the source of one top-level
+    statement at a time. Each statement's AST is dropped once it's unparsed, so
+    peak memory is that of the largest top-level statement rather than the
+    whole module. The output is that of generate_module() with the same seed.
+    With jobs > 1, workers generate at most 2 * jobs statements ahead.
+    """
+    yield from _iter_top_level(
+        (depth, width, widths, tuple(exclude), compile_valid),
+        seed,
+        jobs,
+        unparse=True,
+    )
+
+
+def generate_source(
+    depth: int,
+    width: int,
+    widths: dict[str, Distribution] | None = None,
+    exclude: typing.Iterable[str] = (),
+    compile_valid: bool = False,
+    seed: int | None = None,
+    jobs: int = 1,
+) -> str:
+    """
+    Generate the source of a module. Workers send back source instead of AST,
+    which is much cheaper to pass between processes.
+    """
+    return "\n".join(
+        iter_module_source(depth, width, widths, exclude, compile_valid, seed, jobs)
+    )
+
+
+# depth, width, widths, exclude, compile_valid
+ModuleConfig = tuple[int, int, dict[str, Distribution] | None, tuple[str, ...], bool]
+
+
+def _module_context(
+    config: ModuleConfig,
+    seed: int,
+    new_context: typing.Callable[[int], Context] = Context,
+) -> Context:
+    depth, width, widths, exclude, compile_valid = config
+    ctx = new_context(seed)
+    ctx.max_depth = depth
+    ctx.width = width
+    if widths:
+        ctx.widths.update(widths)
+    ctx.compile_valid = compile_valid
+    ctx.prune_names = True
+    ctx.grammar = get_grammar(exclude, compile_valid)
+    return ctx
+
+
+def _top_level_generators(ctx: Context) -> list[typing.Callable]:
+    with ctx.nested():
+        if ctx.depth >= ctx.max_depth:
+            return [generate_pass]
+        return _generate_block_generators(ctx)
+
+
+def _generate_top_level(
+    task: tuple[ModuleConfig, typing.Callable, int, bool],
+) -> ast.stmt | str:
+    config, generator, seed, unparse = task
+    ctx = _module_context(config, seed)
+    with ctx.nested():
+        stmt = _generate_stmt(ctx, generator, seed)
+    return ast.unparse(stmt) if unparse else stmt
+
+
+def _iter_top_level(
+    config: ModuleConfig, seed: int | None, jobs: int, unparse: bool
+) -> typing.Iterator[ast.stmt | str]:
+    if seed is None:
+        seed = _random.getrandbits(64)
+    # The kinds of the top-level statements are picked up front, then each is
+    # generated from its own seed
+    generators = _top_level_generators(_module_context(config, seed))
+    tasks = [
+        (config, generator, derive_seed(seed, i), unparse)
+        for i, generator in enumerate(generators)
+    ]
+    if jobs == 1 or len(tasks) == 1:
+        yield from map(_generate_top_level, tasks)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from _map_window(executor, _generate_top_level, tasks, 2 * jobs)
+
+
+def _map_window(
+    executor: concurrent.futures.Executor,
+    fn: typing.Callable,
+    items: typing.Iterable,
+    window: int,
+) -> typing.Iterator:
+    """
+    executor.map(fn, items), but with at most window calls submitted and not
+    yet consumed, so results don't pile up faster than they're consumed.
+    """
+    pending: collections.deque[concurrent.futures.Future] = collections.deque()
+    for item in items:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(executor.submit(fn, item))
+    while pending:
+        yield pending.popleft().result()
+
+
+def _generate_pattern(ctx: Context) -> ast.pattern:
+    with ctx.nested():
+        return generate_matchpattern(ctx)
+
+
+def _generate_one_stmt(ctx: Context) -> ast.stmt:
+    with ctx.nested():
+        table = ctx.grammar.stmt_table(ctx.constraints(), ctx.depth < ctx.max_depth - 1)
+        return ctx.draw(table)(ctx)
+
+
+def _generate_expression(ctx: Context) -> ast.Expression:
+    expression = ast.Expression()
+    expression.body = generate_expr(ctx)
+    return expression
+
+
+NODE_KINDS: dict[str, typing.Callable[[Context], ast.AST]] = {
+    "expr": generate_expr,
+    "pattern": _generate_pattern,
+    "stmt": _generate_one_stmt,
+    "expression": _generate_expression,
+}
+
+
+def _generate_batch(
+    task: tuple[ModuleConfig, str, list[int]],
+) -> list[ast.AST]:
+    config, kind, seeds = task
+    generator = NODE_KINDS[kind]
+    # One context for the whole batch, reset between nodes rather than built
+    # again for each
+    ctx = _module_context(config, 0)
+    nodes = []
+    # Nodes are trees without reference cycles, collecting would only walk the
+    # growing batch again and again
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for seed in seeds:
+            ctx.seed, ctx.blocks, ctx.depth = seed, 0, 0
+            ctx.rng.seed(seed)
+            ctx.cycles.clear()
+            ctx.names.clear()
+            nodes.append(generator(ctx))
+    finally:
+        if enabled:
+            gc.enable()
+    return nodes
+
+
+def generate_many(
+    kind: str,
+    n: int,
+    depth: int = MAX_DEPTH,
+    seed: int | None = None,
+    width: int = 5,
+    widths: dict[str, Distribution] | None = None,
+    exclude: typing.Iterable[str] = (),
+    compile_valid: bool = False,
+    jobs: int = 1,
+    batch_size: int = 256,
+) -> typing.Iterator[ast.AST]:
+    """
+    Yield n independent nodes of a kind of NODE_KINDS: ast.expr, ast.pattern,
+    ast.stmt or ast.Expression (for eval mode). The i-th node is generated from
+    derive_seed(seed, i), so a given seed gives the same nodes whatever the
+    number of jobs and batch size. Nodes are generated in batches of batch_size
+    sharing a context, with jobs > 1 in that many worker processes.
+    """
+    if kind not in NODE_KINDS:
+        raise ValueError(
+            f"Unknown node kind {kind!r}, expected one of {', '.join(NODE_KINDS)}"
+        )
+    if seed is None:
+        seed = _random.getrandbits(64)
+    config = (depth, width, widths, tuple(exclude), compile_valid)
+    tasks = [
+        (
+            config,
+            kind,
+            [derive_seed(seed, i) for i in range(start, min(start + batch_size, n))],
+        )
+        for start in range(0, n, batch_size)
+    ]
+    if jobs == 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield from _generate_batch(task)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        for nodes in executor.map(_generate_batch, tasks):
+            yield from nodes
+
+
+StmtPath = typing.Sequence[tuple[int, int]]
+
+
+def _stmt_blocks(node: ast.AST) -> typing.Iterator[list[ast.stmt]]:
+    """The statement lists directly under node, in the order they're generated."""
+    for _, value in ast.iter_fields(node):
+        if not isinstance(value, list) or not value:
+            continue
+        if isinstance(value[0], ast.stmt):
+            yield value
+        else:
+            for item in value:
+                if isinstance(item, (ast.excepthandler, ast.match_case)):
+                    yield from _stmt_blocks(item)
+
+
+def iter_stmt_paths(
+    node: ast.AST, prefix: tuple[tuple[int, int], ...] = ()
+) -> typing.Iterator[tuple[tuple[tuple[int, int], ...], ast.stmt]]:
+    """
+    Yield the path of every statement under node along with the statement. A
+    path is a sequence of (block, index) pairs: the index of the statement in
+    the block-th statement list of its parent, the module being the root.
+    """
+    for block, stmts in enumerate(_stmt_blocks(node)):
+        for index, stmt in enumerate(stmts):
+            path = prefix + ((block, index),)
+            yield path, stmt
+            yield from iter_stmt_paths(stmt, path)
+
+
+def stmt_at(node: ast.AST, path: StmtPath) -> ast.stmt:
+    """The statement at path under node, see iter_stmt_paths()."""
+    for block, index in path:
+        try:
+            node = list(_stmt_blocks(node))[block][index]
+        except IndexError:
+            raise ValueError(f"No statement at {tuple(path)}") from None
+    return node
+
+
+def generate_subtree(
+    path: StmtPath,
+    depth: int,
+    width: int,
+    seed: int,
+    widths: dict[str, Distribution] | None = None,
+    exclude: typing.Iterable[str] = (),
+    compile_valid: bool = False,
+) -> ast.stmt:
+    """
+    Regenerate the statement at path of the module generate_module() makes with
+    the same arguments, e.g. to reproduce a crash. Only the statements on the
+    path to it are generated, not the rest of the module.
+    """
+    if not path or path[0][0] != 0:
+        raise ValueError(f"No statement at {tuple(path)}")
+    config = (depth, width, widths, tuple(exclude), compile_valid)
+    generators = _top_level_generators(_module_context(config, seed))
+    index = path[0][1]
+    if index >= len(generators):
+        raise ValueError(f"No statement at {tuple(path)}")
+    ctx = _module_context(config, seed)
+    ctx.focus = tuple(path[1:]) or None
+    with ctx.nested():
+        stmt = _generate_stmt(ctx, generators[index], derive_seed(seed, index))
+    return stmt_at(stmt, path[1:])
@@ -0,0 +1,280 @@
+"""
+Corpus-learned weights: fit how often each construct appears in each other
+construct, and how wide bodies, argument lists, decorator lists and collections
+are, on a corpus of real code, then generate with those frequencies instead of
+uniform picks.
+
+Selection weights are conditioned on the parent: the construct the statement or
+expression is directly in, or "module" at the top level. Every construct keeps
+a small weight, so constructs the corpus lacks can still be generated. Widths
+are the empirical distributions of the widths seen, capped at max_width.
+"""
+
+import ast
+import collections
+import concurrent.futures
+import functools
+import itertools
+import json
+import os
+import random
+import typing
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import spew.generate as g
+from spew.randomcycle import RandomCycle
+from spew.seeds import derive_seed
+from spew.widths import Empirical
+
+LEARNED_VERSION = 1
+MODULE = "module"
+# Widths above this are counted as this, so generation stays bounded
+MAX_WIDTH = 30
+# Added to the count of every construct, so none has a zero weight
+SMOOTHING = 0.5
+# Files parsed per task of a worker
+CHUNK_SIZE = 32
+
+# Node types whose construct isn't their lowercased name
+_TYPE_CONSTRUCTS = {
+    ast.FunctionDef: "function",
+    ast.AsyncFunctionDef: "asyncfunction",
+    ast.ClassDef: "class",
+    ast.Expr: "expression",
+}
+_GENERATOR_CONSTRUCTS = {
+    generator: g._construct_name(generator)
+    for generator in [generator for _, _, generator in g.STMT_GENERATORS]
+    + list(g.EXPR_GENERATORS)
+}
+_wrappers: dict[typing.Callable, typing.Callable] = {}
+
+
+def construct_of(node: ast.AST) -> str | None:
+    """The construct of the generators a node is, if any."""
+    name = _TYPE_CONSTRUCTS.get(type(node)) or type(node).__name__.lower()
+    return name if name in g.GRAMMAR_CONSTRUCTS else None
+
+
+@dataclass
+class Learned:
+    # Counts of the constructs directly in each construct
+    selection: dict[str, dict[str, int]]
+    # Counts of the widths of each width construct, see WIDTH_CONSTRUCTS
+    widths: dict[str, dict[int, int]]
+    files: int = 0
+    # Files that couldn't be read or parsed
+    skipped: int = 0
+    _tables: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def distributions(self) -> dict[str, Empirical]:
+        return {
+            construct: Empirical.from_counts(counts)
+            for construct, counts in self.widths.items()
+            if counts
+        }
+
+    def table(
+        self, parent: str, cycle: RandomCycle
+    ) -> tuple[list[typing.Callable], list[float]] | None:
+        """
+        The generators of a grammar table and their cumulative weights in
+        parent, or None if the cycle isn't one of the grammar's.
+        """
+        key = (parent, cycle)
+        if key in self._tables:
+            return self._tables[key]
+        table = None
+        constructs = [_GENERATOR_CONSTRUCTS.get(item) for item in cycle.items]
+        if None not in constructs:
+            counts = self.selection.get(parent) or self.selection.get(MODULE, {})
+            weights = [counts.get(construct, 0) + SMOOTHING for construct in constructs]
+            table = (
+                [
+                    _wrap(item, construct)
+                    for item, construct in zip(cycle.items, constructs)
+                ],
+                list(itertools.accumulate(weights)),
+            )
+        self._tables[key] = table
+        return table
+
+
+def _wrap(generator: typing.Callable, construct: str) -> typing.Callable:
+    """The generator, making its construct the parent of what it generates."""
+    wrapped = _wrappers.get(generator)
+    if wrapped is None:
+
+        @functools.wraps(generator)
+        def wrapped(ctx: "LearnedContext", *args, **kwargs):
+            parent = ctx.parent
+            ctx.parent = construct
+            try:
+                return generator(ctx, *args, **kwargs)
+            finally:
+                ctx.parent = parent
+
+        _wrappers[generator] = wrapped
+    return wrapped
+
+
+class LearnedContext(g.Context):
+    """A context picking statements and expressions with learned weights."""
+
+    __slots__ = ("learned", "parent")
+
+    def __init__(self, learned: Learned, seed: int | None = None):
+        super().__init__(seed)
+        self.learned = learned
+        self.parent = MODULE
+        self.widths.update(learned.distributions())
+
+    def draw(self, cycle: RandomCycle[g.T]) -> g.T:
+        table = self.learned.table(self.parent, cycle)
+        if table is None:
+            return super().draw(cycle)
+        items, cum_weights = table
+        return self.rng.choices(items, cum_weights=cum_weights)[0]
+
+
+def _count_widths(node: ast.AST, widths: dict[str, collections.Counter], cap: int):
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+        args = node.args
+        n_args = len(args.posonlyargs) + len(args.args) + len(args.kwonlyargs)
+        widths["args"][min(n_args, cap)] += 1
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        widths["decorators"][min(len(node.decorator_list), cap)] += 1
+    elif isinstance(node, ast.Call):
+        # Positional and keyword arguments are picked separately
+        widths["call_args"][min(len(node.args), cap)] += 1
+        widths["call_args"][min(len(node.keywords), cap)] += 1
+    elif isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        widths["elts"][min(len(node.elts), cap)] += 1
+    elif isinstance(node, ast.Dict):
+        widths["elts"][min(len(node.keys), cap)] += 1
+    if not isinstance(node, ast.Module):
+        # The module's body is the number of top-level statements, not a block
+        for _, value in ast.iter_fields(node):
+            if isinstance(value, list) and value and isinstance(value[0], ast.stmt):
+                widths["body"][min(len(value), cap)] += 1
+
+
+def _learn_files(task: tuple[list[Path], int]) -> tuple[dict, dict, int, int]:
+    paths, cap = task
+    selection: dict[str, collections.Counter] = collections.defaultdict(
+        collections.Counter
+    )
+    widths: dict[str, collections.Counter] = collections.defaultdict(
+        collections.Counter
+    )
+    files = skipped = 0
+    for path in paths:
+        try:
+            tree = ast.parse(path.read_bytes(), str(path))
+        except (SyntaxError, ValueError, OSError, RecursionError, MemoryError):
+            skipped += 1
+            continue
+        files += 1
+        stack: list[tuple[ast.AST, str]] = [(tree, MODULE)]
+        while stack:
+            node, parent = stack.pop()
+            construct = construct_of(node)
+            if construct is not None:
+                selection[parent][construct] += 1
+                parent = construct
+            _count_widths(node, widths, cap)
+            stack.extend((child, parent) for child in ast.iter_child_nodes(node))
+    return dict(selection), dict(widths), files, skipped
+
+
+def learn_corpus(
+    directory: Path, jobs: int | None = None, max_width: int = MAX_WIDTH
+) -> Learned:
+    """
+    Fit weights on the .py files under directory, parsed in jobs worker
+    processes, one per CPU by default. Files that don't parse are skipped.
+    """
+    paths = sorted(Path(directory).rglob("*.py"))
+    tasks = [
+        (paths[i : i + CHUNK_SIZE], max_width) for i in range(0, len(paths), CHUNK_SIZE)
+    ]
+    jobs = jobs or os.cpu_count() or 1
+    selection: dict[str, collections.Counter] = collections.defaultdict(
+        collections.Counter
+    )
+    widths: dict[str, collections.Counter] = collections.defaultdict(
+        collections.Counter
+    )
+    if jobs == 1 or len(tasks) <= 1:
+        results = list(map(_learn_files, tasks))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(_learn_files, tasks))
+    learned = Learned({}, {})
+    for task_selection, task_widths, files, skipped in results:
+        for parent, counts in task_selection.items():
+            selection[parent].update(counts)
+        for construct, counts in task_widths.items():
+            widths[construct].update(counts)
+        learned.files += files
+        learned.skipped += skipped
+    learned.selection = {parent: dict(counts) for parent, counts in selection.items()}
+    learned.widths = {construct: dict(counts) for construct, counts in widths.items()}
+    return learned
+
+
+def save_learned(learned: Learned, path: Path) -> None:
+    data = {
+        "version": LEARNED_VERSION,
+        "files": learned.files,
+        "skipped": learned.skipped,
+        "selection": learned.selection,
+        "widths": learned.widths,
+    }
+    Path(path).write_text(json.dumps(data, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def load_learned(path: Path) -> Learned:
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    if data.get("version") != LEARNED_VERSION:
+        raise ValueError(
+            f"{path} is not a learned profile of version {LEARNED_VERSION}"
+        )
+    widths = {
+        construct: {int(width): count for width, count in counts.items()}
+        for construct, counts in data["widths"].items()
+    }
+    return Learned(data["selection"], widths, data["files"], data["skipped"])
+
+
+def generate_learned_module(
+    learned: Learned,
+    depth: int,
+    width: int,
+    widths: dict[str, g.Distribution] | None = None,
+    exclude: typing.Iterable[str] = (),
+    compile_valid: bool = False,
+    seed: int | None = None,
+) -> ast.Module:
+    """
+    Generate a module as generate_module() does, picking constructs and widths
+    with the learned weights. widths override the learned distributions. The
+    module has width top-level statements, unless widths has one for body.
+    """
+    if seed is None:
+        seed = random.getrandbits(64)
+    config = (depth, width, widths, tuple(exclude), compile_valid)
+    new_context = functools.partial(LearnedContext, learned)
+    ctx = g._module_context(config, seed, new_context)
+    if not widths or "body" not in widths:
+        # The learned body widths are those of blocks, not of modules
+        ctx.widths.pop("body", None)
+    generators = g._top_level_generators(ctx)
+    mod = ast.Module(body=[], type_ignores=[])
+    for i, generator in enumerate(generators):
+        stmt_seed = derive_seed(seed, i)
+        ctx = g._module_context(config, stmt_seed, new_context)
+        with ctx.nested():
+            mod.body.append(g._generate_stmt(ctx, generator, stmt_seed))
+    return mod
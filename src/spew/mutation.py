@@ -0,0 +1,228 @@
+"""
+Mutate existing code by replacing random statements and expressions with
+freshly generated ones, e.g. to derive new fuzzing inputs from interesting ones.
+"""
+
+import ast
+import contextlib
+import random
+import typing
+
+import spew.generate as g
+from spew.trees import (
+    COMPREHENSIONS,
+    SCOPES,
+    CopyOnWrite,
+    Location,
+    ancestors_of,
+    is_async_generator,
+    node_names,
+    scope_nodes,
+)
+from spew.widths import Distribution
+
+# Construct names of the node types whose generator isn't named after them
+NODE_CONSTRUCTS = {
+    ast.FunctionDef: "function",
+    ast.AsyncFunctionDef: "asyncfunction",
+    ast.Expr: "expression",
+}
+
+
+def _construct(node: ast.AST) -> str:
+    return NODE_CONSTRUCTS.get(type(node), type(node).__name__.lower())
+
+
+class Index(typing.NamedTuple):
+    # Locations of the statements and the expressions that can be replaced
+    stmts: list[Location]
+    exprs: list[Location]
+    # Names declared nonlocal anywhere
+    nonlocals: set[str]
+    # Names used in each scope, by id of the scope node
+    names: dict[int, list[str]]
+    # Names declared global or nonlocal in each scope, by id of the scope node
+    declared: dict[int, set[str]]
+
+
+def _index(tree: ast.AST) -> Index:
+    index = Index([], [], set(), {id(tree): []}, {id(tree): set()})
+    stack: list[tuple[ast.AST, Location | None, list[str], set[str]]] = [
+        (tree, None, index.names[id(tree)], index.declared[id(tree)])
+    ]
+    while stack:
+        node, link, names, declared = stack.pop()
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                children = enumerate(value)
+            elif isinstance(value, ast.AST):
+                children = ((None, value),)
+            else:
+                continue
+            for i, child in children:
+                if not isinstance(child, ast.AST):
+                    continue
+                location = (link, node, field, i)
+                if isinstance(child, ast.stmt):
+                    index.stmts.append(location)
+                    if isinstance(child, SCOPES):
+                        names.append(child.name)
+                    elif isinstance(child, (ast.Global, ast.Nonlocal)):
+                        declared.update(child.names)
+                        if isinstance(child, ast.Nonlocal):
+                            index.nonlocals.update(child.names)
+                elif isinstance(child, ast.expr):
+                    if isinstance(child, ast.Name):
+                        names.append(child.id)
+                    if not isinstance(
+                        getattr(child, "ctx", None), (ast.Store, ast.Del)
+                    ):
+                        index.exprs.append(location)
+                # Patterns and f-strings only allow a few kinds of expressions
+                elif isinstance(child, (ast.pattern, ast.JoinedStr)):
+                    continue
+                elif isinstance(child, ast.arg):
+                    names.append(child.arg)
+                if isinstance(child, SCOPES):
+                    scope = (
+                        index.names.setdefault(id(child), []),
+                        index.declared.setdefault(id(child), set()),
+                    )
+                    stack.append((child, location, *scope))
+                elif not isinstance(child, (ast.pattern, ast.JoinedStr)):
+                    stack.append((child, location, names, declared))
+    return index
+
+
+def _enter(
+    ctx: g.Context, node: ast.AST, field: str, stack: contextlib.ExitStack
+) -> list[str] | None:
+    """
+    Enter the scope state of node's field, the way the generators would when
+    generating it. Returns the bindings of a function body.
+    """
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and field == "body":
+        is_async = isinstance(node, ast.AsyncFunctionDef)
+        is_generator = not is_async or is_async_generator(node)
+        return stack.enter_context(ctx.infunction(is_async, is_generator))
+    if isinstance(node, ast.ClassDef) and field == "body":
+        stack.enter_context(ctx.inclass())
+    elif isinstance(node, ast.Lambda) and field == "body":
+        stack.enter_context(ctx.inlambda())
+    elif isinstance(node, (ast.For, ast.AsyncFor, ast.While)) and field == "body":
+        stack.enter_context(ctx.inloop())
+    elif isinstance(node, COMPREHENSIONS):
+        stack.enter_context(ctx.incomprehension())
+    elif isinstance(node, ast.TryStar) and field == "handlers":
+        stack.enter_context(ctx.inexceptstar())
+    return None
+
+
+def _replace(ctx: g.Context, node: ast.AST, eligible: typing.Iterable) -> ast.AST:
+    """Generate a node to replace node, of the same type where possible."""
+    generators = {g._construct_name(generator): generator for generator in eligible}
+    generator = generators.get(_construct(node))
+    if generator is None:
+        generator = g.randchoice(ctx, list(generators.values()))
+    with ctx.nested():
+        return generator(ctx)
+
+
+def _mutate_at(
+    tree: CopyOnWrite,
+    index: Index,
+    ancestors: list[tuple[ast.AST, str, int | None]],
+    ctx: g.Context,
+    is_stmt: bool,
+) -> None:
+    frames: list[tuple[list[str], ast.AST]] = []
+    # A name declared global or nonlocal in a scope can't be used before the
+    # declaration, so leave those of the enclosing scopes out
+    declared = set().union(
+        *(index.declared.get(id(node), ()) for node, _, _ in ancestors)
+    )
+    with contextlib.ExitStack() as stack:
+        for node, field, _ in ancestors:
+            ctx.names.extend(
+                name for name in index.names.get(id(node), ()) if name not in declared
+            )
+            bindings = _enter(ctx, node, field, stack)
+            if bindings is not None:
+                frames.append((bindings, node))
+        parent, field, i = ancestors[-1]
+        value = getattr(parent, field)
+        old = value[i] if i is not None else value
+        if is_stmt:
+            table = ctx.grammar.stmt_table(ctx.constraints(), ctx.max_depth > 1)
+            new = _replace(ctx, old, table.items)
+        elif ctx.compile_valid:
+            new = _replace(ctx, old, ctx.grammar.expr_table(ctx.constraints()).items)
+        else:
+            new = _replace(ctx, old, ctx.grammar.expr_cycle.items)
+    tree.replace(ancestors, ast.fix_missing_locations(new))
+    if ctx.compile_valid and frames and index.nonlocals:
+        # Keep binding the names the replaced node bound for nested functions
+        lost = index.nonlocals.intersection(node_names([old, *scope_nodes(old)]))
+        frames[-1][0].extend(sorted(lost))
+    # Bind the names nested functions declared nonlocal in enclosing functions
+    for bindings, function in frames:
+        if bindings:
+            tree.field(function, "body").extend(
+                ast.fix_missing_locations(g._generate_binding(name))
+                for name in bindings
+            )
+
+
+def mutate(
+    source_or_ast: str | ast.Module,
+    n_mutations: int = 1,
+    seed: int | None = None,
+    depth: int = 3,
+    width: int = 3,
+    widths: dict[str, Distribution] | None = None,
+    exclude: typing.Iterable[str] = (),
+    compile_valid: bool = False,
+) -> str | ast.Module:
+    """
+    Replace n_mutations random statements or expressions of a module with
+    generated ones, of the same type where possible. The scope at each mutation
+    point (loops, functions, async, names, etc.) is reconstructed, so with
+    compile_valid a module that compiles still compiles.
+
+    depth and width are those of the generated replacements. Source in gives
+    source out, otherwise the input tree is left untouched and a new tree that
+    shares the unchanged subtrees with it is returned.
+    """
+    original = (
+        ast.parse(source_or_ast) if isinstance(source_or_ast, str) else source_or_ast
+    )
+    index = _index(original)
+    tree = CopyOnWrite(original)
+    rng = random.Random(seed)
+    replaced: set[int] = set()
+    # Mutations inside an already replaced subtree are dropped, give up after a
+    # few of those
+    attempts = 0
+    while len(replaced) < n_mutations and attempts < 10 * n_mutations:
+        attempts += 1
+        if not index.stmts and not index.exprs:
+            break
+        is_stmt = bool(index.stmts) and (not index.exprs or rng.random() < 0.5)
+        ancestors = ancestors_of(rng.choice(index.stmts if is_stmt else index.exprs))
+        parent, field, i = ancestors[-1]
+        old = getattr(parent, field)[i] if i is not None else getattr(parent, field)
+        if id(old) in replaced or any(id(node) in replaced for node, _, _ in ancestors):
+            continue
+        ctx = g.Context(rng.getrandbits(64))
+        ctx.max_depth = depth
+        ctx.width = width
+        if widths:
+            ctx.widths.update(widths)
+        ctx.compile_valid = compile_valid
+        ctx.grammar = g.get_grammar(exclude, compile_valid)
+        _mutate_at(tree, index, ancestors, ctx, is_stmt)
+        replaced.add(id(old))
+    if isinstance(source_or_ast, str):
+        return ast.unparse(tree.root)
+    return tree.root
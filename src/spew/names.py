@@ -1,5 +1,3 @@
-import random
-
 FIRST_CHARS = "abcdefghijklmnopqrstuvwxyz"
 OTHER_CHARS = "abcdefghijklmnopqrstuvwxyz1234567890_"
 
@@ -7,10 +5,10 @@ OTHER_CHARS = "abcdefghijklmnopqrstuvwxyz1234567890_"
 def generate(ctx, new: bool = False) -> str:
     # TODO: create unique names
     if not new and ctx.names:
-        return random.choice(ctx.names)
+        return ctx.rng.choice(ctx.names)
 
-    name = random.choice(FIRST_CHARS)
+    name = ctx.rng.choice(FIRST_CHARS)
     for _ in range(10):
-        name += random.choice(OTHER_CHARS)
+        name += ctx.rng.choice(OTHER_CHARS)
     ctx.names.append(name)
     return name
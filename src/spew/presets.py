@@ -0,0 +1,152 @@
+"""
+Named shape presets that generate modules of an exact size, in lines or bytes,
+so benchmarks of downstream tools run on inputs of controlled size and
+consistent shape across runs and machines.
+
+A module is grown one top-level statement at a time, each generated from its
+own seed, until it reaches the target size. Statements that would overshoot the
+tolerance are skipped; if too many in a row do, the remaining statements are
+generated one level shallower, down to simple statements and, for the last few
+bytes, pass statements.
+"""
+
+import math
+import random
+import typing
+from dataclasses import dataclass, field
+
+import spew.generate as g
+from spew.seeds import derive_seed
+from spew.widths import Distribution, Geometric, Poisson
+
+SIZE_UNITS = ("lines", "bytes")
+DEFAULT_TOLERANCE = 0.02
+# Overshooting statements in a row before going one level shallower
+MAX_MISSES = 8
+# Shallowest depth, where the top-level statements are all simple statements
+MIN_DEPTH = 2
+
+
+@dataclass(frozen=True)
+class Preset:
+    depth: int
+    width: int
+    widths: dict[str, Distribution] = field(default_factory=dict)
+    exclude: tuple[str, ...] = ()
+    compile_valid: bool = False
+
+    def config(self, depth: int, compile_valid: bool) -> g.ModuleConfig:
+        return (
+            depth,
+            self.width,
+            self.widths,
+            self.exclude,
+            self.compile_valid or compile_valid,
+        )
+
+
+PRESETS = {
+    # Long lines of deeply nested expressions, few statements per block
+    "deep_narrow": Preset(depth=8, width=2),
+    # Many statements per block, little nesting
+    "wide_shallow": Preset(depth=3, width=25),
+    "balanced": Preset(depth=4, width=5),
+    # Closer to hand-written code: varied block sizes, few arguments and
+    # decorators, and code that compiles
+    "realistic": Preset(
+        depth=5,
+        width=4,
+        widths={
+            "body": Geometric(3, 1, 12),
+            "args": Poisson(1.5, 0, 6),
+            "call_args": Poisson(1, 0, 5),
+            "decorators": Poisson(0.3, 0, 3),
+            "elts": Geometric(2, 1, 8),
+        },
+        compile_valid=True,
+    ),
+}
+
+
+def _measure(source: str, unit: str) -> int:
+    """The size of a top-level statement, with the newline after it."""
+    if unit == "lines":
+        return source.count("\n") + 1
+    return len(source.encode("utf-8")) + 1
+
+
+def iter_preset_source(
+    preset: str,
+    size: int,
+    unit: str = "lines",
+    seed: int | None = None,
+    tolerance: float = DEFAULT_TOLERANCE,
+    compile_valid: bool = False,
+) -> typing.Iterator[str]:
+    """
+    Yield the source of the top-level statements of a module of the preset's
+    shape whose size, once joined with newlines and ending with one, is within
+    tolerance of size lines or bytes.
+    """
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown preset {preset!r}")
+    if unit not in SIZE_UNITS:
+        raise ValueError(f"Unknown size unit {unit!r}")
+    shape = PRESETS[preset]
+    if seed is None:
+        seed = random.getrandbits(64)
+    high = max(size, math.floor(size * (1 + tolerance)))
+    depth = shape.depth
+    # Picks the kind of each top-level statement
+    kinds = g._module_context(shape.config(depth, compile_valid), seed)
+    total = misses = 0
+    i = 0
+    with kinds.nested():
+        while total < size:
+            table = kinds.grammar.stmt_table(
+                kinds.constraints(), kinds.depth < kinds.max_depth - 1
+            )
+            task = (
+                shape.config(depth, compile_valid),
+                kinds.draw(table),
+                derive_seed(seed, i),
+                True,
+            )
+            i += 1
+            source = g._generate_top_level(task)
+            n = _measure(source, unit)
+            if total + n <= high:
+                total += n
+                misses = 0
+                yield source
+            elif misses < MAX_MISSES:
+                misses += 1
+            elif depth > MIN_DEPTH:
+                depth = kinds.max_depth = depth - 1
+                misses = 0
+            else:
+                break
+    # Pad what even simple statements overshoot
+    while total + _measure("pass", unit) <= high and total < size:
+        total += _measure("pass", unit)
+        yield "pass"
+
+
+def generate_preset(
+    preset: str,
+    size: int,
+    unit: str = "lines",
+    seed: int | None = None,
+    tolerance: float = DEFAULT_TOLERANCE,
+    compile_valid: bool = False,
+) -> str:
+    """
+    Generate the source of a module of the preset's shape, within tolerance of
+    size lines or bytes, see iter_preset_source().
+    """
+    return "".join(
+        source + "\n"
+        for source in iter_preset_source(
+            preset, size, unit, seed, tolerance, compile_valid
+        )
+    )
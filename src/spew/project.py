@@ -0,0 +1,231 @@
+"""
+Generate a multi-module project: a package tree whose modules import each other
+consistently, for benchmarking import time, linters and type checkers.
+
+The shape of the import graph is planned up front (which module imports which
+and what functions each module exports), then modules are generated in
+parallel since each only needs the plan of the modules it imports.
+"""
+
+import ast
+import concurrent.futures
+import logging
+import os
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from spew.generate import make_name
+from spew.seeds import derive_seed
+from spew.runnable import (
+    RunnableContext,
+    run_class,
+    run_function_body,
+    make_arguments,
+)
+
+logger = logging.getLogger(__name__)
+
+# Most statements a call of a generated function runs
+FUNCTION_COST = 1000
+
+
+@dataclass
+class ModulePlan:
+    package: str  # Dotted name of the package
+    name: str
+    # Exported functions, their number of parameters and the most statements a
+    # call of them runs, which is what callers in other modules are charged
+    functions: list[tuple[str, int, int]] = field(default_factory=list)
+    # Indexes of the modules this one imports. Only the functions of earlier
+    # modules are called, later ones create import cycles and are only imported
+    imports: list[int] = field(default_factory=list)
+
+    @property
+    def dotted_name(self) -> str:
+        return f"{self.package}.{self.name}"
+
+
+@dataclass
+class ProjectPlan:
+    packages: list[str]
+    modules: list[ModulePlan]
+    # When the graph has cycles, modules are imported as a whole instead of
+    # importing names from them, which would fail on partially initialized modules
+    import_names: bool
+
+
+def plan_project(
+    name: str,
+    modules: int,
+    packages: int,
+    package_depth: int = 2,
+    fan_out: int = 3,
+    fan_in_skew: float = 1.0,
+    cycles: float = 0.0,
+    functions: int = 3,
+    seed: int | None = None,
+) -> ProjectPlan:
+    """
+    Plan the package tree and import graph.
+
+    Each module imports up to fan_out earlier modules. Earlier modules are more
+    likely to be picked as fan_in_skew grows (0 is uniform), giving a few hub
+    modules with a large fan-in. With probability cycles an import points to a
+    later module instead, creating import cycles. Functions are only called
+    along imports of earlier modules, so calls can't recurse through a cycle.
+    """
+    rng = random.Random(seed)
+    package_names = [name]
+    package_depths = [0]
+    for i in range(1, max(1, packages)):
+        parents = [
+            p for p, depth in enumerate(package_depths) if depth < package_depth
+        ] or [0]
+        parent = rng.choice(parents)
+        package_names.append(f"{package_names[parent]}.pkg{i}")
+        package_depths.append(package_depths[parent] + 1)
+
+    plans = []
+    for i in range(modules):
+        plan = ModulePlan(rng.choice(package_names), f"mod{i}")
+        plan.functions = [
+            (
+                f"func{i}_{f}",
+                rng.randint(1, 3),
+                rng.randint(FUNCTION_COST // 10, FUNCTION_COST),
+            )
+            for f in range(max(1, functions))
+        ]
+        plans.append(plan)
+
+    weights = [(j + 1) ** -fan_in_skew for j in range(modules)]
+    for i, plan in enumerate(plans):
+        targets = set()
+        for _ in range(rng.randint(0, fan_out)):
+            if i < modules - 1 and rng.random() < cycles:
+                targets.add(rng.randrange(i + 1, modules))
+            elif i > 0:
+                targets.add(rng.choices(range(i), weights[:i])[0])
+        plan.imports = sorted(targets)
+    return ProjectPlan(package_names, plans, import_names=cycles == 0)
+
+
+def _generate_imports(
+    ctx: RunnableContext,
+    imported: list[ModulePlan],
+    import_names: bool,
+    cyclic: list[ModulePlan],
+) -> list[ast.stmt]:
+    imports: list[ast.stmt] = []
+    for plan in imported:
+        if import_names:
+            names = [ast.alias(name=func) for func, _, _ in plan.functions]
+            imports.append(
+                ast.ImportFrom(module=plan.dotted_name, names=names, level=0)
+            )
+            callables = plan.functions
+        else:
+            names = [ast.alias(name=plan.name)]
+            imports.append(ast.ImportFrom(module=plan.package, names=names, level=0))
+            callables = [
+                (f"{plan.name}.{func}", n_args, cost)
+                for func, n_args, cost in plan.functions
+            ]
+        ctx.functions.extend(callables)
+    # Modules in a cycle with this one are imported but never called into
+    for plan in cyclic:
+        names = [ast.alias(name=plan.name)]
+        imports.append(ast.ImportFrom(module=plan.package, names=names, level=0))
+    return imports
+
+
+def generate_project_module(
+    plan: ModulePlan,
+    imported: list[ModulePlan],
+    import_names: bool,
+    depth: int = 3,
+    width: int = 3,
+    classes: int = 1,
+    seed: int | None = None,
+    cyclic: list[ModulePlan] | None = None,
+) -> ast.Module:
+    """
+    Generate a planned module. Its functions call those of the imported
+    modules, while the cyclic ones, later modules importing this one, are only
+    imported.
+    """
+    ctx = RunnableContext(seed)
+    ctx.max_depth = depth
+    ctx.width = width
+    ctx.max_cost = FUNCTION_COST
+    mod = ast.Module(type_ignores=[])
+    mod.body = _generate_imports(ctx, imported, import_names, cyclic or [])
+    for func, n_args, max_cost in plan.functions:
+        f = ast.FunctionDef(name=func, decorator_list=[], lineno=1)
+        params = [make_name(ctx, new=True) for _ in range(n_args)]
+        f.args = make_arguments(params)
+        f.body, cost = run_function_body(ctx, params, max_cost)
+        ctx.functions.append((func, n_args, cost))
+        mod.body.append(f)
+    for _ in range(classes):
+        mod.body.append(run_class(ctx))
+    return ast.fix_missing_locations(mod)
+
+
+def _module_path(root: Path, dotted_name: str) -> Path:
+    return root.joinpath(*dotted_name.split(".")).with_suffix(".py")
+
+
+def _write_module(task: tuple) -> Path:
+    root, plan, imported, cyclic, import_names, depth, width, classes, seed = task
+    mod = generate_project_module(
+        plan, imported, import_names, depth, width, classes, seed, cyclic
+    )
+    path = _module_path(root, plan.dotted_name)
+    path.write_text(ast.unparse(mod) + "\n", encoding="utf-8")
+    return path
+
+
+def write_project(
+    root: Path,
+    plan: ProjectPlan,
+    depth: int = 3,
+    width: int = 3,
+    classes: int = 1,
+    seed: int | None = None,
+    jobs: int | None = None,
+) -> list[Path]:
+    """
+    Write the planned project under root, generating modules in parallel. Each
+    module is generated from a seed derived from seed, so the output doesn't
+    depend on the number of jobs.
+    """
+    if seed is None:
+        seed = random.getrandbits(64)
+    for package in plan.packages:
+        package_dir = root.joinpath(*package.split("."))
+        package_dir.mkdir(parents=True, exist_ok=True)
+        (package_dir / "__init__.py").touch()
+    tasks = [
+        (
+            root,
+            module,
+            [plan.modules[j] for j in module.imports if j < i],
+            [plan.modules[j] for j in module.imports if j > i],
+            plan.import_names,
+            depth,
+            width,
+            classes,
+            derive_seed(seed, i),
+        )
+        for i, module in enumerate(plan.modules)
+    ]
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1:
+        return [_write_module(task) for task in tasks]
+    chunksize = max(1, len(tasks) // (jobs * 4))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        paths = list(executor.map(_write_module, tasks, chunksize=chunksize))
+    logger.info("Wrote %d modules in %d packages", len(paths), len(plan.packages))
+    return paths
@@ -0,0 +1,200 @@
+"""
+A pytest plugin with fixtures of generated modules. It isn't loaded unless
+asked for, with pytest -p spew.pytest_plugin, or in a conftest.py:
+
+    pytest_plugins = ["spew.pytest_plugin"]
+
+spew_module is parametrized by seed, one test per seed. spew_corpus is the
+list of samples of all the seeds, or of one shard of them: with pytest-xdist,
+a test using it is split into one test per worker, each getting every n-th
+seed, so workers don't generate the same samples. The seeds, depth, width and
+mode come from the command line or a spew marker on the test:
+
+    @pytest.mark.spew(seeds=range(100), depth=3, compile_valid=True)
+    def test_parses(spew_module):
+        ast.parse(spew_module.source)
+
+Samples are cached on disk in the pytest cache directory, so later sessions
+don't generate them again.
+"""
+
+import ast
+import hashlib
+import os
+import pathlib
+import tempfile
+from dataclasses import dataclass
+
+import pytest
+
+import spew
+import spew.generate as g
+import spew.names
+import spew.randomcycle
+import spew.seeds
+import spew.widths
+
+DEFAULT_SEEDS = "0:10"
+DEFAULT_DEPTH = 3
+DEFAULT_WIDTH = 5
+CACHE_DIR = "spew"
+# The modules samples depend on, whose source is part of the cache key
+GENERATOR_MODULES = (g, spew.names, spew.randomcycle, spew.seeds, spew.widths)
+
+
+@dataclass
+class Sample:
+    seed: int
+    source: str
+
+    @property
+    def tree(self) -> ast.Module:
+        return ast.parse(self.source)
+
+
+@dataclass(frozen=True)
+class _Settings:
+    seeds: tuple[int, ...]
+    depth: int
+    width: int
+    compile_valid: bool
+
+
+def _parse_seeds(value: str) -> range:
+    """START:STOP, or STOP for 0:STOP."""
+    start, _, stop = value.rpartition(":")
+    return range(int(start or 0), int(stop))
+
+
+def pytest_addoption(parser: pytest.Parser):
+    group = parser.getgroup("spew", "Generated modules")
+    group.addoption(
+        "--spew-seeds",
+        default=DEFAULT_SEEDS,
+        help=f"Seeds of the generated samples, START:STOP (default {DEFAULT_SEEDS})",
+    )
+    group.addoption("--spew-depth", type=int, default=DEFAULT_DEPTH)
+    group.addoption("--spew-width", type=int, default=DEFAULT_WIDTH)
+    group.addoption(
+        "--spew-compile-valid",
+        action="store_true",
+        help="Generate samples that compile",
+    )
+    group.addoption(
+        "--spew-shards",
+        type=int,
+        default=None,
+        help="Shards of spew_corpus, the number of xdist workers by default",
+    )
+    group.addoption(
+        "--spew-no-cache", action="store_true", help="Don't cache samples on disk"
+    )
+
+
+def pytest_configure(config: pytest.Config):
+    config.addinivalue_line(
+        "markers",
+        "spew(seeds, depth, width, compile_valid): "
+        "settings of the spew_module and spew_corpus fixtures",
+    )
+
+
+def _settings(config: pytest.Config, marker: pytest.Mark | None) -> _Settings:
+    kwargs = marker.kwargs if marker else {}
+    seeds = kwargs.get("seeds")
+    if seeds is None:
+        seeds = _parse_seeds(config.getoption("spew_seeds"))
+    return _Settings(
+        tuple(seeds),
+        kwargs.get("depth", config.getoption("spew_depth")),
+        kwargs.get("width", config.getoption("spew_width")),
+        kwargs.get("compile_valid", config.getoption("spew_compile_valid")),
+    )
+
+
+def _shards(config: pytest.Config) -> int:
+    shards = config.getoption("spew_shards")
+    if shards is None:
+        # Workers all collect the same tests, so they must agree on this
+        workerinput = getattr(config, "workerinput", None)
+        shards = workerinput["workercount"] if workerinput else 1
+    return max(1, shards)
+
+
+def pytest_generate_tests(metafunc: pytest.Metafunc):
+    settings = _settings(
+        metafunc.config, metafunc.definition.get_closest_marker("spew")
+    )
+    if "spew_module" in metafunc.fixturenames:
+        metafunc.parametrize(
+            "spew_module",
+            [(settings, seed) for seed in settings.seeds],
+            indirect=True,
+            ids=[f"seed{seed}" for seed in settings.seeds],
+        )
+    if "spew_corpus" in metafunc.fixturenames:
+        shards = _shards(metafunc.config)
+        metafunc.parametrize(
+            "spew_corpus",
+            [(settings, settings.seeds[i::shards]) for i in range(shards)],
+            indirect=True,
+            ids=[f"shard{i}of{shards}" for i in range(shards)],
+        )
+
+
+_generator_hash: str | None = None
+
+
+def _cache_key(settings: _Settings, seed: int) -> str:
+    global _generator_hash
+    if _generator_hash is None:
+        # Samples change with the generators, not only with the version
+        digest = hashlib.sha256()
+        for module in GENERATOR_MODULES:
+            digest.update(pathlib.Path(module.__file__).read_bytes())
+        _generator_hash = digest.hexdigest()[:16]
+    parts = (
+        spew.__version__,
+        _generator_hash,
+        settings.depth,
+        settings.width,
+        settings.compile_valid,
+        seed,
+    )
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+
+def get_sample(config: pytest.Config, settings: _Settings, seed: int) -> Sample:
+    """Generate the sample of a seed, or load it from the cache."""
+    path = None
+    if config.cache is not None and not config.getoption("spew_no_cache"):
+        path = config.cache.mkdir(CACHE_DIR) / f"{_cache_key(settings, seed)}.py"
+        if path.exists():
+            return Sample(seed, path.read_text(encoding="utf-8"))
+    source = g.generate_source(
+        settings.depth,
+        settings.width,
+        compile_valid=settings.compile_valid,
+        seed=seed,
+    )
+    if path is not None:
+        # Written to a temporary file and renamed, as workers share the cache
+        fd, temp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(source)
+        os.replace(temp, path)
+    return Sample(seed, source)
+
+
+@pytest.fixture
+def spew_module(request: pytest.FixtureRequest) -> Sample:
+    """A generated module, one test per seed."""
+    settings, seed = request.param
+    return get_sample(request.config, settings, seed)
+
+
+@pytest.fixture
+def spew_corpus(request: pytest.FixtureRequest) -> list[Sample]:
+    """The generated modules of all the seeds, or of a shard of them."""
+    settings, seeds = request.param
+    return [get_sample(request.config, settings, seed) for seed in seeds]
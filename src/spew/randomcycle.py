@@ -4,10 +4,38 @@ import typing
 TCycle = typing.TypeVar("TCycle")
 
 
+class RandomCycle(typing.Generic[TCycle]):
+    """
+    Yields the items in a random order until they are exhausted, then starts again.
+
+    Iterating the cycle directly uses the global random state. Contexts keep
+    their own position in each cycle, shuffled with their own RNG, see
+    Context.draw().
+    """
+
+    def __init__(self, items: typing.Iterable[TCycle]):
+        self.items = tuple(items)
+        self._iterator: typing.Iterator[TCycle] | None = None
+
+    def __iter__(self) -> "RandomCycle[TCycle]":
+        return self
+
+    def __next__(self) -> TCycle:
+        if self._iterator is None:
+            self._iterator = self.iterate(_random)
+        return next(self._iterator)
+
+    def iterate(self, rng) -> typing.Iterator[TCycle]:
+        items = list(self.items)
+        while True:
+            # Fisher-Yates, one step per item drawn, as most cycles are only
+            # drawn from a few times before they're dropped
+            for remaining in range(len(items), 0, -1):
+                i = int(rng.random() * remaining)
+                items[i], items[remaining - 1] = items[remaining - 1], items[i]
+                yield items[remaining - 1]
+
+
 # Define a cycle that yields a random element in a list until it is exhausted then starts again
-def rcycle(l: typing.Iterable[TCycle]) -> typing.Generator[TCycle, None, None]:
-    while True:
-        items = list(l)
-        _random.shuffle(items)
-        for item in items:
-            yield item
+def rcycle(l: typing.Iterable[TCycle]) -> RandomCycle[TCycle]:
+    return RandomCycle(l)
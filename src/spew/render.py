@@ -0,0 +1,121 @@
+"""
+Render trees to source as ast.unparse() does, caching the source of each
+statement, so rendering a tree again after a small change only unparses the
+statements on the path from the change to the root.
+
+A statement's source only depends on its subtree and its indentation, so it's
+cached by node, and reused wherever the node is rendered again at the same
+indentation. Trees mutated copy-on-write, as mutate() and cross_over() do,
+need nothing else: the nodes on the path to a change are new and everything
+else is shared. After changing a node in place, call invalidate() with it
+before rendering again, which drops the cached source of the statements
+enclosing it. Those are recorded as nodes are rendered: for a node shared by
+several trees, they are the statements of the tree it was last rendered in, so
+edit in place trees that don't share nodes with others the renderer is used
+for.
+
+Caches only hold the nodes weakly, so the source of dropped trees is dropped
+with them.
+"""
+
+import ast
+import weakref
+
+
+class _CachingUnparser(ast._Unparser):
+    def __init__(self, renderer: "Renderer | None" = None, **kwargs):
+        super().__init__(**kwargs)
+        renderer = renderer or Renderer()
+        self._sources = renderer._sources
+        self._owners = renderer._owners
+        # The innermost statement being unparsed
+        self._owner: ast.stmt | None = None
+
+    def traverse(self, node):
+        if isinstance(node, list):
+            for item in node:
+                self.traverse(item)
+        elif isinstance(node, ast.stmt):
+            self._traverse_stmt(node)
+        else:
+            if self._owner is not None:
+                self._owners[node] = self._owner
+            # What ast._Unparser.traverse() does, without checking again
+            method = "visit_" + node.__class__.__name__
+            getattr(self, method, self.generic_visit)(node)
+
+    def visit_JoinedStr(self, node):
+        # Its values are unparsed by nested unparsers, without a renderer
+        if self._owner is not None:
+            for child in ast.walk(node):
+                self._owners[child] = self._owner
+        super().visit_JoinedStr(node)
+
+    def visit_FormattedValue(self, node):
+        if self._owner is not None:
+            for child in ast.walk(node):
+                self._owners[child] = self._owner
+        super().visit_FormattedValue(node)
+
+    def _traverse_stmt(self, node: ast.stmt):
+        if self._owner is not None:
+            self._owners[node] = self._owner
+        else:
+            self._owners.pop(node, None)
+        # Whether anything was written decides if the statement starts with a
+        # newline
+        key = (self._indent, bool(self._source))
+        cached = self._sources.get(node)
+        if cached is not None and cached[0] == key:
+            self._source.append(cached[1])
+            return
+        outer, outer_owner = self._source, self._owner
+        self._source = [""] if outer else []
+        self._owner = node
+        try:
+            super().traverse(node)
+            source = "".join(self._source)
+        finally:
+            self._source, self._owner = outer, outer_owner
+        self._sources[node] = (key, source)
+        outer.append(source)
+
+    def _write_docstring_and_traverse_body(self, node):
+        if node.body and self._owner is not None:
+            # A docstring is written without being traversed
+            first = node.body[0]
+            self._owners[first] = self._owner
+            if isinstance(first, ast.Expr):
+                self._owners[first.value] = first
+        super()._write_docstring_and_traverse_body(node)
+
+
+class Renderer:
+    """A cache of the source of statements, to render trees again quickly."""
+
+    def __init__(self):
+        # Indentation, whether it starts the output, and source by statement
+        self._sources: weakref.WeakKeyDictionary[
+            ast.stmt, tuple[tuple[int, bool], str]
+        ] = weakref.WeakKeyDictionary()
+        # The innermost statement enclosing each node, at its last render
+        self._owners: weakref.WeakKeyDictionary[ast.AST, ast.stmt] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def render(self, tree: ast.AST) -> str:
+        """The source of tree, the same as ast.unparse(tree)."""
+        if getattr(tree, "type_ignores", None):
+            # Type comments are looked up by line number in the whole module
+            return ast.unparse(tree)
+        return _CachingUnparser(self).visit(tree)
+
+    def invalidate(self, node: ast.AST) -> None:
+        """Drop the cached source of node and of the statements enclosing it."""
+        while node is not None:
+            self._sources.pop(node, None)
+            node = self._owners.get(node)
+
+    def clear(self) -> None:
+        self._sources.clear()
+        self._owners.clear()
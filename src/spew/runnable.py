@@ -0,0 +1,453 @@
+"""
+Generate programs that run to completion, for use as synthetic workloads.
+
+All values are integers, names are only read once they are defined, loops
+have bounded iteration counts and arithmetic is kept bounded with a modulus, so
+the programs never raise. The number of times the workload runs is calibrated
+to hit a target runtime. The generators are named run_* to keep them apart
+from those of spew.generate.
+"""
+
+import ast
+import logging
+import time
+import typing
+
+from spew.generate import (
+    Context,
+    make_name,
+    randbool,
+    randchoice,
+    randint,
+    sample_width,
+)
+from spew.randomcycle import rcycle
+from spew.widths import Distribution
+
+logger = logging.getLogger(__name__)
+
+# Values are reduced modulo this after every assignment, so they stay small
+MODULUS = 65521
+MAX_ITERATIONS = 10
+# Maximum number of statements executed per call of main()
+DEFAULT_MAX_COST = 20_000
+ENTRY_POINT = "main"
+RESULT = "result"
+
+
+class RunnableContext(Context):
+    # Names of the integer variables defined in each enclosing block
+    scopes: list[list[str]]
+    # Module-level functions, with their number of parameters and cost per call
+    functions: list[tuple[str, int, int]]
+    # Classes with a run(self, value) method, with the cost per call
+    classes: list[tuple[str, int]]
+    # Product of the iteration counts of the enclosing loops
+    multiplier: int
+    # Statements executed so far in the current function, per call
+    cost: int
+    max_cost: int
+
+    def __init__(self, seed: int | None = None):
+        super().__init__(seed)
+        self.scopes = []
+        self.functions = []
+        self.classes = []
+        self.multiplier = 1
+        self.cost = 0
+        self.max_cost = DEFAULT_MAX_COST
+
+    def visible(self) -> list[str]:
+        return [name for scope in self.scopes for name in scope]
+
+    def define(self, name: str) -> None:
+        self.scopes[-1].append(name)
+
+    def block(self, multiplier: int = 1):
+        return _Block(self, multiplier)
+
+    def budget(self) -> int:
+        """How many more iterations of a statement we can afford here."""
+        return (self.max_cost - self.cost) // self.multiplier
+
+
+class _Block:
+    """Enter a nested block, dropping the names it defines on exit."""
+
+    def __init__(self, ctx: RunnableContext, multiplier: int):
+        self.ctx = ctx
+        self.multiplier = multiplier
+
+    def __enter__(self):
+        self.ctx.scopes.append([])
+        self.ctx.multiplier *= self.multiplier
+        self.ctx.depth += 1
+
+    def __exit__(self, *exc):
+        self.ctx.depth -= 1
+        self.ctx.multiplier //= self.multiplier
+        self.ctx.scopes.pop()
+
+
+def _name(id_: str) -> ast.Name:
+    return ast.Name(id=id_, ctx=ast.Load())
+
+
+def _store(id_: str) -> ast.Name:
+    return ast.Name(id=id_, ctx=ast.Store())
+
+
+def _constant(value: int) -> ast.Constant:
+    return ast.Constant(value=value)
+
+
+def _bounded(value: ast.expr) -> ast.BinOp:
+    return ast.BinOp(left=value, op=ast.Mod(), right=_constant(MODULUS))
+
+
+def _assign(target: str, value: ast.expr) -> ast.Assign:
+    return ast.Assign(targets=[_store(target)], value=value, lineno=1)
+
+
+def _call(func: ast.expr, args: list[ast.expr]) -> ast.Call:
+    return ast.Call(func=func, args=args, keywords=[])
+
+
+def _charge(ctx: RunnableContext, cost: int = 1) -> None:
+    ctx.cost += cost * ctx.multiplier
+
+
+def run_leaf(ctx: RunnableContext) -> ast.expr:
+    names = ctx.visible()
+    if names and randbool(ctx):
+        return _name(randchoice(ctx, names))
+    return _constant(randint(ctx, 1, 100))
+
+
+SAFE_OPERATORS = [ast.Add, ast.Sub, ast.Mult, ast.BitXor, ast.BitAnd, ast.BitOr]
+safe_operators_cycle = rcycle(SAFE_OPERATORS)
+division_cycle = rcycle([ast.FloorDiv, ast.Mod])
+
+
+def run_binop(ctx: RunnableContext) -> ast.BinOp:
+    if randbool(ctx):
+        return ast.BinOp(
+            left=run_value(ctx),
+            op=ctx.draw(safe_operators_cycle)(),
+            right=run_value(ctx),
+        )
+    # Only ever divide by a non-zero constant
+    return ast.BinOp(
+        left=run_value(ctx),
+        op=ctx.draw(division_cycle)(),
+        right=_constant(randint(ctx, 1, 100)),
+    )
+
+
+def run_function_call(ctx: RunnableContext) -> ast.expr:
+    affordable = [f for f in ctx.functions if f[2] <= ctx.budget()]
+    if not affordable:
+        return run_leaf(ctx)
+    name, n_args, cost = randchoice(ctx, affordable)
+    _charge(ctx, cost)
+    return _call(_name(name), [run_value(ctx) for _ in range(n_args)])
+
+
+def run_method_call(ctx: RunnableContext) -> ast.expr:
+    affordable = [c for c in ctx.classes if c[1] <= ctx.budget()]
+    if not affordable:
+        return run_leaf(ctx)
+    name, cost = randchoice(ctx, affordable)
+    _charge(ctx, cost)
+    instance = _call(_name(name), [run_value(ctx)])
+    method = ast.Attribute(value=instance, attr="run", ctx=ast.Load())
+    return _call(method, [run_value(ctx)])
+
+
+VALUE_GENERATORS = [run_binop, run_function_call, run_method_call]
+value_generators_cycle = rcycle(VALUE_GENERATORS)
+
+
+def run_value(ctx: RunnableContext) -> ast.expr:
+    """An integer expression that can't raise."""
+    if ctx.depth >= ctx.max_depth or randbool(ctx):
+        return run_leaf(ctx)
+    ctx.depth += 1
+    try:
+        return ctx.draw(value_generators_cycle)(ctx)
+    finally:
+        ctx.depth -= 1
+
+
+def run_assign(ctx: RunnableContext) -> list[ast.stmt]:
+    _charge(ctx)
+    names = ctx.visible()
+    value = _bounded(run_value(ctx))
+    if names and randbool(ctx):
+        target = randchoice(ctx, names)
+    else:
+        # Only define the name once the value is generated, it can't use it
+        target = make_name(ctx, new=True)
+        ctx.define(target)
+    return [_assign(target, value)]
+
+
+def run_augassign(ctx: RunnableContext) -> list[ast.stmt]:
+    names = ctx.visible()
+    if not names:
+        return run_assign(ctx)
+    _charge(ctx)
+    return [
+        ast.AugAssign(
+            target=_store(randchoice(ctx, names)),
+            op=ast.Add(),
+            value=_bounded(run_value(ctx)),
+            lineno=1,
+        )
+    ]
+
+
+def _iterations(ctx: RunnableContext) -> int:
+    return min(MAX_ITERATIONS, ctx.budget() // 2)
+
+
+def run_for(ctx: RunnableContext) -> list[ast.stmt]:
+    n = _iterations(ctx)
+    if n < 2 or ctx.depth >= ctx.max_depth - 1:
+        return run_assign(ctx)
+    n = randint(ctx, 2, n)
+    f = ast.For(lineno=1, orelse=[])
+    target = make_name(ctx, new=True)
+    f.target = _store(target)
+    f.iter = _call(_name("range"), [_constant(n)])
+    with ctx.block(n):
+        ctx.define(target)
+        f.body = run_body(ctx)
+    return [f]
+
+
+def run_while(ctx: RunnableContext) -> list[ast.stmt]:
+    n = _iterations(ctx)
+    if n < 2 or ctx.depth >= ctx.max_depth - 1:
+        return run_assign(ctx)
+    n = randint(ctx, 2, n)
+    counter = make_name(ctx, new=True)
+    w = ast.While(lineno=1, orelse=[])
+    w.test = ast.Compare(
+        left=_name(counter), ops=[ast.Lt()], comparators=[_constant(n)]
+    )
+    _charge(ctx)
+    with ctx.block(n):
+        # Increment first so nothing in the body can skip it
+        w.body = [
+            ast.AugAssign(
+                target=_store(counter), op=ast.Add(), value=_constant(1), lineno=1
+            )
+        ]
+        w.body.extend(run_body(ctx))
+    return [_assign(counter, _constant(0)), w]
+
+
+compare_cycle = rcycle([ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq])
+
+
+def run_if(ctx: RunnableContext) -> list[ast.stmt]:
+    if ctx.depth >= ctx.max_depth - 1:
+        return run_assign(ctx)
+    _charge(ctx)
+    i = ast.If(lineno=1)
+    i.test = ast.Compare(
+        left=run_value(ctx),
+        ops=[ctx.draw(compare_cycle)()],
+        comparators=[run_value(ctx)],
+    )
+    # Both branches are charged, we don't know which one will run
+    with ctx.block():
+        i.body = run_body(ctx)
+    if randbool(ctx):
+        with ctx.block():
+            i.orelse = run_body(ctx)
+    else:
+        i.orelse = []
+    return [i]
+
+
+STMT_GENERATORS = [
+    run_assign,
+    run_augassign,
+    run_for,
+    run_while,
+    run_if,
+]
+stmt_generators_cycle = rcycle(STMT_GENERATORS)
+
+
+def run_body(ctx: RunnableContext) -> list[ast.stmt]:
+    body: list[ast.stmt] = []
+    for _ in range(max(1, sample_width(ctx, "body", ctx.width, ctx.width))):
+        if ctx.budget() < 1:
+            break
+        body.extend(ctx.draw(stmt_generators_cycle)(ctx))
+    return body or [ast.Pass()]
+
+
+def _result(ctx: RunnableContext) -> ast.expr:
+    names = ctx.visible()
+    if not names:
+        return _constant(0)
+    value: ast.expr = _name(names[0])
+    for name in names[1:]:
+        value = ast.BinOp(left=value, op=ast.Add(), right=_name(name))
+    return _bounded(value)
+
+
+def run_function_body(
+    ctx: RunnableContext, params: list[str], max_cost: int
+) -> tuple[list[ast.stmt], int]:
+    """Generate a function body and work out what a call of it costs."""
+    outer = (ctx.scopes, ctx.multiplier, ctx.cost, ctx.max_cost)
+    ctx.scopes, ctx.multiplier, ctx.cost, ctx.max_cost = [list(params)], 1, 1, max_cost
+    try:
+        with ctx.nested():
+            body = run_body(ctx)
+        body.append(ast.Return(value=_result(ctx)))
+        return body, ctx.cost
+    finally:
+        ctx.scopes, ctx.multiplier, ctx.cost, ctx.max_cost = outer
+
+
+def make_arguments(params: list[str]) -> ast.arguments:
+    return ast.arguments(
+        posonlyargs=[],
+        args=[ast.arg(arg=param) for param in params],
+        kwonlyargs=[],
+        kw_defaults=[],
+        defaults=[],
+    )
+
+
+def run_function(ctx: RunnableContext) -> ast.FunctionDef:
+    f = ast.FunctionDef(decorator_list=[], lineno=1)
+    f.name = make_name(ctx, new=True)
+    params = [make_name(ctx, new=True) for _ in range(sample_width(ctx, "args", 1, 3))]
+    f.args = make_arguments(params)
+    # Functions are called from loops, so keep them a fraction of the budget
+    f.body, cost = run_function_body(ctx, params, ctx.max_cost // 10)
+    ctx.functions.append((f.name, len(params), cost))
+    return f
+
+
+def run_class(ctx: RunnableContext) -> ast.ClassDef:
+    c = ast.ClassDef(bases=[], keywords=[], decorator_list=[], lineno=1)
+    c.name = make_name(ctx, new=True)
+    seed, value = make_name(ctx, new=True), make_name(ctx, new=True)
+    init = ast.FunctionDef(name="__init__", decorator_list=[], lineno=1)
+    init.args = make_arguments(["self", seed])
+    init.body = [
+        ast.Assign(
+            targets=[ast.Attribute(value=_name("self"), attr="value", ctx=ast.Store())],
+            value=_name(seed),
+            lineno=1,
+        )
+    ]
+    run = ast.FunctionDef(name="run", decorator_list=[], lineno=1)
+    run.args = make_arguments(["self", value])
+    body, cost = run_function_body(ctx, [value], ctx.max_cost // 10)
+    run.body = [
+        _assign(
+            value,
+            _bounded(
+                ast.BinOp(
+                    left=_name(value),
+                    op=ast.Add(),
+                    right=ast.Attribute(
+                        value=_name("self"), attr="value", ctx=ast.Load()
+                    ),
+                )
+            ),
+        )
+    ] + body
+    c.body = [init, run]
+    ctx.classes.append((c.name, cost + 2))
+    return c
+
+
+def _generate_workload(
+    ctx: RunnableContext, n_functions: int, n_classes: int, repeat: int
+) -> ast.Module:
+    mod = ast.Module(type_ignores=[])
+    mod.body = []
+    for _ in range(n_functions):
+        mod.body.append(run_function(ctx))
+    for _ in range(n_classes):
+        mod.body.append(run_class(ctx))
+    main = ast.FunctionDef(name=ENTRY_POINT, decorator_list=[], lineno=1)
+    main.args = make_arguments([])
+    main.body, _ = run_function_body(ctx, [], ctx.max_cost)
+    mod.body.append(main)
+    mod.body.append(_main_guard(repeat))
+    return mod
+
+
+def _main_guard(repeat: int) -> ast.If:
+    loop = ast.For(
+        target=_store("_"),
+        iter=_call(_name("range"), [_constant(repeat)]),
+        body=[_assign(RESULT, _call(_name(ENTRY_POINT), []))],
+        orelse=[],
+        lineno=1,
+    )
+    return ast.If(
+        test=ast.Compare(
+            left=_name("__name__"), ops=[ast.Eq()], comparators=[_constant("__main__")]
+        ),
+        body=[
+            _assign(RESULT, _constant(0)),
+            loop,
+            ast.Expr(value=_call(_name("print"), [_name(RESULT)])),
+        ],
+        orelse=[],
+    )
+
+
+def time_entry_point(mod: ast.Module, min_time: float = 0.05) -> float:
+    """Time one call of the workload's entry point, in seconds."""
+    namespace: dict[str, typing.Any] = {"__name__": "spew_workload"}
+    exec(compile(ast.fix_missing_locations(mod), "<spew>", "exec"), namespace)
+    main = namespace[ENTRY_POINT]
+    calls = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < min_time:
+        main()
+        calls += 1
+    return elapsed / calls
+
+
+def generate_workload(
+    target_runtime: float | None = None,
+    depth: int = 4,
+    width: int = 5,
+    functions: int = 3,
+    classes: int = 2,
+    max_cost: int = DEFAULT_MAX_COST,
+    widths: dict[str, Distribution] | None = None,
+    seed: int | None = None,
+) -> ast.Module:
+    """
+    Generate a program that runs to completion. When target_runtime is given,
+    the entry point is repeated enough times to run for about that many seconds
+    on this machine.
+    """
+    ctx = RunnableContext(seed)
+    ctx.max_depth = depth
+    ctx.width = width
+    ctx.max_cost = max_cost
+    if widths:
+        ctx.widths.update(widths)
+    mod = _generate_workload(ctx, functions, classes, repeat=1)
+    if target_runtime is not None:
+        per_call = time_entry_point(mod)
+        repeat = max(1, round(target_runtime / per_call))
+        logger.debug("Entry point takes %.6fs, repeating %d times", per_call, repeat)
+        mod.body[-1] = _main_guard(repeat)
+    return ast.fix_missing_locations(mod)
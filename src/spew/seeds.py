@@ -0,0 +1,14 @@
+"""
+Seed derivation, so independent parts of the output can be generated from
+their own seed in any order or process and still come out the same.
+"""
+
+_MASK64 = (1 << 64) - 1
+
+
+def derive_seed(seed: int, index: int) -> int:
+    """The seed of the index-th child of seed, mixed with SplitMix64."""
+    z = (seed + (index + 1) * 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
@@ -0,0 +1,185 @@
+"""
+Slow-input search: evolve generated modules that make a target slow, in the
+style of SlowFuzz and PerfFuzz.
+
+A population of modules is scored by the cost of the target on each, CPU time
+for a command and wall time for a callable, per byte of input. Each generation
+breeds children from the slowest modules, by mutating one with the generators
+or by crossing two over, and keeps the slowest of parents and children. The
+slowest inputs seen are ranked in the report.
+
+Scores are net of the cost of running the target on an empty module, so the
+startup time of a command doesn't favor the smallest inputs, and costs within
+the noise score 0.
+"""
+
+import ast
+import json
+import random
+import tempfile
+import typing
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import spew.generate as g
+from spew.bench import runner
+from spew.crossover import CorpusIndex, cross_over
+from spew.mutation import mutate
+from spew.render import Renderer
+from spew.seeds import derive_seed
+from spew.sweep import NOISE_FLOOR
+
+# Children bred by mutation rather than crossover
+MUTATION_RATE = 0.5
+# Parents are the slowest of this many random members of the population
+TOURNAMENT = 3
+
+
+@dataclass
+class Candidate:
+    source: str = field(repr=False)
+    bytes: int
+    # Net cost in seconds, and per byte
+    cost: float
+    score: float
+    generation: int
+    returncode: int
+
+
+def _rank(candidate: Candidate) -> tuple[float, float]:
+    # Costs break ties between inputs that are all within the noise
+    return (candidate.score, candidate.cost)
+
+
+def _tournament(
+    population: list[tuple[ast.Module, Candidate]], rng: random.Random
+) -> int:
+    contestants = rng.sample(range(len(population)), min(TOURNAMENT, len(population)))
+    return max(contestants, key=lambda i: _rank(population[i][1]))
+
+
+def _breed(
+    population: list[tuple[ast.Module, Candidate]],
+    index: CorpusIndex,
+    rng: random.Random,
+    max_mutations: int,
+    depth: int,
+    width: int,
+    compile_valid: bool,
+) -> ast.Module:
+    parent = _tournament(population, rng)
+    if len(population) == 1 or rng.random() < MUTATION_RATE:
+        return mutate(
+            population[parent][0],
+            rng.randint(1, max_mutations),
+            rng.getrandbits(64),
+            depth,
+            width,
+            compile_valid=compile_valid,
+        )
+    donor = _tournament(population, rng)
+    return cross_over(
+        index, parent, donor, rng.randint(1, max_mutations), rng.getrandbits(64)
+    )
+
+
+def search_slow_inputs(
+    target: str | typing.Callable[[str], typing.Any],
+    generations: int = 20,
+    population: int = 16,
+    keep: int = 10,
+    seed: int | None = None,
+    repeat: int = 1,
+    depth: int = 3,
+    width: int = 5,
+    max_mutations: int = 3,
+    compile_valid: bool = True,
+) -> list[Candidate]:
+    """
+    Evolve population modules for generations, and return the keep slowest
+    inputs per byte seen, slowest first. Each input is run repeat times and
+    its lowest cost kept. Inputs compile by default, as most tools reject code
+    that doesn't.
+    """
+    if seed is None:
+        seed = random.getrandbits(64)
+    rng = random.Random(seed)
+    run = runner(target)
+    seen: dict[str, Candidate] = {}
+    # Children share all but the paths to their changes with their parents
+    renderer = Renderer()
+
+    with tempfile.TemporaryDirectory(prefix="spew-slow-") as directory:
+        path = Path(directory) / "sample.py"
+        path.write_text("", encoding="utf-8")
+        overhead = min(run(path).cost for _ in range(repeat))
+        noise = max(NOISE_FLOOR, 0.1 * overhead)
+
+        def evaluate(tree: ast.Module, generation: int) -> Candidate:
+            source = renderer.render(tree) + "\n"
+            if source in seen:
+                return seen[source]
+            path.write_text(source, encoding="utf-8")
+            runs = [run(path) for _ in range(repeat)]
+            cost = max(min(r.cost for r in runs) - overhead, 0.0)
+            size = len(source.encode("utf-8"))
+            score = cost / size if cost >= noise else 0.0
+            seen[source] = Candidate(
+                source, size, cost, score, generation, runs[0].returncode
+            )
+            return seen[source]
+
+        members = []
+        for i in range(population):
+            tree = g.generate_module(
+                depth,
+                width,
+                compile_valid=compile_valid,
+                seed=derive_seed(seed, i),
+            )
+            members.append((tree, evaluate(tree, 0)))
+        for generation in range(1, generations + 1):
+            index = CorpusIndex([tree for tree, _ in members], compile_valid)
+            children = []
+            for _ in range(population):
+                child = _breed(
+                    members, index, rng, max_mutations, depth, width, compile_valid
+                )
+                children.append((child, evaluate(child, generation)))
+            members = sorted(
+                members + children, key=lambda member: _rank(member[1]), reverse=True
+            )[:population]
+
+    ranked = sorted(seen.values(), key=_rank, reverse=True)
+    return ranked[:keep]
+
+
+def save_slow_inputs(candidates: list[Candidate], directory: Path) -> list[Path]:
+    """
+    Write the inputs, slow_001.py being the slowest, and a report.json ranking
+    them to directory.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    report = []
+    for rank, candidate in enumerate(candidates, 1):
+        path = directory / f"slow_{rank:03d}.py"
+        path.write_text(candidate.source, encoding="utf-8")
+        paths.append(path)
+        entry = asdict(candidate)
+        del entry["source"]
+        report.append({"rank": rank, "path": path.name, **entry})
+    (directory / "report.json").write_text(
+        json.dumps(report, indent=2) + "\n", encoding="utf-8"
+    )
+    return paths
+
+
+def format_slow_inputs(candidates: list[Candidate]) -> str:
+    lines = [f"{'rank':>4} {'us/byte':>9} {'ms':>9} {'bytes':>8} {'generation':>10}"]
+    for rank, candidate in enumerate(candidates, 1):
+        lines.append(
+            f"{rank:>4} {candidate.score * 1e6:>9.3f} {candidate.cost * 1000:>9.1f} "
+            f"{candidate.bytes:>8} {candidate.generation:>10}"
+        )
+    return "\n".join(lines)
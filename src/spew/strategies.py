@@ -0,0 +1,173 @@
+"""
+Hypothesis strategies for modules, statements and expressions, built on the
+generators. Requires Hypothesis (pip install spew[hypothesis]).
+
+Every choice the generators make is drawn from Hypothesis's data, so failing
+examples shrink. Draws are ordered so that they shrink towards simple code: a
+module drops whole statements, a statement becomes a simple one rather than a
+compound one, an expression becomes a name or constant leaf
+(FLAT_EXPR_GENERATORS) rather than an operation, and optional parts (an else
+block, decorators, defaults...) are left out.
+
+    @given(spew.strategies.modules(compile_valid=True))
+    def test_compiles(module):
+        compile(module, "test.py", "exec")
+"""
+
+import ast
+import random
+import typing
+
+import hypothesis.strategies as st
+
+import spew.generate as g
+from spew.names import FIRST_CHARS, OTHER_CHARS
+from spew.randomcycle import RandomCycle
+from spew.widths import Distribution
+
+# Drawn first when shrinking, then the simple statements, then compound ones
+_LEAVES = frozenset([g.generate_pass, *g.FLAT_EXPR_GENERATORS])
+_COMPOUND = frozenset(
+    generator for _, is_nested, generator in g.STMT_GENERATORS if is_nested
+)
+_simplest_first: dict[RandomCycle, list] = {}
+
+
+class _DataRandom:
+    """
+    Draws from Hypothesis's data, except the characters of new names: they
+    come from a private generator, so shrinking doesn't make names collide.
+    """
+
+    def __init__(self, data_random: random.Random, names: random.Random):
+        self._data = data_random
+        self._names = names
+
+    def choice(self, seq: typing.Sequence):
+        if seq is FIRST_CHARS or seq is OTHER_CHARS:
+            return self._names.choice(seq)
+        return self._data.choice(seq)
+
+    def __getattr__(self, name: str):
+        return getattr(self._data, name)
+
+
+class _DataContext(g.Context):
+    """A context whose random choices are all drawn from Hypothesis's data."""
+
+    def __init__(self, data: st.DataObject, names: random.Random):
+        self.data = data
+        self._rng = _DataRandom(data.draw(st.randoms(use_true_random=False)), names)
+        super().__init__(0)
+
+    @property
+    def rng(self) -> _DataRandom:
+        return self._rng
+
+    @rng.setter
+    def rng(self, value: random.Random):
+        # Statements seed their own RNG, keep drawing from the data instead
+        pass
+
+    def draw(self, cycle: RandomCycle[g.T]) -> g.T:
+        if cycle is g.boolcycle:
+            # False, what booleans shrink to, leaves the optional nodes out
+            return self.data.draw(st.booleans())
+        grammar = self.grammar
+        if cycle is grammar.expr_cycle or cycle in grammar.expr_tables.values():
+            # False, what booleans shrink to, stops at a leaf
+            if not self.data.draw(st.booleans()):
+                cycle = grammar.flat_expr_cycle
+        items = _simplest_first.get(cycle)
+        if items is None:
+            items = _simplest_first[cycle] = sorted(
+                cycle.items,
+                key=lambda item: (item not in _LEAVES, item in _COMPOUND),
+            )
+        return self.data.draw(st.sampled_from(items))
+
+
+def _context(
+    data: st.DataObject,
+    depth: int,
+    width: int,
+    widths: dict[str, Distribution] | None,
+    exclude: typing.Iterable[str],
+    compile_valid: bool,
+    names: random.Random | None = None,
+) -> _DataContext:
+    ctx = _DataContext(data, names or random.Random(0))
+    ctx.max_depth = depth
+    ctx.width = width
+    if widths:
+        ctx.widths.update(widths)
+    ctx.compile_valid = compile_valid
+    ctx.prune_names = True
+    ctx.grammar = g.get_grammar(exclude, compile_valid)
+    return ctx
+
+
+@st.composite
+def expressions(
+    draw,
+    depth: int = 3,
+    width: int = 3,
+    widths: dict[str, Distribution] | None = None,
+    exclude: typing.Iterable[str] = (),
+    compile_valid: bool = False,
+) -> ast.expr:
+    """An expression, nested at most depth deep."""
+    ctx = _context(draw(st.data()), depth, width, widths, exclude, compile_valid)
+    return ast.fix_missing_locations(g.generate_expr(ctx))
+
+
+@st.composite
+def _statements(
+    draw,
+    depth: int,
+    width: int,
+    widths: dict[str, Distribution] | None,
+    exclude: typing.Iterable[str],
+    compile_valid: bool,
+    names: random.Random | None,
+) -> ast.stmt:
+    ctx = _context(draw(st.data()), depth, width, widths, exclude, compile_valid, names)
+    with ctx.nested():
+        table = ctx.grammar.stmt_table(ctx.constraints(), ctx.depth < ctx.max_depth - 1)
+        return ast.fix_missing_locations(ctx.draw(table)(ctx))
+
+
+def statements(
+    depth: int = 3,
+    width: int = 3,
+    widths: dict[str, Distribution] | None = None,
+    exclude: typing.Iterable[str] = (),
+    compile_valid: bool = False,
+) -> st.SearchStrategy[ast.stmt]:
+    """A top-level statement, nested at most depth deep."""
+    return _statements(depth, width, widths, exclude, compile_valid, None)
+
+
+@st.composite
+def modules(
+    draw,
+    depth: int = 3,
+    width: int = 3,
+    widths: dict[str, Distribution] | None = None,
+    exclude: typing.Iterable[str] = (),
+    compile_valid: bool = False,
+) -> ast.Module:
+    """
+    A module of 1 to width top-level statements, each generated independently
+    as in generate_module(). It always parses, and compiles if compile_valid.
+    """
+    # New names differ between statements, as they would from different seeds
+    names = random.Random(0)
+    body = draw(
+        st.lists(
+            _statements(depth, width, widths, exclude, compile_valid, names),
+            min_size=1,
+            max_size=width,
+        )
+    )
+    return ast.Module(body=body, type_ignores=[])
@@ -0,0 +1,138 @@
+"""
+Stress profiles: pathological but valid modules, grown along one dimension to a
+given size, for finding superlinear behavior in parsers, formatters and linters.
+
+Each profile builds its construct with the regular generators, then grows the
+part being stressed. The rest is kept small: expressions in the stressed
+construct are at most one operation deep.
+"""
+
+import ast
+import random
+import typing
+
+import spew.generate as g
+from spew.seeds import derive_seed
+
+# Max depth of the context the stressed constructs are generated in
+DEPTH = 2
+WIDTH = 3
+# CPython's tokenizer rejects more than 100 levels of indentation
+MAX_NESTING = 99
+
+
+def stress_deep_nesting(ctx: g.Context, size: int) -> list[ast.stmt]:
+    """size nested if statements."""
+    if size > MAX_NESTING:
+        raise ValueError(f"deep_nesting can't nest more than {MAX_NESTING} blocks")
+    body: list[ast.stmt] = [g.generate_pass(ctx)]
+    for _ in range(size):
+        node = ast.If(test=g.generate_expr(ctx), body=body, orelse=[], lineno=1)
+        body = [node]
+    return body
+
+
+def stress_flat_body(ctx: g.Context, size: int) -> list[ast.stmt]:
+    """A module of size simple statements."""
+    config = (DEPTH, WIDTH, None, tuple(ctx.grammar.exclude), ctx.compile_valid)
+    ctx.width = size
+    generators = g._top_level_generators(ctx)
+    ctx.width = WIDTH
+    return [
+        g._generate_top_level((config, generator, derive_seed(ctx.seed, i), False))
+        for i, generator in enumerate(generators)
+    ]
+
+
+def _expression(node: ast.expr) -> list[ast.stmt]:
+    expr = ast.Expr(value=node)
+    expr.lineno = 1
+    return [expr]
+
+
+def stress_big_literal(ctx: g.Context, size: int) -> list[ast.stmt]:
+    """A dict of size items."""
+    d = g.generate_dict(ctx)
+    del d.keys[size:], d.values[size:]
+    d.keys.extend(g.generate_expr(ctx) for _ in range(size - len(d.keys)))
+    d.values.extend(g.generate_expr(ctx) for _ in range(size - len(d.values)))
+    return _expression(d)
+
+
+def stress_long_line(ctx: g.Context, size: int) -> list[ast.stmt]:
+    """A call with size arguments, on a single line."""
+    c = g.generate_call(ctx)
+    c.keywords = []
+    del c.args[size:]
+    c.args.extend(g.generate_expr(ctx) for _ in range(size - len(c.args)))
+    return _expression(c)
+
+
+def stress_long_boolop(ctx: g.Context, size: int) -> list[ast.stmt]:
+    """A boolean operation on size operands."""
+    b = g.generate_boolop(ctx)
+    del b.values[max(2, size) :]
+    b.values.extend(g.generate_expr(ctx) for _ in range(size - len(b.values)))
+    return _expression(b)
+
+
+def stress_long_compare(ctx: g.Context, size: int) -> list[ast.stmt]:
+    """A chain of size comparisons."""
+    c = g.generate_compare(ctx)
+    del c.comparators[size:]
+    c.comparators.extend(g.generate_expr(ctx) for _ in range(size - len(c.comparators)))
+    c.ops = [ctx.draw(g.cmpop_cycle)() for _ in c.comparators]
+    return _expression(c)
+
+
+def stress_giant_match(ctx: g.Context, size: int) -> list[ast.stmt]:
+    """A match statement with size cases."""
+    m = g.generate_match(ctx)
+    while len(m.cases) < size:
+        m.cases.extend(g.generate_match(ctx).cases)
+    del m.cases[size:]
+    if ctx.compile_valid:
+        # Only the last case can be irrefutable, unless it is guarded
+        for case in m.cases[:-1]:
+            if case.guard is None and g._is_irrefutable(case.pattern):
+                case.guard = g.generate_expr(ctx)
+    return [m]
+
+
+def stress_many_decorators(ctx: g.Context, size: int) -> list[ast.stmt]:
+    """A function with size decorators."""
+    f = g.generate_function(ctx)
+    del f.decorator_list[size:]
+    f.decorator_list.extend(
+        g.generate_expr(ctx) for _ in range(size - len(f.decorator_list))
+    )
+    return [f]
+
+
+STRESS_PROFILES: dict[str, typing.Callable[[g.Context, int], list[ast.stmt]]] = {
+    "deep_nesting": stress_deep_nesting,
+    "flat_body": stress_flat_body,
+    "big_literal": stress_big_literal,
+    "long_line": stress_long_line,
+    "long_boolop": stress_long_boolop,
+    "long_compare": stress_long_compare,
+    "giant_match": stress_giant_match,
+    "many_decorators": stress_many_decorators,
+}
+
+
+def generate_stress(
+    profile: str,
+    size: int,
+    seed: int | None = None,
+    compile_valid: bool = False,
+) -> ast.Module:
+    """Generate a module of the given stress profile and size."""
+    if profile not in STRESS_PROFILES:
+        raise ValueError(f"Unknown stress profile {profile!r}")
+    if seed is None:
+        seed = random.getrandbits(64)
+    ctx = g._module_context((DEPTH, WIDTH, None, (), compile_valid), seed)
+    mod = ast.Module(type_ignores=[])
+    mod.body = STRESS_PROFILES[profile](ctx, size)
+    return ast.fix_missing_locations(mod)
@@ -0,0 +1,206 @@
+"""
+Complexity sweeps: run a target on families of stress modules of geometrically
+increasing size, one family per stress profile, and fit how its cost grows with
+the size. A target whose cost grows faster than linearly in some dimension
+(body length, nesting depth, literal length, compare chain length...) has a
+superlinear algorithm for that construct.
+
+The cost of a run is the CPU time of a command target, or the wall time of a
+callable, minus the cost of running it on an empty module, so the startup time
+of a command doesn't hide the growth. Costs below that of the empty module are
+noise and left out. The exponent is the slope of log cost against log size over
+the larger half of the remaining sizes, where the growth dominates.
+"""
+
+import ast
+import json
+import math
+import random
+import statistics
+import tempfile
+import typing
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from spew.bench import runner
+from spew.seeds import derive_seed
+from spew.stress import MAX_NESTING, STRESS_PROFILES, generate_stress
+
+# Exponents above this are flagged as superlinear, leaving room for noise
+DEFAULT_THRESHOLD = 1.5
+# A run that costs this much more than linear growth from the smallest measured
+# size shows the blow-up
+BLOWUP_FACTOR = 2.0
+# Costs below this, in seconds, are always noise
+NOISE_FLOOR = 1e-4
+# Largest size of the profiles that have one
+MAX_SIZES = {"deep_nesting": MAX_NESTING}
+
+
+@dataclass
+class Point:
+    size: int
+    bytes: int
+    cost: float
+
+
+@dataclass
+class Sweep:
+    profile: str
+    points: list[Point]
+    # None if too few points are above the noise to fit
+    exponent: float | None
+    superlinear: bool
+    # The smallest size showing the blow-up, and its source, if superlinear
+    blowup: int | None = None
+    blowup_source: str | None = field(default=None, repr=False)
+
+
+def sweep_sizes(start: int, factor: float, steps: int, limit: int | None = None):
+    """Geometrically increasing sizes, without duplicates."""
+    sizes: list[int] = []
+    for i in range(steps):
+        size = round(start * factor**i)
+        if limit is not None and size > limit:
+            break
+        if not sizes or size > sizes[-1]:
+            sizes.append(size)
+    return sizes
+
+
+def fit_exponent(points: list[Point]) -> float | None:
+    """The growth exponent of the cost over the larger half of the points."""
+    fitted = points[len(points) // 2 :] if len(points) >= 6 else points[-3:]
+    if len(fitted) < 3:
+        return None
+    x = [math.log(point.size) for point in fitted]
+    y = [math.log(point.cost) for point in fitted]
+    return statistics.linear_regression(x, y).slope
+
+
+def _blowup(points: list[Point]) -> Point:
+    """The smallest point costing BLOWUP_FACTOR times more than linear growth."""
+    reference = points[0]
+    for point in points[1:]:
+        linear = reference.cost * point.size / reference.size
+        if point.cost > BLOWUP_FACTOR * linear:
+            return point
+    return points[-1]
+
+
+def sweep_profile(
+    target: str | typing.Callable[[str], typing.Any],
+    profile: str,
+    sizes: list[int],
+    seed: int | None = None,
+    repeat: int = 3,
+    max_cost: float = 10.0,
+    threshold: float = DEFAULT_THRESHOLD,
+    compile_valid: bool = False,
+) -> Sweep:
+    """
+    Run the target on the stress modules of the profile for each size, keeping
+    the lowest cost of repeat runs. Sizes past the first whose cost reaches
+    max_cost seconds are skipped.
+    """
+    if seed is None:
+        seed = random.getrandbits(64)
+    run = runner(target)
+    sources = {}
+    points = []
+    with tempfile.TemporaryDirectory(prefix="spew-sweep-") as directory:
+        path = Path(directory) / "sample.py"
+        path.write_text("", encoding="utf-8")
+        overhead = min(run(path).cost for _ in range(repeat))
+        for size in sizes:
+            # The same seed for each size, so only the size changes
+            mod = generate_stress(profile, size, seed, compile_valid)
+            source = sources[size] = ast.unparse(mod) + "\n"
+            path.write_text(source, encoding="utf-8")
+            cost = min(run(path).cost for _ in range(repeat))
+            points.append(Point(size, len(source.encode("utf-8")), cost - overhead))
+            if cost >= max_cost:
+                break
+    floor = max(overhead, NOISE_FLOOR)
+    measured = [point for point in points if point.cost >= floor]
+    exponent = fit_exponent(measured)
+    sweep = Sweep(
+        profile, points, exponent, exponent is not None and exponent > threshold
+    )
+    if sweep.superlinear:
+        sweep.blowup = _blowup(measured).size
+        sweep.blowup_source = sources[sweep.blowup]
+    return sweep
+
+
+def sweep_target(
+    target: str | typing.Callable[[str], typing.Any],
+    profiles: typing.Iterable[str] | None = None,
+    start: int = 8,
+    factor: float = 2.0,
+    steps: int = 8,
+    seed: int | None = None,
+    repeat: int = 3,
+    max_cost: float = 10.0,
+    threshold: float = DEFAULT_THRESHOLD,
+    compile_valid: bool = False,
+) -> list[Sweep]:
+    """
+    Sweep each stress profile, all by default, from start to start *
+    factor**(steps - 1), see sweep_profile().
+    """
+    if seed is None:
+        seed = random.getrandbits(64)
+    sweeps = []
+    for profile in profiles or STRESS_PROFILES:
+        if profile not in STRESS_PROFILES:
+            raise ValueError(f"Unknown stress profile {profile!r}")
+        sizes = sweep_sizes(start, factor, steps, MAX_SIZES.get(profile))
+        sweeps.append(
+            sweep_profile(
+                target,
+                profile,
+                sizes,
+                derive_seed(seed, list(STRESS_PROFILES).index(profile)),
+                repeat,
+                max_cost,
+                threshold,
+                compile_valid,
+            )
+        )
+    return sweeps
+
+
+def write_sweep_report(sweeps: list[Sweep], path: Path) -> None:
+    """Write the sweeps as JSON, without the blow-up sources, see save_blowups()."""
+    report = [asdict(sweep) for sweep in sweeps]
+    for sweep in report:
+        del sweep["blowup_source"]
+    path.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+
+def save_blowups(sweeps: list[Sweep], directory: Path) -> list[Path]:
+    """Write the smallest blow-up input of each superlinear sweep to directory."""
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for sweep in sweeps:
+        if sweep.blowup_source is not None:
+            path = directory / f"{sweep.profile}_{sweep.blowup}.py"
+            path.write_text(sweep.blowup_source, encoding="utf-8")
+            paths.append(path)
+    return paths
+
+
+def format_sweeps(sweeps: list[Sweep]) -> str:
+    lines = [f"{'profile':>16} {'sizes':>11} {'exponent':>9}  growth"]
+    for sweep in sweeps:
+        sizes = f"{sweep.points[0].size}-{sweep.points[-1].size}"
+        if sweep.exponent is None:
+            exponent, growth = "-", "too fast to measure, try larger sizes"
+        else:
+            exponent = f"{sweep.exponent:.2f}"
+            growth = "linear or better"
+            if sweep.superlinear:
+                growth = f"SUPERLINEAR from size {sweep.blowup}"
+        lines.append(f"{sweep.profile:>16} {sizes:>11} {exponent:>9}  {growth}")
+    return "\n".join(lines)
@@ -0,0 +1,314 @@
+"""
+Token-stream output, for fuzzing and benchmarking tokenizers without
+unparsing a module and tokenizing it again.
+
+The tokens are those tokenize.generate_tokens() gives for the unparsed module
+ending with a newline: same types, strings and positions, though the line of
+each token is left empty. They're lexed from the fragments the unparser writes
+as it walks the tree, one top-level statement at a time, so the source of the
+module is never built. The whitespace, line continuations and comments between
+tokens can be varied, see TokenStyle.
+
+On Python 3.12+, tokenize splits f-strings into FSTRING_START, FSTRING_MIDDLE
+and FSTRING_END tokens; here they're a single STRING token, as before 3.12.
+"""
+
+import ast
+import random
+import re
+import string
+import tokenize
+import typing
+from dataclasses import dataclass
+from tokenize import TokenInfo
+
+import spew.generate as g
+
+# The unparser indents by 4 spaces
+UNPARSE_INDENT = 4
+MAX_EXTRA_SPACES = 3
+MAX_COMMENT_LENGTH = 12
+STRING_PREFIXES = frozenset(
+    prefix.lower() for prefix in tokenize._all_string_prefixes() if prefix
+)
+
+# Fragments the unparser writes are mostly the same few operators and
+# keywords, their tokens are cached
+MAX_PLANS = 10000
+_SPACES = -1
+
+_pseudo_token = re.compile(tokenize.PseudoToken)
+_plans: dict[str, list[tuple[int, str]]] = {}
+
+
+def _plan(fragment: str) -> list[tuple[int, str]]:
+    """
+    Lex a fragment into tokens, runs of spaces and newlines. String literals
+    are written whole, so a quote starts a string up to the end.
+    """
+    plan = []
+    pos, n = 0, len(fragment)
+    while pos < n:
+        char = fragment[pos]
+        if char == " ":
+            end = pos + 1
+            while end < n and fragment[end] == " ":
+                end += 1
+            plan.append((_SPACES, fragment[pos:end]))
+            pos = end
+        elif char in "'\"":
+            plan.append((tokenize.STRING, fragment[pos:]))
+            break
+        elif char == "\n":
+            plan.append((tokenize.NEWLINE, char))
+            pos += 1
+        else:
+            match = _pseudo_token.match(fragment, pos)
+            start, pos = match.span(1)
+            text = fragment[start:pos]
+            if text[0] in "0123456789" or (text[0] == "." and text not in (".", "...")):
+                plan.append((tokenize.NUMBER, text))
+            elif text[0] == "#":
+                plan.append((tokenize.COMMENT, text))
+            elif text[-1] in "'\"":
+                # A prefixed string, such as the repr of bytes
+                plan.append((tokenize.STRING, text))
+            elif text[0].isidentifier():
+                plan.append((tokenize.NAME, text))
+            else:
+                plan.append((tokenize.OP, text))
+    return plan
+
+
+@dataclass(frozen=True)
+class TokenStyle:
+    # Probability of 1 to MAX_EXTRA_SPACES extra spaces before a token
+    spaces: float = 0.0
+    # Probability of a backslash line continuation before a token
+    continuations: float = 0.0
+    # Probability of a comment at the end of a logical line, and of one on its
+    # own line before it
+    comments: float = 0.0
+    # Spaces per indentation level
+    indent: int = UNPARSE_INDENT
+
+
+class _TokenSink:
+    """
+    Stands in for the list of fragments of an unparser and lexes them into
+    tokens as they're written.
+    """
+
+    def __init__(self, style: TokenStyle, rng: random.Random):
+        self.style = style
+        self.rng = rng
+        self.tokens: list[TokenInfo] = []
+        self.written = False
+        self.row, self.col = 1, 0
+        self.indents = [0]
+        # Whether no token has been written on the current line yet, and the
+        # spaces the unparser wrote at its start
+        self.line_start = True
+        self.leading = 0
+        self.varied = bool(style.spaces or style.continuations)
+
+    def __bool__(self) -> bool:
+        # The unparser checks whether anything was written before a newline
+        return self.written
+
+    def extend(self, fragments: typing.Iterable[str]):
+        for fragment in fragments:
+            if not fragment:
+                continue
+            self.written = True
+            plan = _plans.get(fragment)
+            if plan is None:
+                plan = _plan(fragment)
+                if (
+                    len(_plans) < MAX_PLANS
+                    and "'" not in fragment
+                    and '"' not in fragment
+                ):
+                    _plans[fragment] = plan
+            for type, text in plan:
+                if type == _SPACES:
+                    if self.line_start:
+                        self.leading += len(text)
+                    else:
+                        self.col += len(text)
+                elif type == tokenize.NEWLINE:
+                    self._newline()
+                elif type == tokenize.STRING:
+                    self._string(text)
+                else:
+                    self._token(type, text)
+
+    def _string(self, text: str):
+        if self.tokens and not self.line_start:
+            prefix = self.tokens[-1]
+            if (
+                prefix.type == tokenize.NAME
+                and prefix.string.lower() in STRING_PREFIXES
+                and prefix.end == (self.row, self.col)
+            ):
+                # The f or u written before the string is part of it
+                self.tokens.pop()
+                self.row, self.col = prefix.start
+                self._emit(tokenize.STRING, prefix.string + text)
+                return
+        self._token(tokenize.STRING, text)
+
+    def _token(self, type: int, text: str):
+        if self.line_start:
+            self._start_line()
+        elif self.varied:
+            self._vary()
+        if type == tokenize.STRING:
+            self._emit(type, text)
+            return
+        # Only strings span lines
+        row, col = self.row, self.col
+        self.col += len(text)
+        self.tokens.append(TokenInfo(type, text, (row, col), (row, self.col), ""))
+
+    def _emit(self, type: int, text: str):
+        start = (self.row, self.col)
+        newlines = text.count("\n")
+        if newlines:
+            self.row += newlines
+            self.col = len(text) - text.rindex("\n") - 1
+        else:
+            self.col += len(text)
+        self.tokens.append(TokenInfo(type, text, start, (self.row, self.col), ""))
+
+    def _comment(self) -> str:
+        length = self.rng.randint(1, MAX_COMMENT_LENGTH)
+        return "# " + "".join(self.rng.choices(string.ascii_lowercase, k=length))
+
+    def _start_line(self):
+        col = self.leading // UNPARSE_INDENT * self.style.indent
+        self.line_start = False
+        self.leading = 0
+        if self.style.comments and self.rng.random() < self.style.comments:
+            # Comment lines don't count for indentation
+            self.col = col
+            self._emit(tokenize.COMMENT, self._comment())
+            self._end_line(tokenize.NL)
+        if col > self.indents[-1]:
+            self.indents.append(col)
+            self.col = 0
+            self._emit(tokenize.INDENT, " " * col)
+        while col < self.indents[-1]:
+            self.indents.pop()
+            self.tokens.append(
+                TokenInfo(tokenize.DEDENT, "", (self.row, col), (self.row, col), "")
+            )
+        self.col = col
+
+    def _vary(self):
+        style, rng = self.style, self.rng
+        if style.continuations and rng.random() < style.continuations:
+            self.row += 1
+            self.col = self.indents[-1] + style.indent
+        elif style.spaces and rng.random() < style.spaces:
+            self.col += rng.randint(1, MAX_EXTRA_SPACES)
+
+    def _end_line(self, type: int):
+        end = (self.row, self.col + 1)
+        self.tokens.append(TokenInfo(type, "\n", (self.row, self.col), end, ""))
+        self.row, self.col = self.row + 1, 0
+
+    def _newline(self):
+        if self.line_start:
+            self.col = 0
+            self._end_line(tokenize.NL)
+        else:
+            if self.style.comments and self.rng.random() < self.style.comments:
+                self.col += 2
+                self._emit(tokenize.COMMENT, self._comment())
+            self._end_line(tokenize.NEWLINE)
+        self.line_start = True
+        self.leading = 0
+
+    def finish(self):
+        if not self.line_start:
+            self._newline()
+        for _ in self.indents[1:]:
+            self.tokens.append(
+                TokenInfo(tokenize.DEDENT, "", (self.row, 0), (self.row, 0), "")
+            )
+        self.tokens.append(
+            TokenInfo(tokenize.ENDMARKER, "", (self.row, 0), (self.row, 0), "")
+        )
+
+
+def _is_docstring(node: ast.AST) -> bool:
+    return (
+        isinstance(node, ast.Expr)
+        and isinstance(node.value, ast.Constant)
+        and isinstance(node.value.value, str)
+    )
+
+
+def _iter_tokens(
+    nodes: typing.Iterable[ast.AST],
+    module: bool,
+    style: TokenStyle | None,
+    seed: int | None,
+) -> typing.Iterator[TokenInfo]:
+    sink = _TokenSink(style or TokenStyle(), random.Random(seed))
+    unparser = ast._Unparser()
+    unparser._source = sink
+    for i, node in enumerate(nodes):
+        if module and i == 0 and _is_docstring(node):
+            unparser._write_docstring(node.value)
+        else:
+            unparser.traverse(node)
+        yield from sink.tokens
+        sink.tokens.clear()
+    sink.finish()
+    yield from sink.tokens
+
+
+def iter_tokens(
+    tree: ast.AST, style: TokenStyle | None = None, seed: int | None = None
+) -> typing.Iterator[TokenInfo]:
+    """
+    Yield the tokens of the unparsed tree, one top-level statement at a time
+    for a module. seed drives the variations of the style.
+    """
+    if isinstance(tree, ast.Module):
+        return _iter_tokens(tree.body, True, style, seed)
+    return _iter_tokens([tree], False, style, seed)
+
+
+def iter_module_tokens(
+    depth: int,
+    width: int,
+    widths: dict[str, g.Distribution] | None = None,
+    exclude: typing.Iterable[str] = (),
+    compile_valid: bool = False,
+    seed: int | None = None,
+    jobs: int = 1,
+    style: TokenStyle | None = None,
+) -> typing.Iterator[TokenInfo]:
+    """
+    Generate a module in bounded memory, yielding its tokens as each top-level
+    statement is generated. The tokens are those of generate_module() with the
+    same seed.
+    """
+    if seed is None:
+        seed = random.getrandbits(64)
+    config = (depth, width, widths, tuple(exclude), compile_valid)
+    stmts = g._iter_top_level(config, seed, jobs, unparse=False)
+    return _iter_tokens(stmts, True, style, seed)
+
+
+def format_token(token: TokenInfo) -> str:
+    """A token as python -m tokenize prints it."""
+    token_range = "%d,%d-%d,%d:" % (token.start + token.end)
+    return "%-20s%-15s%-15r" % (
+        token_range,
+        tokenize.tok_name[token.type],
+        token.string,
+    )
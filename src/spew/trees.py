@@ -0,0 +1,97 @@
+"""
+Helpers shared by the modules editing existing trees: locations of nodes linked
+up to the root, the nodes of a scope, and copy-on-write edits.
+"""
+
+import ast
+import copy
+import typing
+
+# (parent link, parent node, field, index in the field or None): the location
+# of a node, linked up to the root
+Location = tuple[typing.Any, ast.AST, str, int | None]
+
+SCOPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)
+COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+
+def ancestors_of(location: Location) -> list[tuple[ast.AST, str, int | None]]:
+    """The (node, field, index) steps from the root down to the location."""
+    ancestors = []
+    link: Location | None = location
+    while link is not None:
+        link, node, field, index = link
+        ancestors.append((node, field, index))
+    ancestors.reverse()
+    return ancestors
+
+
+def scope_nodes(scope: ast.AST) -> typing.Iterator[ast.AST]:
+    """The nodes in a scope, not descending into nested scopes."""
+    stack = list(ast.iter_child_nodes(scope))
+    while stack:
+        node = stack.pop()
+        yield node
+        if not isinstance(node, SCOPES):
+            stack.extend(ast.iter_child_nodes(node))
+
+
+def node_names(nodes: typing.Iterable[ast.AST]) -> list[str]:
+    """The names the nodes bind or refer to."""
+    names = []
+    for node in nodes:
+        if isinstance(node, ast.Name):
+            names.append(node.id)
+        elif isinstance(node, ast.arg):
+            names.append(node.arg)
+        elif isinstance(node, ast.alias) and node.name != "*":
+            names.append(node.asname or node.name.partition(".")[0])
+        elif isinstance(
+            node,
+            (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.ExceptHandler),
+        ) or isinstance(node, (ast.MatchAs, ast.MatchStar)):
+            if node.name:
+                names.append(node.name)
+    return names
+
+
+def is_async_generator(function: ast.AsyncFunctionDef) -> bool:
+    # An async function can take a yield as long as it doesn't return a value
+    return not any(
+        isinstance(node, ast.Return) and node.value is not None
+        for node in scope_nodes(function)
+    )
+
+
+class CopyOnWrite:
+    """
+    Copies of the nodes on the paths to the edits, so the original tree is
+    untouched and shares everything else with the edited one.
+    """
+
+    def __init__(self, root: ast.AST):
+        self.copies: dict[int, ast.AST] = {}
+        self.lists: set[tuple[int, str]] = set()
+        self.root = self.copy(root)
+
+    def copy(self, node: ast.AST) -> ast.AST:
+        node_copy = self.copies.get(id(node))
+        if node_copy is None:
+            node_copy = self.copies[id(node)] = copy.copy(node)
+        return node_copy
+
+    def field(self, node: ast.AST, field: str) -> list:
+        """A list field of the copy of node, copied the first time."""
+        node_copy = self.copy(node)
+        if (id(node_copy), field) not in self.lists:
+            setattr(node_copy, field, list(getattr(node_copy, field)))
+            self.lists.add((id(node_copy), field))
+        return getattr(node_copy, field)
+
+    def replace(self, ancestors: list[tuple[ast.AST, str, int | None]], new: ast.AST):
+        children = [self.copy(node) for node, _, _ in ancestors[1:]] + [new]
+        for (node, field, i), child in zip(ancestors, children):
+            if i is None:
+                setattr(self.copy(node), field, child)
+            else:
+                self.field(node, field)[i] = child
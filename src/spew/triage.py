@@ -0,0 +1,308 @@
+"""
+Crash triage: bucket crashing samples by a signature of the crash, so there
+is one bucket to look at per bug rather than one sample per crash.
+
+A signature is the type of the exception and the innermost frames of its
+traceback, as file and function names: line numbers and messages are left
+out, as they vary between crashes of the same bug and versions of the target.
+Each bucket keeps the smallest sample crashing its way, and an index of the
+buckets is written next to the samples, and merged into on later runs.
+
+The target is a callable given the source of each sample, crashing when it
+raises, or a command given each sample on stdin or as the path in place of {}.
+A command crashes when it dies of a signal, or exits with a Python traceback
+on stderr; other failures, such as a linter reporting errors, aren't crashes.
+"""
+
+import hashlib
+import json
+import re
+import shlex
+import signal
+import subprocess
+import tempfile
+import traceback
+import typing
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import spew.generate as g
+from spew.seeds import derive_seed
+
+# Innermost frames in a signature
+DEFAULT_FRAMES = 5
+DEFAULT_TIMEOUT = 10.0
+INDEX = "index.json"
+TIMEOUT = "Timeout"
+
+_traceback_start = re.compile(r"^Traceback \(most recent call last\):$", re.M)
+_frame_line = re.compile(r'^  File "(?P<file>[^"]*)", line \d+, in (?P<name>.+)$')
+_exception_line = re.compile(r"^(?P<type>[A-Za-z_][\w.]*)(?::|$)")
+
+
+@dataclass(frozen=True)
+class Crash:
+    # Type of the exception, as tracebacks print it, or the signal
+    exception: str
+    # file:function of the innermost frames, innermost first
+    frames: tuple[str, ...]
+    message: str = field(default="", compare=False)
+
+    @property
+    def signature(self) -> str:
+        key = "\n".join((self.exception, *self.frames))
+        return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+@dataclass
+class Bucket:
+    signature: str
+    exception: str
+    frames: list[str]
+    count: int
+    # The smallest sample crashing this way, its size, seed and message
+    source: str = field(repr=False)
+    bytes: int
+    seed: int | None
+    message: str
+
+
+def _frame(filename: str, function: str) -> str:
+    # Paths differ between machines, keep those within packages
+    path = filename.replace("\\", "/")
+    _, sep, package_path = path.rpartition("site-packages/")
+    return f"{package_path if sep else path.rpartition('/')[2]}:{function}"
+
+
+def _exception_name(exc_type: type) -> str:
+    name = exc_type.__qualname__
+    if exc_type.__module__ not in ("builtins", "__main__"):
+        name = f"{exc_type.__module__}.{name}"
+    return name
+
+
+def crash_from_exception(exc: BaseException, frames: int = DEFAULT_FRAMES) -> Crash:
+    """The crash of an exception raised by a callable target."""
+    stack = [
+        _frame(frame.filename, frame.name)
+        for frame in traceback.extract_tb(exc.__traceback__)
+        # The frame calling the target
+        if frame.filename != __file__
+    ]
+    message = str(exc).partition("\n")[0]
+    return Crash(_exception_name(type(exc)), tuple(reversed(stack))[:frames], message)
+
+
+def crash_from_stderr(
+    stderr: str, returncode: int, frames: int = DEFAULT_FRAMES
+) -> Crash | None:
+    """
+    The crash of a command from its exit status and the last Python traceback
+    on its stderr, or None if it didn't crash.
+    """
+    stack: list[str] = []
+    exception = message = ""
+    starts = list(_traceback_start.finditer(stderr))
+    if starts:
+        for line in stderr[starts[-1].end() :].splitlines():
+            match = _frame_line.match(line)
+            if match:
+                stack.append(_frame(match["file"], match["name"]))
+            elif line and not line[0].isspace():
+                match = _exception_line.match(line)
+                if match:
+                    exception = match["type"]
+                    message = line[match.end() :].strip()
+                break
+    if returncode < 0:
+        try:
+            exception = f"signal {signal.Signals(-returncode).name}"
+        except ValueError:
+            exception = f"signal {-returncode}"
+    elif returncode == 0 or not exception:
+        return None
+    return Crash(exception, tuple(reversed(stack))[:frames], message)
+
+
+class Triage:
+    """The buckets of the crashes seen, by signature."""
+
+    def __init__(self, buckets: typing.Iterable[Bucket] = ()):
+        self.buckets: dict[str, Bucket] = {
+            bucket.signature: bucket for bucket in buckets
+        }
+
+    def add(self, source: str, crash: Crash, seed: int | None = None) -> Bucket:
+        """Count a crashing sample, keeping it if it's its bucket's smallest."""
+        size = len(source.encode("utf-8"))
+        bucket = self.buckets.get(crash.signature)
+        if bucket is None:
+            bucket = self.buckets[crash.signature] = Bucket(
+                crash.signature,
+                crash.exception,
+                list(crash.frames),
+                0,
+                source,
+                size,
+                seed,
+                crash.message,
+            )
+        elif size < bucket.bytes:
+            bucket.source, bucket.bytes = source, size
+            bucket.seed, bucket.message = seed, crash.message
+        bucket.count += 1
+        return bucket
+
+    def ranked(self) -> list[Bucket]:
+        """The buckets, most crashes first."""
+        return sorted(
+            self.buckets.values(), key=lambda bucket: (-bucket.count, bucket.bytes)
+        )
+
+
+def _run_command(
+    command: list[str], source: str, frames: int, timeout: float
+) -> Crash | None:
+    path = None
+    if "{}" in command:
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", prefix="spew-triage-", suffix=".py", delete=False
+        ) as f:
+            f.write(source)
+        path = Path(f.name)
+    try:
+        process = subprocess.run(
+            [str(path) if arg == "{}" else arg for arg in command],
+            input=None if path else source,
+            stdin=subprocess.DEVNULL if path else None,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors="replace",
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return Crash(TIMEOUT, ())
+    finally:
+        if path is not None:
+            path.unlink()
+    return crash_from_stderr(process.stderr, process.returncode, frames)
+
+
+def crash_runner(
+    target: str | typing.Callable[[str], typing.Any],
+    frames: int = DEFAULT_FRAMES,
+    ignore: tuple[type[BaseException], ...] = (),
+    timeout: float = DEFAULT_TIMEOUT,
+) -> typing.Callable[[str], Crash | None]:
+    """
+    A function running the target on a source, and returning its crash or
+    None. Exceptions of a callable in ignore, e.g. SyntaxError for a parser,
+    are the target rejecting the input rather than crashing. Commands running
+    for longer than timeout seconds are killed, and crash as Timeout.
+    """
+    if isinstance(target, str):
+        command = shlex.split(target)
+        return lambda source: _run_command(command, source, frames, timeout)
+
+    def run(source: str) -> Crash | None:
+        try:
+            target(source)
+        except ignore:
+            return None
+        except Exception as e:
+            return crash_from_exception(e, frames)
+        return None
+
+    return run
+
+
+def triage_samples(
+    target: str | typing.Callable[[str], typing.Any],
+    paths: typing.Iterable[Path],
+    triage: Triage | None = None,
+    frames: int = DEFAULT_FRAMES,
+    ignore: tuple[type[BaseException], ...] = (),
+    timeout: float = DEFAULT_TIMEOUT,
+) -> Triage:
+    """Run the target on samples already collected, and bucket the crashes."""
+    triage = triage or Triage()
+    run = crash_runner(target, frames, ignore, timeout)
+    for path in paths:
+        source = Path(path).read_text(encoding="utf-8")
+        crash = run(source)
+        if crash is not None:
+            triage.add(source, crash)
+    return triage
+
+
+def fuzz_target(
+    target: str | typing.Callable[[str], typing.Any],
+    samples: int,
+    seed: int = 0,
+    depth: int = 3,
+    width: int = 5,
+    compile_valid: bool = False,
+    triage: Triage | None = None,
+    frames: int = DEFAULT_FRAMES,
+    ignore: tuple[type[BaseException], ...] = (),
+    timeout: float = DEFAULT_TIMEOUT,
+) -> Triage:
+    """
+    Run the target on samples generated from seeds derived from seed, and
+    bucket the crashes. Each bucket records the seed of its smallest sample.
+    """
+    triage = triage or Triage()
+    run = crash_runner(target, frames, ignore, timeout)
+    for i in range(samples):
+        sample_seed = derive_seed(seed, i)
+        source = g.generate_source(
+            depth, width, compile_valid=compile_valid, seed=sample_seed
+        )
+        crash = run(source)
+        if crash is not None:
+            triage.add(source, crash, sample_seed)
+    return triage
+
+
+def save_triage(triage: Triage, directory: Path) -> Path:
+    """
+    Write the smallest sample of each bucket as <signature>.py and the index
+    of the buckets, most crashes first, to directory. Returns the index.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    index = []
+    for bucket in triage.ranked():
+        path = directory / f"{bucket.signature}.py"
+        if not path.exists() or path.read_text(encoding="utf-8") != bucket.source:
+            path.write_text(bucket.source, encoding="utf-8")
+        entry = asdict(bucket)
+        del entry["source"]
+        index.append({**entry, "path": path.name})
+    index_path = directory / INDEX
+    index_path.write_text(json.dumps(index, indent=2) + "\n", encoding="utf-8")
+    return index_path
+
+
+def load_triage(directory: Path) -> Triage:
+    """The buckets saved to directory, empty if there's no index yet."""
+    index_path = directory / INDEX
+    if not index_path.exists():
+        return Triage()
+    buckets = []
+    for entry in json.loads(index_path.read_text(encoding="utf-8")):
+        path = entry.pop("path")
+        source = (directory / path).read_text(encoding="utf-8")
+        buckets.append(Bucket(source=source, **entry))
+    return Triage(buckets)
+
+
+def format_triage(triage: Triage) -> str:
+    lines = [f"{'signature':<16} {'crashes':>7} {'bytes':>8}  exception"]
+    for bucket in triage.ranked():
+        top = f" in {bucket.frames[0]}" if bucket.frames else ""
+        lines.append(
+            f"{bucket.signature:<16} {bucket.count:>7} {bucket.bytes:>8}  "
+            f"{bucket.exception}{top}"
+        )
+    return "\n".join(lines)
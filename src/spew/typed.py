@@ -0,0 +1,798 @@
+"""
+Generate consistently typed modules, for benchmarking and stressing type
+checkers.
+
+Every function, method, parameter, attribute and variable is annotated, and
+every expression has the type it's annotated with: annotations are built from
+builtin generics (list, dict, tuple), unions, Callable, and the protocols,
+generic classes and classes the module defines, and values only refer to names
+whose type fits. The module is planned first, so annotations only refer to
+names defined above them.
+
+Calls are only made in function bodies, so importing a module runs no
+generated code but the class definitions.
+"""
+
+import ast
+from dataclasses import dataclass, field
+
+from spew.generate import (
+    Context,
+    make_name,
+    randbool,
+    randchoice,
+    randint,
+    sample_width,
+)
+from spew.randomcycle import rcycle
+from spew.widths import Distribution
+
+TYPING_NAMES = ["Callable", "Generic", "Protocol", "TypeVar"]
+PRIMITIVES = ["int", "float", "str", "bytes", "bool", "None"]
+# int is accepted where float is, and bool where int is
+PROMOTIONS = {("int", "float"), ("bool", "int"), ("bool", "float")}
+MAX_UNION = 3
+MAX_CALLABLE_PARAMS = 3
+
+
+@dataclass(frozen=True)
+class Prim:
+    name: str
+
+    def annotation(self) -> ast.expr:
+        return ast.Constant(value=None) if self.name == "None" else _name(self.name)
+
+
+@dataclass(frozen=True)
+class ListOf:
+    item: "Type"
+
+    def annotation(self) -> ast.expr:
+        return _subscript("list", self.item.annotation())
+
+
+@dataclass(frozen=True)
+class DictOf:
+    key: "Type"
+    value: "Type"
+
+    def annotation(self) -> ast.expr:
+        return _subscript(
+            "dict", ast.Tuple(elts=[self.key.annotation(), self.value.annotation()])
+        )
+
+
+@dataclass(frozen=True)
+class TupleOf:
+    items: tuple["Type", ...]
+
+    def annotation(self) -> ast.expr:
+        return _subscript(
+            "tuple", ast.Tuple(elts=[item.annotation() for item in self.items])
+        )
+
+
+@dataclass(frozen=True)
+class UnionOf:
+    options: tuple["Type", ...]
+
+    def annotation(self) -> ast.expr:
+        union = self.options[0].annotation()
+        for option in self.options[1:]:
+            union = ast.BinOp(left=union, op=ast.BitOr(), right=option.annotation())
+        return union
+
+
+@dataclass(frozen=True)
+class CallableOf:
+    params: tuple["Type", ...]
+    returns: "Type"
+
+    def annotation(self) -> ast.expr:
+        params = ast.List(elts=[param.annotation() for param in self.params])
+        return _subscript(
+            "Callable", ast.Tuple(elts=[params, self.returns.annotation()])
+        )
+
+
+@dataclass(frozen=True)
+class Instance:
+    """An instance of a class or protocol the module defines."""
+
+    name: str
+
+    def annotation(self) -> ast.expr:
+        return _name(self.name)
+
+
+@dataclass(frozen=True)
+class GenericOf:
+    """A generic class the module defines, parametrized by a type."""
+
+    name: str
+    arg: "Type"
+
+    def annotation(self) -> ast.expr:
+        return _subscript(self.name, self.arg.annotation())
+
+
+Type = Prim | ListOf | DictOf | TupleOf | UnionOf | CallableOf | Instance | GenericOf
+NONE = Prim("None")
+BOOL = Prim("bool")
+INT = Prim("int")
+
+
+@dataclass
+class Signature:
+    name: str
+    params: list[tuple[str, Type]]
+    returns: Type
+
+
+@dataclass
+class ProtocolInfo:
+    name: str
+    methods: list[Signature]
+    implementers: list[str] = field(default_factory=list)
+
+
+@dataclass
+class GenericInfo:
+    name: str
+    typevar: str
+
+
+@dataclass
+class ClassInfo:
+    name: str
+    attributes: list[tuple[str, Type]]
+    methods: list[Signature]
+    protocols: list[str]
+
+
+# The path of a value, e.g. ("self", "attr"), and its type
+Value = tuple[tuple[str, ...], Type]
+
+
+class TypedContext(Context):
+    protocols: dict[str, ProtocolInfo]
+    generics: dict[str, GenericInfo]
+    classes: dict[str, ClassInfo]
+    functions: list[Signature]
+    # Classes and protocols that can be annotated with at this point
+    annotatable: list[str]
+    # Typed values visible in each enclosing block
+    scopes: list[list[Value]]
+    # Whether calls can be made, only in function bodies
+    can_call: bool
+
+    def __init__(self, seed: int | None = None):
+        super().__init__(seed)
+        self.protocols = {}
+        self.generics = {}
+        self.classes = {}
+        self.functions = []
+        self.annotatable = []
+        self.scopes = [[]]
+        self.can_call = False
+
+    def visible(self) -> list[Value]:
+        return [value for scope in self.scopes for value in scope]
+
+    def define(self, name: str, type_: Type) -> None:
+        self.scopes[-1].append(((name,), type_))
+
+    def block(self) -> "_Block":
+        return _Block(self)
+
+    def methods(self, type_: Type) -> list[Signature]:
+        if isinstance(type_, Instance):
+            info = self.classes.get(type_.name) or self.protocols[type_.name]
+            return info.methods
+        if isinstance(type_, GenericOf):
+            return [
+                Signature("get", [], type_.arg),
+                Signature("put", [("item", type_.arg)], NONE),
+            ]
+        return []
+
+    def attributes(self, type_: Type) -> list[tuple[str, Type]]:
+        if isinstance(type_, Instance) and type_.name in self.classes:
+            return self.classes[type_.name].attributes
+        if isinstance(type_, GenericOf):
+            return [("item", type_.arg)]
+        return []
+
+
+class _Block:
+    """Enter a nested block, dropping the values it defines on exit."""
+
+    def __init__(self, ctx: TypedContext):
+        self.ctx = ctx
+
+    def __enter__(self):
+        self.ctx.scopes.append([])
+        self.ctx.depth += 1
+
+    def __exit__(self, *exc):
+        self.ctx.depth -= 1
+        self.ctx.scopes.pop()
+
+
+def _name(id_: str) -> ast.Name:
+    return ast.Name(id=id_, ctx=ast.Load())
+
+
+def _store(id_: str) -> ast.Name:
+    return ast.Name(id=id_, ctx=ast.Store())
+
+
+def _subscript(value: str, slice: ast.expr) -> ast.Subscript:
+    return ast.Subscript(value=_name(value), slice=slice, ctx=ast.Load())
+
+
+def _path(path: tuple[str, ...], store: bool = False) -> ast.expr:
+    node: ast.expr = _name(path[0])
+    for attr in path[1:]:
+        node = ast.Attribute(value=node, attr=attr, ctx=ast.Load())
+    if store:
+        node.ctx = ast.Store()
+    return node
+
+
+def _call(func: ast.expr, args: list[ast.expr]) -> ast.Call:
+    return ast.Call(func=func, args=args, keywords=[])
+
+
+def _class_name(ctx: TypedContext) -> str:
+    return make_name(ctx, new=True).capitalize()
+
+
+def assignable(ctx: TypedContext, source: Type, target: Type) -> bool:
+    """Whether a value of type source can be used where target is expected."""
+    if source == target:
+        return True
+    if isinstance(source, UnionOf):
+        return all(assignable(ctx, option, target) for option in source.options)
+    if isinstance(target, UnionOf):
+        return any(assignable(ctx, source, option) for option in target.options)
+    if isinstance(source, Prim) and isinstance(target, Prim):
+        return (source.name, target.name) in PROMOTIONS
+    if isinstance(source, Instance) and isinstance(target, Instance):
+        protocol = ctx.protocols.get(target.name)
+        return protocol is not None and source.name in protocol.implementers
+    return False
+
+
+def generate_leaf_type(ctx: TypedContext) -> Type:
+    """A primitive type, or an instance of a class or protocol defined above."""
+    if ctx.annotatable and randbool(ctx):
+        return Instance(randchoice(ctx, ctx.annotatable))
+    return Prim(randchoice(ctx, PRIMITIVES))
+
+
+def generate_union_type(ctx: TypedContext) -> Type:
+    options: list[Type] = []
+    for _ in range(randint(ctx, 2, MAX_UNION)):
+        option = generate_leaf_type(ctx)
+        if option not in options:
+            options.append(option)
+    if len(options) == 1:
+        options.append(NONE) if options[0] != NONE else options.append(INT)
+    return UnionOf(tuple(options))
+
+
+def generate_callable_type(ctx: TypedContext, depth: int) -> Type:
+    params = tuple(
+        generate_leaf_type(ctx) for _ in range(randint(ctx, 0, MAX_CALLABLE_PARAMS))
+    )
+    return CallableOf(params, generate_type(ctx, depth - 1, callables=False))
+
+
+def generate_type(ctx: TypedContext, depth: int, callables: bool = True) -> Type:
+    """
+    A type nested at most depth deep. Callables are only used at the top of
+    annotations, where lambdas can be inferred.
+    """
+    if depth <= 0:
+        return generate_leaf_type(ctx)
+    kind = ctx.draw(type_kinds_cycle)
+    if kind == "list":
+        return ListOf(generate_type(ctx, depth - 1, False))
+    if kind == "dict":
+        key = Prim(randchoice(ctx, ["str", "int"]))
+        return DictOf(key, generate_type(ctx, depth - 1, False))
+    if kind == "tuple":
+        n_items = randint(ctx, 1, 3)
+        return TupleOf(
+            tuple(generate_type(ctx, depth - 1, False) for _ in range(n_items))
+        )
+    if kind == "union":
+        return generate_union_type(ctx)
+    if kind == "callable" and callables:
+        return generate_callable_type(ctx, depth)
+    if kind == "generic" and ctx.generics:
+        name = randchoice(ctx, list(ctx.generics))
+        return GenericOf(name, generate_type(ctx, depth - 1, False))
+    return generate_leaf_type(ctx)
+
+
+type_kinds_cycle = rcycle(
+    ["leaf", "leaf", "list", "dict", "tuple", "union", "callable", "generic"]
+)
+
+
+def generate_literal(ctx: TypedContext, type_: Prim) -> ast.Constant:
+    if type_.name == "int":
+        return ast.Constant(value=randint(ctx, 0, 100))
+    if type_.name == "float":
+        return ast.Constant(value=randint(ctx, 0, 1000) / 8)
+    if type_.name == "str":
+        return ast.Constant(value=make_name(ctx, new=True))
+    if type_.name == "bytes":
+        return ast.Constant(value=make_name(ctx, new=True).encode())
+    if type_.name == "bool":
+        return ast.Constant(value=randbool(ctx))
+    return ast.Constant(value=None)
+
+
+def _elements(ctx: TypedContext, type_: Type, depth: int) -> list[ast.expr]:
+    if depth <= 0:
+        return []
+    n_elts = sample_width(ctx, "elts", 0, ctx.width)
+    return [generate_value(ctx, type_, depth - 1) for _ in range(n_elts)]
+
+
+def _construct(ctx: TypedContext, name: str, depth: int) -> ast.Call:
+    if name in ctx.protocols:
+        implementers = ctx.protocols[name].implementers
+        # Later implementers can have attributes of the protocol, the first
+        # was planned before it could be annotated with
+        name = randchoice(ctx, implementers) if depth > 0 else implementers[0]
+    info = ctx.classes[name]
+    args = [generate_value(ctx, type_, depth - 1) for _, type_ in info.attributes]
+    return _call(_name(name), args)
+
+
+def _operation(ctx: TypedContext, type_: Type, depth: int) -> ast.expr | None:
+    """An operation giving a value of type_, if there is one."""
+    if type_ in (INT, Prim("float")):
+        op = randchoice(ctx, [ast.Add, ast.Sub, ast.Mult])()
+    elif type_ == Prim("str"):
+        op = ast.Add()
+    elif type_ == BOOL:
+        if randbool(ctx):
+            return ast.UnaryOp(
+                op=ast.Not(), operand=generate_value(ctx, BOOL, depth - 1)
+            )
+        return ast.Compare(
+            left=generate_value(ctx, INT, depth - 1),
+            # Not ==, literals that can't be equal are reported by strict checks
+            ops=[randchoice(ctx, [ast.Lt, ast.LtE, ast.Gt, ast.GtE])()],
+            comparators=[generate_value(ctx, INT, depth - 1)],
+        )
+    else:
+        return None
+    return ast.BinOp(
+        left=generate_value(ctx, type_, depth - 1),
+        op=op,
+        right=generate_value(ctx, type_, depth - 1),
+    )
+
+
+def generate_built_value(ctx: TypedContext, type_: Type, depth: int) -> ast.expr:
+    """A value of type_ built from literals, constructors and operations."""
+    if depth > 0 and randbool(ctx):
+        operation = _operation(ctx, type_, depth)
+        if operation is not None:
+            return operation
+    if isinstance(type_, Prim):
+        return generate_literal(ctx, type_)
+    if isinstance(type_, ListOf):
+        return ast.List(elts=_elements(ctx, type_.item, depth), ctx=ast.Load())
+    if isinstance(type_, DictOf):
+        items = _elements(ctx, type_.value, depth)
+        keys: list[ast.expr | None] = [
+            ast.Constant(value=i if type_.key == INT else f"k{i}")
+            for i in range(len(items))
+        ]
+        return ast.Dict(keys=keys, values=items)
+    if isinstance(type_, TupleOf):
+        elts = [generate_value(ctx, item, depth - 1) for item in type_.items]
+        return ast.Tuple(elts=elts, ctx=ast.Load())
+    if isinstance(type_, UnionOf):
+        return generate_value(ctx, randchoice(ctx, type_.options), depth)
+    if isinstance(type_, CallableOf):
+        args = ast.arguments(
+            posonlyargs=[],
+            args=[ast.arg(arg=make_name(ctx, new=True)) for _ in type_.params],
+            kwonlyargs=[],
+            kw_defaults=[],
+            defaults=[],
+        )
+        return ast.Lambda(args=args, body=generate_value(ctx, type_.returns, depth - 1))
+    if isinstance(type_, GenericOf):
+        return _call(_name(type_.name), [generate_value(ctx, type_.arg, depth - 1)])
+    return _construct(ctx, type_.name, depth)
+
+
+def _references(ctx: TypedContext, type_: Type) -> list[tuple[str, ...]]:
+    """Paths of the visible values and their attributes of type_."""
+    paths = []
+    for path, source in ctx.visible():
+        if assignable(ctx, source, type_):
+            paths.append(path)
+        for attr, attr_type in ctx.attributes(source):
+            if assignable(ctx, attr_type, type_):
+                paths.append(path + (attr,))
+    return paths
+
+
+def _callables(
+    ctx: TypedContext, type_: Type | None
+) -> list[tuple[tuple[str, ...], Signature]]:
+    """
+    Functions and methods of visible values returning type_, or any if None.
+    Those returning None are only called as statements, type checkers report
+    using their result.
+    """
+    signatures = [((function.name,), function) for function in ctx.functions]
+    for path, source in ctx.visible():
+        for method in ctx.methods(source):
+            signatures.append((path + (method.name,), method))
+    if type_ is None:
+        return signatures
+    return [
+        (path, signature)
+        for path, signature in signatures
+        if signature.returns != NONE and assignable(ctx, signature.returns, type_)
+    ]
+
+
+def generate_call(
+    ctx: TypedContext, path: tuple[str, ...], signature: Signature, depth: int
+) -> ast.Call:
+    args = [generate_value(ctx, type_, depth - 1) for _, type_ in signature.params]
+    return _call(_path(path), args)
+
+
+def generate_value(ctx: TypedContext, type_: Type, depth: int) -> ast.expr:
+    """An expression of type type_, nested at most about depth deep."""
+    references = _references(ctx, type_)
+    if references and (depth <= 0 or randbool(ctx)):
+        return _path(randchoice(ctx, references))
+    if ctx.can_call and depth > 0 and randbool(ctx):
+        callables = _callables(ctx, type_)
+        if callables:
+            path, signature = randchoice(ctx, callables)
+            return generate_call(ctx, path, signature, depth)
+    return generate_built_value(ctx, type_, depth)
+
+
+def generate_annassign(ctx: TypedContext) -> list[ast.stmt]:
+    type_ = generate_type(ctx, ctx.max_depth - ctx.depth)
+    name = make_name(ctx, new=True)
+    value = generate_value(ctx, type_, ctx.max_depth - ctx.depth)
+    # Only defined once the value is generated, it can't refer to itself
+    ctx.define(name, type_)
+    return [
+        ast.AnnAssign(
+            target=_store(name),
+            annotation=type_.annotation(),
+            value=value,
+            simple=1,
+            lineno=1,
+        )
+    ]
+
+
+def generate_assign(ctx: TypedContext) -> list[ast.stmt]:
+    targets = [
+        (path, type_)
+        for path, type_ in ctx.visible()
+        if path[0] != "self" or len(path) > 1
+    ]
+    for path, type_ in ctx.visible():
+        if path == ("self",):
+            targets.extend((path + (attr,), t) for attr, t in ctx.attributes(type_))
+    if not targets:
+        return generate_annassign(ctx)
+    path, type_ = randchoice(ctx, targets)
+    value = generate_value(ctx, type_, ctx.max_depth - ctx.depth)
+    return [ast.Assign(targets=[_path(path, store=True)], value=value, lineno=1)]
+
+
+def generate_call_stmt(ctx: TypedContext) -> list[ast.stmt]:
+    callables = _callables(ctx, None)
+    if not callables:
+        return generate_annassign(ctx)
+    path, signature = randchoice(ctx, callables)
+    call = generate_call(ctx, path, signature, ctx.max_depth - ctx.depth)
+    return [ast.Expr(value=call)]
+
+
+def generate_for(ctx: TypedContext) -> list[ast.stmt]:
+    if ctx.depth >= ctx.max_depth - 1:
+        return generate_annassign(ctx)
+    stmts: list[ast.stmt] = []
+    lists = [
+        (path, type_) for path, type_ in ctx.visible() if isinstance(type_, ListOf)
+    ]
+    if lists:
+        path, type_ = randchoice(ctx, lists)
+    else:
+        # Loop over a new list, an empty literal couldn't be inferred
+        stmts = generate_annassign(ctx)
+        path, type_ = ctx.scopes[-1][-1]
+        if not isinstance(type_, ListOf):
+            return stmts
+    target = make_name(ctx, new=True)
+    loop = ast.For(target=_store(target), iter=_path(path), orelse=[], lineno=1)
+    with ctx.block():
+        ctx.define(target, type_.item)
+        loop.body = generate_block(ctx)
+    return stmts + [loop]
+
+
+def generate_if(ctx: TypedContext) -> list[ast.stmt]:
+    if ctx.depth >= ctx.max_depth - 1:
+        return generate_assign(ctx)
+    test = generate_value(ctx, BOOL, ctx.max_depth - ctx.depth)
+    node = ast.If(test=test, orelse=[], lineno=1)
+    with ctx.block():
+        node.body = generate_block(ctx)
+    if randbool(ctx):
+        with ctx.block():
+            node.orelse = generate_block(ctx)
+    return [node]
+
+
+STMT_GENERATORS = [
+    generate_annassign,
+    generate_assign,
+    generate_call_stmt,
+    generate_for,
+    generate_if,
+]
+stmt_generators_cycle = rcycle(STMT_GENERATORS)
+
+
+def generate_block(ctx: TypedContext) -> list[ast.stmt]:
+    body: list[ast.stmt] = []
+    for _ in range(max(1, sample_width(ctx, "body", 1, ctx.width))):
+        body.extend(ctx.draw(stmt_generators_cycle)(ctx))
+    return body
+
+
+def make_arguments(params: list[tuple[str, Type]], method: bool) -> ast.arguments:
+    args = [ast.arg(arg=name, annotation=type_.annotation()) for name, type_ in params]
+    if method:
+        args.insert(0, ast.arg(arg="self"))
+    return ast.arguments(
+        posonlyargs=[], args=args, kwonlyargs=[], kw_defaults=[], defaults=[]
+    )
+
+
+def generate_function(
+    ctx: TypedContext, signature: Signature, self_type: Type | None = None
+) -> ast.FunctionDef:
+    """A function, or a method of self_type, whose body returns its type."""
+    f = ast.FunctionDef(
+        name=signature.name,
+        args=make_arguments(signature.params, self_type is not None),
+        returns=signature.returns.annotation(),
+        decorator_list=[],
+        lineno=1,
+    )
+    outer = ctx.scopes, ctx.can_call
+    ctx.scopes = [ctx.scopes[0], []]
+    ctx.can_call = True
+    try:
+        if self_type is not None:
+            ctx.define("self", self_type)
+        for name, type_ in signature.params:
+            ctx.define(name, type_)
+        with ctx.nested():
+            f.body = generate_block(ctx)
+            returns = generate_value(ctx, signature.returns, ctx.max_depth - ctx.depth)
+        f.body.append(ast.Return(value=returns))
+    finally:
+        ctx.scopes, ctx.can_call = outer
+    return f
+
+
+def plan_signature(ctx: TypedContext, name: str | None = None) -> Signature:
+    n_params = sample_width(ctx, "args", 0, ctx.width)
+    params = [
+        (make_name(ctx, new=True), generate_type(ctx, ctx.max_depth - 1))
+        for _ in range(n_params)
+    ]
+    returns = generate_type(ctx, ctx.max_depth - 1)
+    return Signature(name or make_name(ctx, new=True), params, returns)
+
+
+def generate_protocol(ctx: TypedContext, info: ProtocolInfo) -> ast.ClassDef:
+    body: list[ast.stmt] = []
+    for method in info.methods:
+        f = ast.FunctionDef(
+            name=method.name,
+            args=make_arguments(method.params, True),
+            returns=method.returns.annotation(),
+            body=[ast.Expr(value=ast.Constant(value=Ellipsis))],
+            decorator_list=[],
+            lineno=1,
+        )
+        body.append(f)
+    return ast.ClassDef(
+        name=info.name,
+        bases=[_name("Protocol")],
+        keywords=[],
+        body=body,
+        decorator_list=[],
+        lineno=1,
+    )
+
+
+def generate_generic(info: GenericInfo) -> ast.ClassDef:
+    self_item = ast.Attribute(value=_name("self"), attr="item", ctx=ast.Store())
+    typevar = Instance(info.typevar)
+    init = ast.FunctionDef(
+        name="__init__",
+        args=make_arguments([("item", typevar)], True),
+        returns=ast.Constant(value=None),
+        body=[ast.Assign(targets=[self_item], value=_name("item"), lineno=1)],
+        decorator_list=[],
+        lineno=1,
+    )
+    get = ast.FunctionDef(
+        name="get",
+        args=make_arguments([], True),
+        returns=_name(info.typevar),
+        body=[ast.Return(value=_path(("self", "item")))],
+        decorator_list=[],
+        lineno=1,
+    )
+    put = ast.FunctionDef(
+        name="put",
+        args=make_arguments([("item", typevar)], True),
+        returns=ast.Constant(value=None),
+        body=[ast.Assign(targets=[self_item], value=_name("item"), lineno=1)],
+        decorator_list=[],
+        lineno=1,
+    )
+    item = ast.AnnAssign(
+        target=_store("item"), annotation=_name(info.typevar), simple=1, lineno=1
+    )
+    return ast.ClassDef(
+        name=info.name,
+        bases=[_subscript("Generic", _name(info.typevar))],
+        keywords=[],
+        body=[item, init, get, put],
+        decorator_list=[],
+        lineno=1,
+    )
+
+
+def generate_class(ctx: TypedContext, info: ClassInfo) -> ast.ClassDef:
+    body: list[ast.stmt] = [
+        ast.AnnAssign(
+            target=_store(name), annotation=type_.annotation(), simple=1, lineno=1
+        )
+        for name, type_ in info.attributes
+    ]
+    init = ast.FunctionDef(
+        name="__init__",
+        args=make_arguments(info.attributes, True),
+        returns=ast.Constant(value=None),
+        body=[
+            ast.Assign(
+                targets=[_path(("self", name), store=True)],
+                value=_name(name),
+                lineno=1,
+            )
+            for name, _ in info.attributes
+        ]
+        or [ast.Pass()],
+        decorator_list=[],
+        lineno=1,
+    )
+    body.append(init)
+    for method in info.methods:
+        body.append(generate_function(ctx, method, Instance(info.name)))
+    return ast.ClassDef(
+        name=info.name,
+        bases=[],
+        keywords=[],
+        body=body,
+        decorator_list=[],
+        lineno=1,
+    )
+
+
+def plan_module(
+    ctx: TypedContext, protocols: int, generics: int, classes: int, functions: int
+) -> None:
+    """
+    Plan the signatures of the module. Each class can be annotated with once
+    defined, and a protocol once a class implementing it is, so building a
+    value of any type terminates.
+    """
+    for _ in range(generics):
+        name = _class_name(ctx)
+        ctx.generics[name] = GenericInfo(name, f"T{name}")
+    for _ in range(protocols):
+        methods = [plan_signature(ctx) for _ in range(randint(ctx, 1, 2))]
+        name = _class_name(ctx)
+        ctx.protocols[name] = ProtocolInfo(name, methods)
+    protocol_names = list(ctx.protocols)
+    for i in range(classes):
+        # Every protocol gets an implementer, then classes pick one at random
+        implemented = []
+        if protocol_names and (i < len(protocol_names) or randbool(ctx)):
+            implemented.append(protocol_names[i % len(protocol_names)])
+        n_attributes = sample_width(ctx, "args", 1, ctx.width)
+        attributes = [
+            (make_name(ctx, new=True), generate_type(ctx, ctx.max_depth - 1))
+            for _ in range(n_attributes)
+        ]
+        methods = [
+            method
+            for protocol in implemented
+            for method in ctx.protocols[protocol].methods
+        ]
+        methods += [plan_signature(ctx) for _ in range(randint(ctx, 0, 2))]
+        info = ClassInfo(_class_name(ctx), attributes, methods, implemented)
+        ctx.classes[info.name] = info
+        ctx.annotatable.append(info.name)
+        for protocol in implemented:
+            if not ctx.protocols[protocol].implementers:
+                ctx.annotatable.append(protocol)
+            ctx.protocols[protocol].implementers.append(info.name)
+    ctx.functions = [plan_signature(ctx) for _ in range(functions)]
+
+
+def generate_typed_module(
+    depth: int = 3,
+    width: int = 4,
+    protocols: int = 2,
+    generics: int = 2,
+    classes: int = 4,
+    functions: int = 6,
+    widths: dict[str, Distribution] | None = None,
+    seed: int | None = None,
+) -> ast.Module:
+    """
+    Generate a typed module of protocols, generic classes, classes with typed
+    attributes, functions and module variables. depth bounds the nesting of
+    types, expressions and blocks, and width the number of parameters,
+    attributes, statements per block and items per literal.
+    """
+    ctx = TypedContext(seed)
+    ctx.max_depth = depth
+    ctx.width = width
+    if widths:
+        ctx.widths.update(widths)
+    plan_module(ctx, protocols, generics, classes, functions)
+
+    body: list[ast.stmt] = [
+        ast.ImportFrom(
+            module="typing",
+            names=[ast.alias(name=name) for name in TYPING_NAMES],
+            level=0,
+        )
+    ]
+    for info in ctx.generics.values():
+        body.append(
+            ast.Assign(
+                targets=[_store(info.typevar)],
+                value=_call(_name("TypeVar"), [ast.Constant(value=info.typevar)]),
+                lineno=1,
+            )
+        )
+    body.extend(generate_generic(info) for info in ctx.generics.values())
+    body.extend(generate_protocol(ctx, info) for info in ctx.protocols.values())
+    body.extend(generate_class(ctx, info) for info in ctx.classes.values())
+    body.extend(generate_function(ctx, signature) for signature in ctx.functions)
+    for _ in range(width):
+        body.extend(generate_annassign(ctx))
+    return ast.fix_missing_locations(ast.Module(body=body, type_ignores=[]))
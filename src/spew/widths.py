@@ -0,0 +1,153 @@
+"""
+Width distributions, used to pick how many items go into a repeated construct
+(statement bodies, argument lists, decorators, etc.).
+"""
+
+import math
+import typing
+from dataclasses import dataclass, field
+
+# Constructs that can be given a width distribution.
+WIDTH_CONSTRUCTS = (
+    "body",  # Statements in a block
+    "args",  # Arguments of a function or lambda
+    "call_args",  # Positional and keyword arguments of a call
+    "decorators",  # Decorators on a function or class
+    "elts",  # Elements of a list, tuple, set or dict
+)
+
+
+class Distribution(typing.Protocol):
+    def sample(self, rng) -> int: ...
+
+
+def _clamp(value: int, minimum: int, maximum: int | None) -> int:
+    if value < minimum:
+        return minimum
+    if maximum is not None and value > maximum:
+        return maximum
+    return value
+
+
+@dataclass(frozen=True)
+class Fixed:
+    value: int
+
+    def sample(self, rng) -> int:
+        return self.value
+
+
+@dataclass(frozen=True)
+class Uniform:
+    low: int
+    high: int
+
+    def sample(self, rng) -> int:
+        return rng.randint(self.low, self.high)
+
+
+@dataclass(frozen=True)
+class Geometric:
+    """Geometric distribution with the given mean, shifted to start at minimum."""
+
+    mean: float
+    minimum: int = 0
+    maximum: int | None = None
+
+    def sample(self, rng) -> int:
+        excess = self.mean - self.minimum
+        if excess <= 0:
+            return self.minimum
+        # Number of failures before the first success, p = 1 / (1 + excess)
+        n = int(math.log(1.0 - rng.random()) / math.log(excess / (1.0 + excess)))
+        return _clamp(self.minimum + n, self.minimum, self.maximum)
+
+
+@dataclass(frozen=True)
+class Poisson:
+    mean: float
+    minimum: int = 0
+    maximum: int | None = None
+
+    def sample(self, rng) -> int:
+        if self.mean > 30:
+            # Normal approximation, Knuth's method gets slow for large means
+            n = round(rng.gauss(self.mean, math.sqrt(self.mean)))
+        else:
+            limit = math.exp(-self.mean)
+            n = 0
+            p = rng.random()
+            while p > limit:
+                n += 1
+                p *= rng.random()
+        return _clamp(n, self.minimum, self.maximum)
+
+
+@dataclass(frozen=True)
+class Empirical:
+    """Distribution over observed widths, weighted by frequency."""
+
+    values: tuple[int, ...]
+    weights: tuple[float, ...]
+    cum_weights: tuple[float, ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if not self.values or len(self.values) != len(self.weights):
+            raise ValueError("Empirical needs one weight per value")
+        total = 0.0
+        cum_weights = []
+        for weight in self.weights:
+            total += weight
+            cum_weights.append(total)
+        object.__setattr__(self, "cum_weights", tuple(cum_weights))
+
+    @classmethod
+    def from_counts(cls, counts: typing.Mapping[int, float]) -> "Empirical":
+        values = tuple(sorted(counts))
+        return cls(values, tuple(counts[v] for v in values))
+
+    def sample(self, rng) -> int:
+        return rng.choices(self.values, cum_weights=self.cum_weights)[0]
+
+
+def parse(spec: str) -> Distribution:
+    """
+    Parse a distribution spec, one of:
+
+    fixed:N
+    uniform:LOW:HIGH
+    geometric:MEAN[:MIN[:MAX]]
+    poisson:MEAN[:MIN[:MAX]]
+    empirical:VALUE=WEIGHT,VALUE=WEIGHT,...
+    """
+    kind, _, rest = spec.partition(":")
+    params = rest.split(":") if rest else []
+    try:
+        if kind == "fixed" and len(params) == 1:
+            return Fixed(int(params[0]))
+        if kind == "uniform" and len(params) == 2:
+            return Uniform(int(params[0]), int(params[1]))
+        if kind in ("geometric", "poisson") and 1 <= len(params) <= 3:
+            cls = Geometric if kind == "geometric" else Poisson
+            return cls(
+                float(params[0]),
+                int(params[1]) if len(params) > 1 else 0,
+                int(params[2]) if len(params) > 2 else None,
+            )
+        if kind == "empirical" and len(params) == 1:
+            counts = {}
+            for pair in params[0].split(","):
+                value, _, weight = pair.partition("=")
+                counts[int(value)] = float(weight)
+            return Empirical.from_counts(counts)
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid width distribution {spec!r}")
+
+
+def parse_option(text: str) -> tuple[str, Distribution]:
+    """Parse a CONSTRUCT=SPEC command-line option."""
+    construct, _, spec = text.partition("=")
+    if construct not in WIDTH_CONSTRUCTS:
+        raise ValueError(f"Unknown construct {construct!r}")
+    return construct, parse(spec)
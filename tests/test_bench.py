@@ -0,0 +1,78 @@
+import spew.bench as b
+import ast
+import json
+import sys
+from dataclasses import asdict
+import pytest
+
+COMPILE = f"{sys.executable} -c \"import sys; compile(sys.stdin.read(), 'x', 'exec')\""
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    return b.write_corpus(tmp_path_factory.mktemp("corpus"), 3, size=40, seed=1)
+
+
+@pytest.mark.repeat(1)
+def test_write_corpus(tmp_path, corpus):
+    paths = b.write_corpus(tmp_path, 3, size=40, seed=1)
+    assert [p.read_text() for p in paths] == [p.read_text() for p in corpus]
+    assert b.load_corpus(tmp_path) == paths
+    for path in paths:
+        compile(path.read_text(), str(path), "exec")
+
+
+@pytest.mark.repeat(1)
+def test_bench_command(corpus):
+    report = b.bench_target(COMPILE, corpus, repeat=2)
+    assert report.samples == 3
+    assert len(report.runs) == 6
+    assert report.failures == []
+    assert 0 < report.p50 <= report.p90 <= report.p99 <= report.max
+    assert report.lines == sum(p.read_text().count("\n") for p in corpus)
+    assert report.lines_per_sec > 0
+    assert report.peak_memory > 0
+
+
+@pytest.mark.repeat(1)
+def test_bench_command_without_wait4(monkeypatch, corpus):
+    monkeypatch.delattr(b.os, "wait4", raising=False)
+    report = b.bench_target(COMPILE, corpus, repeat=1)
+    assert report.failures == []
+    assert report.p50 > 0
+    assert report.peak_memory == 0
+    assert "peak_memory" not in b.compare_reports({"peak_memory": 1}, asdict(report))
+    report = b.bench_target(f"{sys.executable} -c 'exit(1)'", corpus, repeat=1)
+    assert report.failures == sorted(str(p) for p in corpus)
+
+
+@pytest.mark.repeat(1)
+def test_bench_command_path(corpus):
+    report = b.bench_target(f"{sys.executable} -m py_compile {{}}", corpus, repeat=1)
+    assert report.failures == []
+    report = b.bench_target(f"{sys.executable} -c 'exit(1)' {{}}", corpus, repeat=1)
+    assert report.failures == sorted(str(p) for p in corpus)
+
+
+def test_bench_callable(corpus):
+    report = b.bench_target(ast.parse, corpus, repeat=1, trace_memory=True)
+    assert report.failures == []
+    assert report.peak_memory > 0
+    report = b.bench_target(lambda source: 1 / 0, corpus[:1], repeat=1)
+    assert report.failures == [str(corpus[0])]
+
+
+def test_report_round_trip(tmp_path, corpus):
+    report = b.bench_target(ast.parse, corpus, repeat=1)
+    b.write_report(report, tmp_path / "report.json")
+    baseline = json.loads((tmp_path / "report.json").read_text())
+    assert baseline["runs"][0]["sample"] == str(corpus[0])
+    ratios = b.compare_reports(baseline, baseline)
+    assert set(ratios) == set(b.COMPARED) - {"peak_memory"}
+    assert all(ratio == 1 for ratio in ratios.values())
+    assert "x baseline" in b.format_report(report, baseline)
+
+
+def test_bench_empty():
+    with pytest.raises(ValueError):
+        b.bench_target(ast.parse, [])
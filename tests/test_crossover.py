@@ -0,0 +1,94 @@
+import spew
+import spew.crossover as c
+import spew.generate as g
+import ast
+import pytest
+
+
+def corpus(n=5, **kwargs):
+    return [
+        g.generate_source(depth=3, width=3, seed=seed, **kwargs) for seed in range(n)
+    ]
+
+
+def test_crossover_source():
+    index = spew.CorpusIndex(corpus())
+    crossed = spew.cross_over(index, 0, n_splices=3, seed=1)
+    assert isinstance(crossed, str)
+    assert crossed != ast.unparse(index.samples[0])
+    ast.parse(crossed)
+
+
+def test_crossover_seed():
+    index = spew.CorpusIndex(corpus())
+    assert spew.cross_over(index, 1, seed=2) == spew.cross_over(index, 1, seed=2)
+
+
+def test_crossover_leaves_corpus_untouched():
+    modules = [ast.parse(source) for source in corpus()]
+    before = [ast.dump(module) for module in modules]
+    index = spew.CorpusIndex(modules)
+    crossed = spew.cross_over(index, 0, n_splices=5)
+    assert isinstance(crossed, ast.Module)
+    assert [ast.dump(module) for module in modules] == before
+
+
+def test_crossover_donor():
+    index = spew.CorpusIndex(["x = 1\nf(a=2)\n", "y = 3\ng(b=4)\n"])
+    crossed = spew.cross_over(index, 0, donor=1, n_splices=3, seed=0)
+    assert {"x", "y", "1", "a", "3", "b", "f", "g"}.issuperset(
+        token for token in crossed.replace("\n", " ").split() if token.isalnum()
+    )
+
+
+def test_crossover_compatible_categories():
+    index = spew.CorpusIndex(
+        ["match x:\n    case 1:\n        pass\n", "a, b = c\ndel d\n"]
+    )
+    categories = {category for category, _ in index.locations[0]}
+    assert categories == {"stmt", "expr", "match_case", "pattern"}
+    # Assignment and del targets are left out
+    nodes = [location[1] for _, location in index.locations[1]]
+    assert [type(node) for node in nodes] == [ast.Module, ast.Module, ast.Assign]
+
+
+@pytest.mark.parametrize("compile_valid", [False, True])
+def test_crossover_slice_tuples(compile_valid):
+    # A tuple of slices is only valid as the slice of a subscript
+    index = spew.CorpusIndex(
+        ["y = x[1:2, 3]\nz = a[:, 0]\n", "a = b + c\n"], compile_valid=compile_valid
+    )
+    for seed in range(100):
+        ast.parse(spew.cross_over(index, 1, donor=0, n_splices=2, seed=seed))
+        ast.parse(spew.cross_over(index, 0, donor=1, n_splices=2, seed=seed))
+
+
+@pytest.mark.parametrize("depth", [2, 3, 4])
+def test_crossover_compile_valid(depth):
+    sources = [
+        g.generate_source(depth=depth, width=3, compile_valid=True) for _ in range(5)
+    ]
+    index = spew.CorpusIndex(sources, compile_valid=True)
+    for target in range(len(index)):
+        compile(spew.cross_over(index, target, n_splices=5), "test.py", "exec")
+
+
+def test_crossover_scope():
+    index = spew.CorpusIndex(
+        ["for x in y:\n    break\n", "def f():\n    return 1\n"], compile_valid=True
+    )
+    # Neither break nor return can leave their loop or function
+    for seed in range(20):
+        compile(spew.cross_over(index, 0, donor=1, seed=seed), "test.py", "exec")
+        compile(spew.cross_over(index, 1, donor=0, seed=seed), "test.py", "exec")
+
+
+def test_crossover_real_code():
+    index = spew.CorpusIndex(
+        [ast.unparse(ast.parse(open(module.__file__).read())) for module in (c, g)],
+        compile_valid=True,
+    )
+    for seed in range(5):
+        compile(
+            spew.cross_over(index, seed % 2, n_splices=3, seed=seed), "c.py", "exec"
+        )
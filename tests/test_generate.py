@@ -1,7 +1,9 @@
 import spew.generate as g
+import spew.widths as w
 import ast
 import pytest
 import compileall
+import concurrent.futures
 import tempfile
 
 
@@ -28,6 +30,26 @@ def test_nested_generate_module(depth):
     assert compiles(code)
 
 
+@pytest.mark.parametrize("depth", [1, 2, 3, 4, 5])
+def test_compile_valid_generate_module(depth):
+    module = g.generate_module(depth=depth, width=3, compile_valid=True)
+    compile(ast.unparse(module), "test.py", "exec")
+
+
+def test_compile_valid_scope_resets(ctx):
+    ctx.compile_valid = True
+    with ctx.inloop():
+        with ctx.infunction(is_async=True, is_generator=False):
+            assert not ctx.in_loop
+            assert ctx.in_async
+            with ctx.inclass():
+                assert not ctx.in_function
+                assert not ctx.in_async
+            assert ctx.in_function
+        assert ctx.in_loop
+        assert not ctx.in_function
+
+
 def test_generate_arg(ctx):
     arg = g.generate_arg(ctx)
     assert arg
@@ -326,6 +348,19 @@ def test_generate_boolop(ctx):
     assert compiles(code)
 
 
+@pytest.mark.parametrize("seed", range(20))
+def test_generate_boolop_values(seed):
+    # Outside compile-valid mode too: a single value is unparsed as (value)
+    ctx = g.Context(seed=seed)
+    ctx.max_depth = 1
+    assert not ctx.compile_valid
+    boolop = g.generate_boolop(ctx)
+    assert len(boolop.values) >= 2
+    target = ast.Attribute(value=boolop, attr="x", ctx=ast.Store())
+    stmt = ast.AnnAssign(target=target, annotation=ast.Name("x"), simple=0)
+    ast.parse(ast.unparse(ast.fix_missing_locations(stmt)))
+
+
 def test_generate_binop(ctx):
     binop = g.generate_binop(ctx)
     assert binop
@@ -457,3 +492,193 @@ def test_generate_subscript(ctx):
     assert subscript
     code = ast.unparse(subscript)
     assert compiles(code)
+
+
+def test_grammar_tables_only_hold_eligible_statements():
+    grammar = g.get_grammar()
+    table = grammar.stmt_table(g.GeneratorConstraints.ANY, False)
+    drawn = {next(table) for _ in range(200)}
+    assert g.generate_break not in drawn
+    assert g.generate_return not in drawn
+    assert g.generate_for not in drawn
+    assert g.generate_assign in drawn
+
+
+def test_grammar_is_cached():
+    assert g.get_grammar(["match"]) is g.get_grammar(["match"])
+
+
+def test_grammar_unknown_construct():
+    with pytest.raises(ValueError):
+        g.get_grammar(["goto"])
+
+
+def test_generate_module_exclude():
+    module = g.generate_module(depth=3, width=5, exclude=["match", "await", "pass"])
+    for node in ast.walk(module):
+        assert not isinstance(node, (ast.Match, ast.Await))
+    assert ast.parse(ast.unparse(module))
+
+
+@pytest.mark.parametrize("compile_valid", [False, True])
+def test_iter_module_source(compile_valid):
+    source = "\n".join(
+        g.iter_module_source(depth=4, width=3, compile_valid=compile_valid)
+    )
+    if compile_valid:
+        compile(source, "test.py", "exec")
+    assert len(ast.parse(source).body) == 3
+
+
+def test_prune_names():
+    ctx = g.Context()
+    ctx.prune_names = True
+    ctx.max_depth = 4
+    ctx.width = 3
+    ctx.widths["decorators"] = w.Fixed(0)
+    f = g.generate_function(ctx)
+    assert ctx.names == [f.name]
+
+
+def test_generate_module_seed():
+    first = ast.unparse(g.generate_module(depth=4, width=4, seed=1))
+    assert ast.unparse(g.generate_module(depth=4, width=4, seed=1)) == first
+    assert ast.unparse(g.generate_module(depth=4, width=4, seed=2)) != first
+    source = g.generate_source(depth=4, width=4, seed=1)
+    assert ast.dump(ast.parse(source)) == ast.dump(ast.parse(first))
+
+
+@pytest.mark.repeat(1)
+def test_generate_module_jobs():
+    source = g.generate_source(depth=4, width=4, seed=1, compile_valid=True)
+    assert g.generate_source(4, 4, seed=1, compile_valid=True, jobs=3) == source
+    module = g.generate_module(depth=4, width=4, seed=1, compile_valid=True, jobs=2)
+    assert ast.dump(ast.parse(ast.unparse(module))) == ast.dump(ast.parse(source))
+
+
+@pytest.mark.parametrize("compile_valid", [False, True])
+def test_generate_subtree(compile_valid):
+    module = g.generate_module(depth=4, width=3, seed=7, compile_valid=compile_valid)
+    for path, stmt in g.iter_stmt_paths(module):
+        assert g.stmt_at(module, path) is stmt
+        subtree = g.generate_subtree(
+            path, depth=4, width=3, seed=7, compile_valid=compile_valid
+        )
+        assert ast.dump(subtree) == ast.dump(stmt)
+
+
+@pytest.mark.parametrize("compile_valid", [False, True])
+def test_generate_stmt_scoping(compile_valid, monkeypatch):
+    # A statement sees the names of the statements enclosing it, but not those
+    # its earlier siblings bound: they're dropped once each one is generated
+    generate_stmt = g._generate_stmt
+    blocks = {}
+
+    def record(ctx, generator, seed):
+        names = list(ctx.names)
+        blocks.setdefault((ctx.seed, ctx.blocks), []).append(names)
+        stmt = generate_stmt(ctx, generator, seed)
+        assert ctx.names == names
+        return stmt
+
+    monkeypatch.setattr(g, "_generate_stmt", record)
+    g.generate_module(depth=4, width=4, seed=3, compile_valid=compile_valid)
+    assert any(len(siblings) > 1 and siblings[0] for siblings in blocks.values())
+    for siblings in blocks.values():
+        assert all(names == siblings[0] for names in siblings)
+
+
+def test_generate_subtree_invalid_path():
+    with pytest.raises(ValueError):
+        g.generate_subtree([(0, 5)], depth=3, width=3, seed=1)
+    with pytest.raises(ValueError):
+        g.generate_subtree([(1, 0)], depth=3, width=3, seed=1)
+
+
+@pytest.mark.parametrize("compile_valid", [False, True])
+@pytest.mark.parametrize(
+    "kind, node_type",
+    [
+        ("expr", ast.expr),
+        ("pattern", ast.pattern),
+        ("stmt", ast.stmt),
+        ("expression", ast.Expression),
+    ],
+)
+def test_generate_many(kind, node_type, compile_valid):
+    nodes = list(g.generate_many(kind, 50, 3, seed=0, compile_valid=compile_valid))
+    assert len(nodes) == 50
+    for node in nodes:
+        assert isinstance(node, node_type)
+        source = ast.unparse(node)
+        if kind == "pattern":
+            source = f"match x:\n    case {source}:\n        pass"
+        mode = "eval" if kind in ("expr", "expression") else "exec"
+        if compile_valid:
+            compile(source, "test.py", mode)
+        ast.parse(source, mode=mode)
+
+
+def test_generate_many_seed():
+    first = [ast.dump(node) for node in g.generate_many("stmt", 20, seed=1)]
+    # Each node only depends on its seed, not on the others in its batch
+    batched = g.generate_many("stmt", 20, seed=1, batch_size=3)
+    assert [ast.dump(node) for node in batched] == first
+    ctx = g._module_context((3, 5, None, (), False), g.derive_seed(1, 19))
+    assert ast.dump(g._generate_one_stmt(ctx)) == first[-1]
+    assert [ast.dump(node) for node in g.generate_many("stmt", 20, seed=2)] != first
+
+
+@pytest.mark.repeat(1)
+def test_map_window():
+    submitted = []
+
+    def square(n):
+        submitted.append(n)
+        return n * n
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        results = g._map_window(executor, square, range(20), 4)
+        assert next(results) == 0
+        # Only the window is submitted ahead of the results consumed
+        assert len(submitted) <= 4
+        assert list(results) == [n * n for n in range(1, 20)]
+
+
+def test_generate_many_jobs():
+    first = [ast.dump(node) for node in g.generate_many("expr", 100, seed=1)]
+    nodes = g.generate_many("expr", 100, seed=1, jobs=2, batch_size=30)
+    assert [ast.dump(node) for node in nodes] == first
+
+
+def test_generate_many_unknown_kind():
+    with pytest.raises(ValueError):
+        list(g.generate_many("module", 1))
+
+
+@pytest.mark.parametrize("compile_valid", [False, True])
+def test_context_scopes_restore_state_on_errors(compile_valid):
+    ctx = g.Context()
+    ctx.compile_valid = compile_valid
+    ctx.prune_names = True
+    ctx.names.append("a")
+    with pytest.raises(RuntimeError):
+        with ctx.nested(), ctx.inloop(), ctx.localnames():
+            with ctx.infunction(is_async=True) as bindings:
+                assert bindings == []
+                with ctx.inclass(), ctx.inlambda(), ctx.incomprehension():
+                    ctx.names.append("b")
+                    assert ctx.depth == 1
+                    raise RuntimeError
+    assert ctx.depth == 0
+    assert not (ctx.in_loop or ctx.in_function or ctx.in_async)
+    assert not (ctx.in_generator or ctx.in_comprehension)
+    assert ctx.names == ["a"]
+    assert ctx.frames == [] and ctx.function_frames == []
+
+
+def test_context_slots():
+    ctx = g.Context()
+    assert not hasattr(ctx, "__dict__")
+    with pytest.raises(AttributeError):
+        ctx.depht = 1
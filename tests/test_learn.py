@@ -0,0 +1,85 @@
+import spew.learn as l
+import ast
+import pytest
+
+SOURCE = """
+import os
+
+
+@decorator
+def f(a, b):
+    return [1, 2]
+"""
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    (tmp_path / "a.py").write_text(SOURCE, encoding="utf-8")
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "assigns.py").write_text("x = y\n" * 50, encoding="utf-8")
+    (tmp_path / "pkg" / "broken.py").write_text("def (:\n", encoding="utf-8")
+    return tmp_path
+
+
+def test_construct_of():
+    module = ast.parse("def f():\n    f(1)\nclass C: pass\n")
+    function, cls = module.body
+    assert l.construct_of(function) == "function"
+    assert l.construct_of(cls) == "class"
+    assert l.construct_of(function.body[0]) == "expression"
+    assert l.construct_of(function.body[0].value) == "call"
+    assert l.construct_of(function.args) is None
+
+
+def test_learn_corpus(corpus):
+    learned = l.learn_corpus(corpus, jobs=1)
+    assert (learned.files, learned.skipped) == (2, 1)
+    assert learned.selection["module"] == {"import": 1, "function": 1, "assign": 50}
+    assert learned.selection["function"] == {"name": 1, "return": 1}
+    assert learned.selection["return"] == {"list": 1}
+    assert learned.selection["list"] == {"constant": 2}
+    assert learned.widths["args"] == {2: 1}
+    assert learned.widths["decorators"] == {1: 1}
+    assert learned.widths["elts"] == {2: 1}
+    # Only blocks, not the module
+    assert learned.widths["body"] == {1: 1}
+
+
+def test_learn_corpus_max_width(corpus):
+    learned = l.learn_corpus(corpus, jobs=1, max_width=1)
+    assert learned.widths["args"] == {1: 1}
+
+
+@pytest.mark.repeat(1)
+def test_learn_corpus_jobs(corpus):
+    assert l.learn_corpus(corpus, jobs=2) == l.learn_corpus(corpus, jobs=1)
+
+
+def test_save_and_load(corpus, tmp_path):
+    learned = l.learn_corpus(corpus, jobs=1)
+    path = tmp_path / "learned.json"
+    l.save_learned(learned, path)
+    assert l.load_learned(path) == learned
+    path.write_text('{"version": 0}', encoding="utf-8")
+    with pytest.raises(ValueError):
+        l.load_learned(path)
+
+
+@pytest.mark.parametrize("compile_valid", [False, True])
+def test_generate_learned_module(corpus, compile_valid):
+    learned = l.learn_corpus(corpus, jobs=1)
+    module = l.generate_learned_module(
+        learned, depth=3, width=20, compile_valid=compile_valid, seed=1
+    )
+    assert len(module.body) == 20
+    source = ast.unparse(module)
+    if compile_valid:
+        compile(source, "test.py", "exec")
+    ast.parse(source)
+    # Assignments are most of the top-level statements of the corpus
+    assigns = sum(isinstance(stmt, ast.Assign) for stmt in module.body)
+    assert assigns >= 14
+    again = l.generate_learned_module(
+        learned, depth=3, width=20, compile_valid=compile_valid, seed=1
+    )
+    assert ast.unparse(again) == source
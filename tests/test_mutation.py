@@ -0,0 +1,67 @@
+import spew
+import spew.generate as g
+import spew.mutation as m
+import spew.trees as trees
+import ast
+import contextlib
+import pytest
+
+
+def test_mutate_source():
+    source = g.generate_source(depth=3, width=3, seed=1)
+    mutated = spew.mutate(source, n_mutations=2, seed=1)
+    assert isinstance(mutated, str)
+    assert mutated != ast.unparse(ast.parse(source))
+    ast.parse(mutated)
+
+
+def test_mutate_seed():
+    source = g.generate_source(depth=3, width=3, seed=1)
+    assert spew.mutate(source, 3, seed=2) == spew.mutate(source, 3, seed=2)
+
+
+def test_mutate_leaves_input_untouched():
+    module = ast.parse(g.generate_source(depth=4, width=3, seed=3))
+    before = ast.dump(module)
+    mutated = spew.mutate(module, n_mutations=5)
+    assert ast.dump(module) == before
+    assert ast.dump(ast.parse(ast.unparse(mutated))) != before
+
+
+@pytest.mark.parametrize("depth", [2, 3, 4])
+def test_mutate_compile_valid(depth):
+    source = g.generate_source(depth=depth, width=3, compile_valid=True)
+    mutated = spew.mutate(source, n_mutations=5, compile_valid=True)
+    compile(mutated, "test.py", "exec")
+
+
+def test_mutate_reconstructs_scope():
+    module = ast.parse("async def f(x):\n    for i in x:\n        pass\n")
+    index = m._index(module)
+    location = next(loc for loc in index.stmts if isinstance(loc[1], ast.For))
+    ctx = g.Context()
+    ctx.compile_valid = True
+    with contextlib.ExitStack() as stack:
+        for node, field, _ in trees.ancestors_of(location):
+            m._enter(ctx, node, field, stack)
+        satisfied = ctx.constraints()
+        assert satisfied & g.GeneratorConstraints.ONLY_IN_LOOPS
+        assert satisfied & g.GeneratorConstraints.ONLY_IN_ASYNC_FUNCTIONS
+    assert not ctx.constraints() & g.GeneratorConstraints.ONLY_IN_FUNCTIONS
+    assert set(index.names[id(module.body[0])]) == {"x", "i"}
+
+
+def test_mutate_global_declarations():
+    # y can't be used in f before its global declaration
+    source = "y = 1\ndef f(a):\n    b = a + 1\n    global y\n    y = b\n    return y\n"
+    index = m._index(ast.parse(source))
+    assert [declared for declared in index.declared.values() if declared] == [{"y"}]
+    for seed in range(50):
+        mutated = spew.mutate(source, n_mutations=2, seed=seed, compile_valid=True)
+        compile(mutated, "test.py", "exec")
+
+
+def test_mutate_real_code():
+    source = ast.unparse(ast.parse(open(m.__file__).read()))
+    for seed in range(5):
+        compile(spew.mutate(source, 3, seed=seed, compile_valid=True), "m.py", "exec")
@@ -0,0 +1,31 @@
+import spew.presets as p
+import pytest
+
+
+@pytest.mark.parametrize("preset", sorted(p.PRESETS))
+@pytest.mark.parametrize("unit,size", [("lines", 30), ("bytes", 3000)])
+@pytest.mark.repeat(1)
+def test_preset_size(preset, unit, size):
+    source = p.generate_preset(preset, size, unit, seed=1)
+    actual = source.count("\n") if unit == "lines" else len(source.encode())
+    assert abs(actual - size) <= size * p.DEFAULT_TOLERANCE
+    if p.PRESETS[preset].compile_valid:
+        compile(source, "test.py", "exec")
+
+
+def test_preset_seed():
+    assert p.generate_preset("balanced", 100, seed=2) == p.generate_preset(
+        "balanced", 100, seed=2
+    )
+
+
+def test_preset_small_bytes():
+    source = p.generate_preset("wide_shallow", 400, "bytes", seed=3)
+    assert abs(len(source.encode()) - 400) <= 8
+
+
+def test_preset_unknown():
+    with pytest.raises(ValueError):
+        p.generate_preset("huge", 100)
+    with pytest.raises(ValueError):
+        p.generate_preset("balanced", 100, "chars")
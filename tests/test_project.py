@@ -0,0 +1,63 @@
+import spew.project as p
+import subprocess
+import sys
+import pytest
+
+
+def test_plan_project_is_reproducible():
+    first = p.plan_project("pkg", modules=20, packages=4, seed=1)
+    second = p.plan_project("pkg", modules=20, packages=4, seed=1)
+    assert first == second
+
+
+def test_plan_project_imports():
+    plan = p.plan_project("pkg", modules=30, packages=5, package_depth=2, fan_out=4)
+    assert plan.import_names
+    assert all(name.count(".") <= 2 for name in plan.packages)
+    for i, module in enumerate(plan.modules):
+        assert len(module.imports) <= 4
+        # Without cycles, modules only import earlier modules
+        assert all(j < i for j in module.imports)
+
+
+@pytest.mark.repeat(3)
+@pytest.mark.parametrize("cycles", [0.0, 0.5])
+def test_write_project_imports(tmp_path, cycles):
+    plan = p.plan_project("spewtest", modules=12, packages=3, cycles=cycles)
+    paths = p.write_project(tmp_path, plan, depth=3, width=3, jobs=1)
+    assert len(paths) == 12
+    imports = "; ".join(f"import {module.dotted_name}" for module in plan.modules)
+    subprocess.run([sys.executable, "-c", imports], cwd=tmp_path, check=True)
+
+
+@pytest.mark.repeat(1)
+def test_write_project_seed(tmp_path):
+    plan = p.plan_project("spewtest", modules=6, packages=2, seed=3)
+    serial = p.write_project(tmp_path / "serial", plan, seed=3, jobs=1)
+    parallel = p.write_project(tmp_path / "parallel", plan, seed=3, jobs=2)
+    for first, second in zip(serial, parallel):
+        assert first.read_text() == second.read_text()
+
+
+@pytest.mark.repeat(1)
+def test_write_project_cycles_run(tmp_path):
+    plan = p.plan_project("spewtest", modules=12, packages=3, cycles=0.7, seed=1)
+    assert any(j > i for i, module in enumerate(plan.modules) for j in module.imports)
+    p.write_project(tmp_path, plan, depth=3, width=3, seed=1, jobs=1)
+    # Every function returns: calls never recurse through an import cycle
+    calls = [
+        f"{module.dotted_name}.{func}({', '.join(['7'] * n_args)})"
+        for module in plan.modules
+        for func, n_args, _ in module.functions
+    ]
+    imports = [f"import {module.dotted_name}" for module in plan.modules]
+    code = "\n".join([*imports, *calls, "print('done')"])
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "done\n"
@@ -0,0 +1,112 @@
+import spew.pytest_plugin as p
+import ast
+import importlib
+import pathlib
+import subprocess
+import sys
+import pytest
+
+pytest_plugins = ["pytester"]
+
+TESTS = """
+import ast
+import pytest
+
+
+def test_module(spew_module):
+    ast.parse(spew_module.source)
+    assert spew_module.tree.body
+
+
+def test_corpus(spew_corpus):
+    print("SEEDS", [sample.seed for sample in spew_corpus])
+
+
+@pytest.mark.spew(seeds=[7, 8], depth=2, compile_valid=True)
+def test_marker(spew_module):
+    compile(spew_module.source, "test.py", "exec")
+"""
+
+
+def run(pytester, *args):
+    pytester.makepyfile(TESTS)
+    return pytester.runpytest("-p", "spew.pytest_plugin", "-s", *args)
+
+
+@pytest.mark.repeat(1)
+def test_fixtures(pytester):
+    result = run(pytester, "--spew-seeds", "3:6", "-v")
+    result.assert_outcomes(passed=6)
+    result.stdout.fnmatch_lines(
+        [
+            "*test_module?seed3? PASSED*",
+            "*test_module?seed5? PASSED*",
+            "*test_corpus?shard0of1?*",
+            "*test_marker?seed8? PASSED*",
+        ]
+    )
+    result.stdout.fnmatch_lines(["*SEEDS [[]3, 4, 5[]]*"])
+
+
+@pytest.mark.repeat(1)
+def test_shards(pytester):
+    result = run(pytester, "--spew-seeds", "10", "--spew-shards", "3", "-k", "corpus")
+    result.assert_outcomes(passed=3)
+    result.stdout.fnmatch_lines(
+        ["*SEEDS [[]0, 3, 6, 9[]]*", "*SEEDS [[]1, 4, 7[]]*", "*SEEDS [[]2, 5, 8[]]*"]
+    )
+
+
+@pytest.mark.repeat(1)
+def test_cache(pytester):
+    run(pytester, "--spew-seeds", "2").assert_outcomes(passed=5)
+    cached = sorted((pytester.path / ".pytest_cache" / "d" / "spew").glob("*.py"))
+    # Seeds 0 and 1, and 7 and 8 of the marker
+    assert len(cached) == 4
+    cached[0].write_text("x = 1\n")
+    result = run(pytester, "--spew-seeds", "2", "-k", "module")
+    result.assert_outcomes(passed=2)
+    assert "x = 1\n" in [path.read_text() for path in cached]
+
+
+def test_parse_seeds():
+    assert p._parse_seeds("5") == range(5)
+    assert p._parse_seeds("5:8") == range(5, 8)
+
+
+@pytest.mark.repeat(1)
+def test_opt_in(pytester):
+    pytester.makepyfile(TESTS)
+    result = pytester.runpytest("-k", "module")
+    result.stdout.fnmatch_lines(["*fixture 'spew_module' not found*"])
+
+
+@pytest.mark.repeat(1)
+def test_import_leaves_logging_alone():
+    code = "import logging, spew.pytest_plugin; print(logging.root.handlers)"
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip() == "[]"
+
+
+def spew_imports(module) -> set[str]:
+    tree = ast.parse(pathlib.Path(module.__file__).read_text())
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names.add(node.module)
+    return {name for name in names if name.startswith("spew.")}
+
+
+def test_cache_key_covers_generator_modules():
+    # Every spew module generate imports, however indirectly, changes samples
+    seen, todo = set(), ["spew.generate"]
+    while todo:
+        name = todo.pop()
+        if name not in seen:
+            seen.add(name)
+            todo.extend(spew_imports(importlib.import_module(name)))
+    assert seen == {module.__name__ for module in p.GENERATOR_MODULES}
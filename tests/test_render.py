@@ -0,0 +1,87 @@
+import spew.crossover as crossover
+import spew.generate as g
+import spew.mutation as mutation
+import spew.render as render
+import ast
+import inspect
+import random
+
+
+def test_render_matches_unparse():
+    module = g.generate_module(4, 5)
+    renderer = render.Renderer()
+    assert renderer.render(module) == ast.unparse(module)
+    assert renderer.render(module) == ast.unparse(module)
+
+
+def test_render_parsed_source():
+    # Docstrings, decorators, f-strings and blank lines before definitions
+    module = ast.parse(inspect.getsource(render))
+    assert render.Renderer().render(module) == ast.unparse(module)
+
+
+def test_render_nodes():
+    renderer = render.Renderer()
+    module = g.generate_module(3, 4, seed=1)
+    for node in module.body:
+        assert renderer.render(node) == ast.unparse(node)
+    assert renderer.render(module) == ast.unparse(module)
+
+
+def test_render_mutated():
+    renderer = render.Renderer()
+    module = g.generate_module(4, 5, seed=2)
+    renderer.render(module)
+    for seed in range(20):
+        mutated = mutation.mutate(module, 2, seed=seed)
+        assert renderer.render(mutated) == ast.unparse(mutated)
+
+
+def test_render_crossed_over():
+    renderer = render.Renderer()
+    index = crossover.CorpusIndex([g.generate_module(4, 5, seed=i) for i in range(3)])
+    for seed in range(10):
+        child = crossover.cross_over(index, 0, 1, 2, seed=seed)
+        assert renderer.render(child) == ast.unparse(child)
+
+
+def test_render_invalidate():
+    renderer = render.Renderer()
+    module = g.generate_module(4, 5, seed=3)
+    renderer.render(module)
+    rng = random.Random(0)
+    for i in range(50):
+        node = rng.choice(
+            [node for node in ast.walk(module) if isinstance(node, (ast.Name, ast.arg))]
+        )
+        if isinstance(node, ast.Name):
+            node.id = f"edited{i}"
+        else:
+            node.arg = f"edited{i}"
+        renderer.invalidate(node)
+        assert renderer.render(module) == ast.unparse(module)
+
+
+def test_render_invalidate_body():
+    module = ast.parse("def f():\n    '''doc'''\n    if x:\n        pass\n")
+    renderer = render.Renderer()
+    renderer.render(module)
+    branch = module.body[0].body[1]
+    branch.body.append(ast.Return(value=ast.Name(id="y", ctx=ast.Load())))
+    renderer.invalidate(branch)
+    assert renderer.render(module) == ast.unparse(module)
+    docstring = module.body[0].body[0].value
+    docstring.value = "changed"
+    renderer.invalidate(docstring)
+    assert renderer.render(module) == ast.unparse(module)
+
+
+def test_render_reuses_unchanged_statements():
+    renderer = render.Renderer()
+    module = g.generate_module(3, 5, seed=4)
+    renderer.render(module)
+    cached = {id(node): renderer._sources[node] for node in module.body}
+    name = next(node for node in ast.walk(module.body[0]) if isinstance(node, ast.Name))
+    renderer.invalidate(name)
+    assert module.body[0] not in renderer._sources
+    assert all(renderer._sources[node] is cached[id(node)] for node in module.body[1:])
@@ -0,0 +1,41 @@
+import spew.runnable as r
+import ast
+import pytest
+
+
+def run(module: ast.Module) -> list:
+    printed = []
+    code = compile(ast.unparse(module), "workload.py", "exec")
+    exec(code, {"__name__": "__main__", "print": printed.append})
+    return printed
+
+
+@pytest.mark.parametrize("depth", [1, 2, 3, 4])
+def test_generate_workload_runs(depth):
+    module = r.generate_workload(depth=depth, width=4)
+    printed = run(module)
+    assert len(printed) == 1
+    assert isinstance(printed[0], int)
+
+
+def test_generate_workload_cost_is_bounded():
+    ctx = r.RunnableContext()
+    ctx.max_depth = 5
+    ctx.width = 10
+    ctx.max_cost = 500
+    r._generate_workload(ctx, 2, 2, repeat=1)
+    assert all(cost <= 500 for _, _, cost in ctx.functions)
+    assert all(cost <= 500 for _, cost in ctx.classes)
+
+
+def test_generate_workload_target_runtime():
+    module = r.generate_workload(target_runtime=0.2, depth=3, width=3)
+    guard = module.body[-1]
+    repeat = guard.body[1].iter.args[0].value
+    per_call = r.time_entry_point(module, min_time=0.01)
+    assert 0.02 < repeat * per_call < 2.0
+
+
+def test_generate_workload_seed():
+    first = ast.unparse(r.generate_workload(depth=3, width=3, seed=5))
+    assert ast.unparse(r.generate_workload(depth=3, width=3, seed=5)) == first
@@ -0,0 +1,35 @@
+import spew.slow as s
+import ast
+import json
+import pytest
+
+
+def compares(source):
+    # Quadratic in the number of comparisons
+    n = sum(isinstance(node, ast.Compare) for node in ast.walk(ast.parse(source)))
+    for _ in range(n * n * 100):
+        pass
+
+
+@pytest.mark.repeat(1)
+def test_search_slow_inputs(tmp_path):
+    candidates = s.search_slow_inputs(compares, generations=6, population=6, seed=1)
+    assert len(candidates) == 10
+    assert [c.score for c in candidates] == sorted(
+        (c.score for c in candidates), reverse=True
+    )
+    for candidate in candidates:
+        compile(candidate.source, "slow.py", "exec")
+        assert candidate.bytes == len(candidate.source.encode())
+    paths = s.save_slow_inputs(candidates, tmp_path)
+    report = json.loads((tmp_path / "report.json").read_text())
+    assert [entry["path"] for entry in report] == [path.name for path in paths]
+    assert paths[0].read_text() == candidates[0].source
+    assert "us/byte" in s.format_slow_inputs(candidates)
+
+
+@pytest.mark.repeat(1)
+def test_search_slow_inputs_command():
+    candidates = s.search_slow_inputs("true", generations=1, population=2, keep=2)
+    assert len(candidates) == 2
+    assert all(c.returncode == 0 for c in candidates)
@@ -0,0 +1,88 @@
+import spew.strategies as s
+import ast
+import pytest
+from hypothesis import HealthCheck, find, given, settings
+
+# Generating a module takes more than the default deadline
+SETTINGS = settings(
+    max_examples=50, deadline=None, suppress_health_check=list(HealthCheck)
+)
+# find() stops at the first example found, then shrinks it
+FIND_SETTINGS = settings(SETTINGS, max_examples=1000)
+
+
+@pytest.mark.repeat(1)
+@SETTINGS
+@given(s.modules(depth=4))
+def test_modules_parse(module):
+    assert 1 <= len(module.body) <= 3
+    ast.parse(ast.unparse(module))
+
+
+@pytest.mark.repeat(1)
+def test_boolops_have_two_values():
+    # A single value is unparsed as (value), which doesn't parse as a target
+    expr = find(
+        s.expressions(),
+        lambda expr: isinstance(expr, ast.BoolOp),
+        settings=FIND_SETTINGS,
+    )
+    assert len(expr.values) == 2
+    target = ast.Attribute(value=expr, attr="x", ctx=ast.Store())
+    stmt = ast.AnnAssign(target=target, annotation=ast.Name("x"), simple=0)
+    ast.parse(ast.unparse(stmt))
+
+
+@pytest.mark.repeat(1)
+@SETTINGS
+@given(s.modules(compile_valid=True))
+def test_modules_compile(module):
+    compile(ast.unparse(module), "test.py", "exec")
+
+
+@pytest.mark.repeat(1)
+@SETTINGS
+@given(s.statements(), s.expressions())
+def test_statements_and_expressions(stmt, expr):
+    assert isinstance(stmt, ast.stmt)
+    assert isinstance(expr, ast.expr)
+    ast.parse(ast.unparse(stmt))
+    ast.parse(ast.unparse(expr), mode="eval")
+
+
+@pytest.mark.repeat(1)
+def test_shrinks_to_one_flat_statement():
+    module = find(
+        s.modules(),
+        lambda module: any(isinstance(node, ast.Call) for node in ast.walk(module)),
+        settings=FIND_SETTINGS,
+    )
+    assert len(module.body) == 1
+    (call,) = [node for node in ast.walk(module) if isinstance(node, ast.Call)]
+    assert isinstance(call.func, (ast.Name, ast.Constant))
+    assert all(isinstance(arg, (ast.Name, ast.Constant)) for arg in call.args)
+
+
+@pytest.mark.repeat(1)
+def test_shrinks_expressions_to_leaves():
+    expr = find(
+        s.expressions(),
+        lambda expr: isinstance(expr, ast.Compare),
+        settings=FIND_SETTINGS,
+    )
+    assert isinstance(expr.left, (ast.Name, ast.Constant))
+    assert all(isinstance(c, (ast.Name, ast.Constant)) for c in expr.comparators)
+
+
+@pytest.mark.repeat(1)
+def test_shrinks_optional_parts_away():
+    import_ = find(
+        s.statements(),
+        lambda stmt: isinstance(stmt, ast.Import),
+        settings=FIND_SETTINGS,
+    )
+    assert all(alias.asname is None for alias in import_.names)
+    with_ = find(
+        s.statements(), lambda stmt: isinstance(stmt, ast.With), settings=FIND_SETTINGS
+    )
+    assert all(item.optional_vars is None for item in with_.items)
@@ -0,0 +1,39 @@
+import spew.stress as s
+import ast
+import pytest
+
+
+@pytest.mark.parametrize("profile", sorted(s.STRESS_PROFILES))
+def test_stress_profile(profile):
+    module = s.generate_stress(profile, 50, compile_valid=True)
+    compile(ast.unparse(module), "test.py", "exec")
+
+
+@pytest.mark.parametrize(
+    "profile,count",
+    [
+        ("flat_body", lambda m: len(m.body)),
+        ("big_literal", lambda m: len(m.body[0].value.keys)),
+        ("long_line", lambda m: len(m.body[0].value.args)),
+        ("long_boolop", lambda m: len(m.body[0].value.values)),
+        ("long_compare", lambda m: len(m.body[0].value.ops)),
+        ("giant_match", lambda m: len(m.body[0].cases)),
+        ("many_decorators", lambda m: len(m.body[0].decorator_list)),
+    ],
+)
+def test_stress_size(profile, count):
+    for size in (2, 40):
+        assert count(s.generate_stress(profile, size)) == size
+
+
+def test_stress_deep_nesting():
+    module = s.generate_stress("deep_nesting", s.MAX_NESTING)
+    ast.parse(ast.unparse(module))
+    with pytest.raises(ValueError):
+        s.generate_stress("deep_nesting", s.MAX_NESTING + 1)
+
+
+def test_stress_seed():
+    assert ast.dump(s.generate_stress("giant_match", 20, seed=1)) == ast.dump(
+        s.generate_stress("giant_match", 20, seed=1)
+    )
@@ -0,0 +1,62 @@
+import spew.bench as b
+import spew.sweep as s
+import pytest
+
+
+def test_sweep_sizes():
+    assert s.sweep_sizes(8, 2, 4) == [8, 16, 32, 64]
+    assert s.sweep_sizes(8, 2, 8, 40) == [8, 16, 32]
+    assert s.sweep_sizes(1, 1.2, 4) == [1, 2]
+
+
+@pytest.mark.parametrize("exponent", [1, 2, 3])
+def test_fit_exponent(exponent):
+    points = [s.Point(size, size, 1e-3 * size**exponent) for size in [8, 16, 32, 64]]
+    assert s.fit_exponent(points) == pytest.approx(exponent)
+    assert s.fit_exponent(points[:2]) is None
+
+
+@pytest.fixture
+def fake_runner(monkeypatch):
+    # The target returns its cost instead of taking it, so nothing is timed
+    monkeypatch.setattr(
+        s,
+        "runner",
+        lambda target: lambda path: b.Run(str(path), target(path.read_text())),
+    )
+
+
+def quadratic(source):
+    return (len(source) / 100) ** 2 * 1e-3
+
+
+def linear(source):
+    return len(source) * 1e-5
+
+
+def test_sweep_quadratic(tmp_path, fake_runner):
+    (sweep,) = s.sweep_target(quadratic, ["big_literal"], 16, steps=4, seed=1)
+    assert sweep.superlinear
+    assert sweep.blowup in [point.size for point in sweep.points]
+    assert f"big_literal_{sweep.blowup}.py" in str(s.save_blowups([sweep], tmp_path))
+    s.write_sweep_report([sweep], tmp_path / "report.json")
+    assert "SUPERLINEAR" in s.format_sweeps([sweep])
+
+
+def test_sweep_linear(fake_runner):
+    (sweep,) = s.sweep_target(linear, ["long_compare"], 16, steps=4, seed=1)
+    assert not sweep.superlinear
+    assert sweep.blowup is None
+
+
+@pytest.mark.repeat(1)
+def test_sweep_command():
+    sweeps = s.sweep_target("true", ["deep_nesting"], 60, steps=3, seed=1, repeat=1)
+    # Sizes past the nesting limit are left out
+    assert [point.size for point in sweeps[0].points] == [60]
+    assert sweeps[0].exponent is None
+
+
+def test_sweep_unknown():
+    with pytest.raises(ValueError):
+        s.sweep_target(linear, ["huge"])
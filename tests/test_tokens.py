@@ -0,0 +1,76 @@
+import spew.tokens as t
+import spew.generate as g
+import ast
+import io
+import sys
+import tokenize
+import pytest
+
+
+def key(tokens):
+    return [(token.type, token.string, token.start, token.end) for token in tokens]
+
+
+def retokenize(source):
+    return key(tokenize.generate_tokens(io.StringIO(source).readline))
+
+
+# From 3.12, tokenize splits f-strings into several tokens, where iter_tokens()
+# gives a single STRING token: only compare modules without f-strings there
+split_fstrings = sys.version_info >= (3, 12)
+EXCLUDE = ["joinedstr", "formattedvalue"] if split_fstrings else []
+same_fstrings = pytest.mark.skipif(split_fstrings, reason="f-strings are split")
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("compile_valid", [False, True])
+@pytest.mark.repeat(1)
+def test_tokens_match_tokenize(seed, compile_valid):
+    tree = g.generate_module(
+        4, 4, seed=seed, compile_valid=compile_valid, exclude=EXCLUDE
+    )
+    assert key(t.iter_tokens(tree)) == retokenize(ast.unparse(tree) + "\n")
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        '"""Doc\nstring"""\nx = "a" + b"\\x00"',
+        pytest.param('x = f"{a!r:>{b}}"', marks=same_fstrings),
+        "class A:\n    def f(self):\n        if x:\n            pass\n    y = 1\nz = 2",
+        "x = (1+2j) + 1e309 + u'a'",
+    ],
+)
+def test_tokens_literals(source):
+    tree = ast.parse(source)
+    assert key(t.iter_tokens(tree)) == retokenize(ast.unparse(tree) + "\n")
+
+
+def test_tokens_expression():
+    tree = ast.parse("a[1:2, ...] if b else -c", mode="eval").body
+    assert [token.string for token in t.iter_tokens(tree)][:4] == ["a", "[", "1", ":"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.repeat(1)
+def test_tokens_style(seed):
+    tree = g.generate_module(4, 4, seed=seed, compile_valid=True, exclude=EXCLUDE)
+    style = t.TokenStyle(spaces=0.3, continuations=0.2, comments=0.3, indent=2)
+    tokens = list(t.iter_tokens(tree, style, seed))
+    assert any(token.type == tokenize.COMMENT for token in tokens)
+    # The positions are consistent: untokenizing and tokenizing again gives them
+    source = tokenize.untokenize(tokens)
+    assert key(tokens) == retokenize(source)
+    assert "\\\n" in source
+    assert ast.dump(ast.parse(source)) == ast.dump(ast.parse(ast.unparse(tree)))
+    compile(source, "test.py", "exec")
+
+
+def test_module_tokens():
+    tree = g.generate_module(3, 4, seed=3)
+    assert key(t.iter_module_tokens(3, 4, seed=3)) == key(t.iter_tokens(tree))
+
+
+def test_format_token():
+    token = next(t.iter_tokens(ast.parse("x = 1")))
+    assert t.format_token(token).split() == ["1,0-1,1:", "NAME", "'x'"]
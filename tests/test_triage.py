@@ -0,0 +1,105 @@
+import spew.triage as t
+import ast
+import json
+import sys
+import pytest
+
+
+def nodes(source):
+    n = sum(1 for _ in ast.walk(ast.parse(source)))
+    if n % 3 == 0:
+        raise_value_error(n)
+    if n % 3 == 1:
+        {}[n]
+
+
+def raise_value_error(n):
+    raise ValueError(f"bad {n}")
+
+
+def test_crash_from_exception():
+    try:
+        nodes("x = y")
+    except Exception as e:
+        crash = t.crash_from_exception(e, frames=1)
+    assert crash.exception == "ValueError"
+    assert crash.frames == ("test_triage.py:raise_value_error",)
+    assert crash.message == "bad 6"
+
+
+def test_signature_ignores_messages():
+    first = t.Crash("KeyError", ("a.py:f", "a.py:g"), "1")
+    assert t.Crash("KeyError", ("a.py:f", "a.py:g"), "2").signature == first.signature
+    assert t.Crash("KeyError", ("a.py:f",)).signature != first.signature
+    assert t.Crash("ValueError", ("a.py:f", "a.py:g")).signature != first.signature
+
+
+def test_crash_from_stderr():
+    stderr = (
+        "Traceback (most recent call last):\n"
+        '  File "/usr/lib/python3/site-packages/tool/main.py", line 3, in <module>\n'
+        "    main()\n"
+        '  File "/home/user/tool/parse.py", line 10, in parse\n'
+        "    raise tool.errors.ParseError('x')\n"
+        "tool.errors.ParseError: unexpected token\n"
+    )
+    crash = t.crash_from_stderr(stderr, 1)
+    assert crash.exception == "tool.errors.ParseError"
+    assert crash.frames == ("parse.py:parse", "tool/main.py:<module>")
+    assert crash.message == "unexpected token"
+    assert t.crash_from_stderr("3 errors found\n", 1) is None
+    assert t.crash_from_stderr("", 0) is None
+    assert t.crash_from_stderr("", -11).exception == "signal SIGSEGV"
+
+
+def test_triage_keeps_smallest():
+    triage = t.Triage()
+    crash = t.Crash("KeyError", ("a.py:f",))
+    triage.add("x = 12345", crash, seed=1)
+    triage.add("x = 1", crash, seed=2)
+    triage.add("x = 123", crash, seed=3)
+    (bucket,) = triage.buckets.values()
+    assert (bucket.count, bucket.source, bucket.seed) == (3, "x = 1", 2)
+
+
+def test_fuzz_target(tmp_path):
+    triage = t.fuzz_target(nodes, 30, seed=1, depth=2, width=3, ignore=(SyntaxError,))
+    buckets = triage.ranked()
+    assert buckets
+    assert {bucket.exception for bucket in buckets} <= {"ValueError", "KeyError"}
+    assert sum(bucket.count for bucket in buckets) <= 30
+    for bucket in buckets:
+        assert bucket.bytes == len(bucket.source.encode())
+    index = t.save_triage(triage, tmp_path)
+    entries = json.loads(index.read_text())
+    assert [entry["signature"] for entry in entries] == [b.signature for b in buckets]
+    loaded = t.load_triage(tmp_path)
+    assert loaded.ranked() == buckets
+    assert "crashes" in t.format_triage(loaded)
+
+
+def test_load_triage_empty(tmp_path):
+    assert t.load_triage(tmp_path / "missing").buckets == {}
+
+
+@pytest.mark.repeat(1)
+def test_triage_samples_command(tmp_path):
+    script = tmp_path / "target.py"
+    script.write_text(
+        "import sys\n"
+        "def check(source):\n"
+        "    if 'x' in source:\n"
+        "        raise KeyError(source)\n"
+        "check(open(sys.argv[1]).read())\n"
+    )
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    for i, source in enumerate(["x = 1\n", "y = 2\n", "x = 12345\n"]):
+        (corpus / f"sample_{i}.py").write_text(source)
+    triage = t.triage_samples(
+        f"{sys.executable} {script} {{}}", sorted(corpus.glob("*.py"))
+    )
+    (bucket,) = triage.buckets.values()
+    assert bucket.exception == "KeyError"
+    assert bucket.frames == ["target.py:check", "target.py:<module>"]
+    assert (bucket.count, bucket.source) == (2, "x = 1\n")
@@ -0,0 +1,74 @@
+import spew.typed as t
+import ast
+import pytest
+
+
+@pytest.mark.parametrize("depth", [1, 2, 3, 4])
+def test_generate_typed_module_runs(depth):
+    # Importing the module only defines things, no generated code runs
+    module = t.generate_typed_module(depth=depth, width=4)
+    exec(compile(ast.unparse(module), "typed.py", "exec"), {})
+
+
+def test_generate_typed_module_annotations():
+    module = t.generate_typed_module(depth=3, width=4, seed=1)
+    for node in ast.walk(module):
+        if isinstance(node, ast.FunctionDef):
+            assert node.returns is not None
+            assert all(
+                arg.annotation is not None for arg in node.args.args[1:]
+            ), ast.unparse(node)
+    names = {type(node) for node in ast.walk(module)}
+    assert ast.ClassDef in names and ast.AnnAssign in names and ast.Lambda in names
+
+
+def test_generate_typed_module_defines_annotated_names():
+    module = t.generate_typed_module(depth=3, width=4, seed=2)
+    defined = {"int", "float", "str", "bytes", "bool", "list", "dict", "tuple"}
+    defined.update(t.TYPING_NAMES)
+    for node in module.body:
+        if isinstance(node, ast.ClassDef):
+            defined.add(node.name)
+            continue
+        if isinstance(node, ast.Assign):
+            defined.update(target.id for target in node.targets)
+            continue
+        annotations = []
+        if isinstance(node, ast.FunctionDef):
+            annotations = [arg.annotation for arg in node.args.args] + [node.returns]
+        elif isinstance(node, ast.AnnAssign):
+            annotations = [node.annotation]
+        for annotation in annotations:
+            for name in ast.walk(annotation):
+                if isinstance(name, ast.Name):
+                    assert name.id in defined
+
+
+def test_assignable():
+    ctx = t.TypedContext()
+    ctx.protocols["P"] = t.ProtocolInfo("P", [], ["C"])
+    assert t.assignable(ctx, t.INT, t.Prim("float"))
+    assert t.assignable(ctx, t.Instance("C"), t.Instance("P"))
+    assert not t.assignable(ctx, t.Instance("D"), t.Instance("P"))
+    assert t.assignable(ctx, t.INT, t.UnionOf((t.Prim("str"), t.INT)))
+    assert not t.assignable(ctx, t.UnionOf((t.Prim("str"), t.INT)), t.INT)
+    # list is invariant
+    assert not t.assignable(ctx, t.ListOf(t.INT), t.ListOf(t.Prim("float")))
+
+
+def test_generate_typed_module_seed():
+    first = ast.unparse(t.generate_typed_module(depth=3, width=3, seed=5))
+    assert ast.unparse(t.generate_typed_module(depth=3, width=3, seed=5)) == first
+
+
+@pytest.mark.repeat(1)
+def test_generate_typed_module_type_checks(tmp_path):
+    mypy = pytest.importorskip("mypy.api")
+    paths = []
+    for seed in range(5):
+        path = tmp_path / f"typed_{seed}.py"
+        module = t.generate_typed_module(depth=3, width=4, seed=seed)
+        path.write_text(ast.unparse(module) + "\n", encoding="utf-8")
+        paths.append(str(path))
+    stdout, _, status = mypy.run(["--strict", "--no-incremental", *paths])
+    assert status == 0, stdout
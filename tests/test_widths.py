@@ -0,0 +1,71 @@
+import spew.generate as g
+import spew.widths as w
+import ast
+import random
+import pytest
+
+
+@pytest.mark.parametrize(
+    "spec, expected",
+    [
+        ("fixed:3", w.Fixed(3)),
+        ("uniform:1:5", w.Uniform(1, 5)),
+        ("geometric:4", w.Geometric(4.0)),
+        ("geometric:4:1:10", w.Geometric(4.0, 1, 10)),
+        ("poisson:2.5:1", w.Poisson(2.5, 1)),
+        ("empirical:1=5,2=3", w.Empirical((1, 2), (5.0, 3.0))),
+    ],
+)
+def test_parse(spec, expected):
+    assert w.parse(spec) == expected
+
+
+@pytest.mark.parametrize("spec", ["", "fixed", "fixed:a", "uniform:1", "normal:3"])
+def test_parse_invalid(spec):
+    with pytest.raises(ValueError):
+        w.parse(spec)
+
+
+def test_parse_option():
+    assert w.parse_option("body=fixed:2") == ("body", w.Fixed(2))
+    with pytest.raises(ValueError):
+        w.parse_option("nothing=fixed:2")
+
+
+@pytest.mark.parametrize(
+    "dist",
+    [
+        w.Uniform(2, 6),
+        w.Geometric(3.0, 2, 6),
+        w.Poisson(3.0, 2, 6),
+        w.Empirical.from_counts({2: 1, 4: 2, 6: 1}),
+    ],
+)
+def test_sample_bounds(dist):
+    rng = random.Random(0)
+    samples = [dist.sample(rng) for _ in range(500)]
+    assert all(2 <= s <= 6 for s in samples)
+    assert len(set(samples)) > 1
+
+
+def test_poisson_large_mean():
+    rng = random.Random(0)
+    samples = [w.Poisson(50.0).sample(rng) for _ in range(5000)]
+    assert 48 < sum(samples) / len(samples) < 52
+
+
+def test_geometric_mean():
+    rng = random.Random(0)
+    samples = [w.Geometric(4.0).sample(rng) for _ in range(5000)]
+    assert 3.5 < sum(samples) / len(samples) < 4.5
+
+
+def test_generate_module_widths():
+    module = g.generate_module(
+        depth=3, width=10, widths={"body": w.Fixed(2), "decorators": w.Fixed(0)}
+    )
+    assert len(module.body) == 2
+    for node in ast.walk(module):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            assert node.decorator_list == []
+            assert len(node.body) <= 2